@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, UserToken
+from django.utils import timezone
+
+from .models import EmailOutbox, User, UserToken
 
 
 @admin.register(User)
@@ -34,3 +36,19 @@ class UserTokenAdmin(admin.ModelAdmin):
     def token_preview(self, obj):
         return f'{obj.token[:20]}...'
     token_preview.short_description = '令牌预览'
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'to_email', 'subject', 'status', 'attempts', 'next_send_at', 'sent_at', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('to_email', 'subject', 'last_error')
+    readonly_fields = ('created_at', 'updated_at', 'locked_at', 'sent_at')
+    actions = ['requeue_emails']
+    
+    def requeue_emails(self, request, queryset):
+        updated = queryset.filter(status='dead').update(
+            status='queued', attempts=0, next_send_at=timezone.now(), updated_at=timezone.now()
+        )
+        self.message_user(request, f'已重新排队 {updated} 封邮件')
+    requeue_emails.short_description = '重新排队选中的失败邮件'
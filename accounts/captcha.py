@@ -0,0 +1,214 @@
+"""
+图片验证码
+
+每次请求都现场渲染验证码（加载字体、绘制、PNG编码、写会话）在机器人刷登录页时会占满CPU。
+这里改为：
+- 预渲染池：刷写进程（manage.py refill_captcha_pool）成批渲染验证码，把PNG字节和答案
+  放入共享缓存；请求只做一次incr和一次读取就取出一张，池为空时才现场渲染一张
+- 每张图片只发出一次：取出位置由原子递增的序号决定，不同请求不会拿到同一张
+- 答案存放在共享缓存中（以随机的挑战ID为键，ID通过Cookie下发），不写会话；
+  登录校验时无论对错都立即作废，同一张验证码不能重复尝试
+- 背景噪点每批只生成CAPTCHA_NOISE_VARIANTS张（Pillow的effect_noise，在C中整体生成），
+  同一批的验证码复制背景后只绘制文字和少量干扰线
+"""
+import functools
+import logging
+import random
+import secrets
+import string
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image, ImageDraw, ImageFont
+
+
+logger = logging.getLogger(__name__)
+
+COOKIE_NAME = 'captcha_id'
+CHARS = string.ascii_uppercase + string.digits
+WIDTH, HEIGHT = 120, 50
+
+POOL_PREFIX = 'accounts:captcha:pool'
+HEAD_KEY = 'accounts:captcha:pool-head'  # 已放入池中的最大序号
+TAKE_KEY = 'accounts:captcha:pool-take'  # 已取出的最大序号
+REFILL_LOCK_KEY = 'accounts:captcha:refill-lock'
+
+
+def _slot_key(seq):
+    return f'{POOL_PREFIX}:{seq}'
+
+
+def _answer_key(challenge_id):
+    return f'accounts:captcha:answer:{challenge_id}'
+
+
+def _attempts_key(challenge_id):
+    return f'accounts:captcha:attempts:{challenge_id}'
+
+
+@functools.lru_cache(maxsize=None)
+def _font():
+    """字体每个进程只加载一次"""
+    try:
+        return ImageFont.load_default(size=settings.CAPTCHA_FONT_SIZE)
+    except (TypeError, ImportError, OSError):
+        # 没有FreeType时只能使用固定大小的位图字体
+        return ImageFont.load_default()
+
+
+def _noise_background(rng):
+    """带噪点和干扰线的浅色背景"""
+    noise = Image.effect_noise((WIDTH, HEIGHT), settings.CAPTCHA_NOISE_SIGMA)
+    # 把以128为中心的噪点压到浅色区间，不影响文字辨认
+    background = noise.point(lambda v: 190 + v * 65 // 255)
+    draw = ImageDraw.Draw(background)
+    for _ in range(3):
+        draw.line(
+            [(rng.randint(0, WIDTH), rng.randint(0, HEIGHT)), (rng.randint(0, WIDTH), rng.randint(0, HEIGHT))],
+            fill=128, width=1,
+        )
+    return background
+
+
+def _render(background, code, rng):
+    """在背景副本上绘制验证码，返回PNG字节"""
+    image = background.copy()
+    draw = ImageDraw.Draw(image)
+    font = _font()
+    x = 14
+    for char in code:
+        draw.text((x, rng.randint(6, 16)), char, fill=rng.randint(0, 60), font=font)
+        x += 24
+    draw.line(
+        [(0, rng.randint(10, HEIGHT - 10)), (WIDTH, rng.randint(10, HEIGHT - 10))],
+        fill=rng.randint(60, 110), width=1,
+    )
+    buffer = BytesIO()
+    image.save(buffer, format='PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+def render_batch(count):
+    """
+    渲染一批验证码
+
+    Returns:
+        list: [(答案, PNG字节), ...]
+    """
+    rng = random.SystemRandom()
+    backgrounds = [_noise_background(rng) for _ in range(min(count, settings.CAPTCHA_NOISE_VARIANTS))]
+    batch = []
+    for i in range(count):
+        code = ''.join(rng.choices(CHARS, k=4))
+        batch.append((code, _render(backgrounds[i % len(backgrounds)], code, rng)))
+    return batch
+
+
+def issue():
+    """
+    发出一张验证码
+
+    Returns:
+        tuple: (挑战ID, PNG字节)
+    """
+    cache.add(TAKE_KEY, 0, None)
+    seq = cache.incr(TAKE_KEY)
+    entry = cache.get(_slot_key(seq))
+    if entry is None:
+        # 池为空（刷写进程未运行或被取空）时现场渲染
+        entry = render_batch(1)[0]
+    else:
+        cache.delete(_slot_key(seq))
+    code, image = entry
+    challenge_id = secrets.token_urlsafe(16)
+    cache.set(_answer_key(challenge_id), code, settings.CAPTCHA_TTL)
+    return challenge_id, image
+
+
+def verify(challenge_id, answer):
+    """校验并作废验证码（登录时使用，无论对错只能校验一次）"""
+    if not challenge_id or not answer:
+        return False
+    key = _answer_key(challenge_id)
+    code = cache.get(key)
+    # delete返回False说明已被并发的另一个请求作废
+    if code is None or not cache.delete(key):
+        return False
+    cache.delete(_attempts_key(challenge_id))
+    return answer.upper() == code
+
+
+def check(challenge_id, answer):
+    """
+    校验验证码但不作废（输入时的即时提示）
+
+    答错CAPTCHA_MAX_ATTEMPTS次后验证码作废，不能借此逐个尝试答案。
+    """
+    if not challenge_id or not answer:
+        return False
+    code = cache.get(_answer_key(challenge_id))
+    if code is None:
+        return False
+    if answer.upper() == code:
+        return True
+    attempts_key = _attempts_key(challenge_id)
+    cache.add(attempts_key, 0, settings.CAPTCHA_TTL)
+    if cache.incr(attempts_key) >= settings.CAPTCHA_MAX_ATTEMPTS:
+        cache.delete_many([_answer_key(challenge_id), attempts_key])
+    return False
+
+
+def refill():
+    """
+    把池补满到CAPTCHA_POOL_SIZE
+
+    Returns:
+        int: 放入的验证码数；其他进程正在补充时返回0
+    """
+    if not cache.add(REFILL_LOCK_KEY, 1, settings.CAPTCHA_REFILL_LOCK_TIMEOUT):
+        return 0
+    try:
+        take = cache.get(TAKE_KEY) or 0
+        head = cache.get(HEAD_KEY) or 0
+        if head <= take or not cache.has_key(_slot_key(take + 1)):
+            # 池被取空（取出的序号已超过放入的），或池中验证码已过期：从当前取出位置重新放入
+            head = take
+        added = 0
+        while head - take < settings.CAPTCHA_POOL_SIZE:
+            count = min(settings.CAPTCHA_REFILL_BATCH_SIZE, settings.CAPTCHA_POOL_SIZE - (head - take))
+            batch = render_batch(count)
+            cache.set_many(
+                {_slot_key(head + i + 1): entry for i, entry in enumerate(batch)},
+                settings.CAPTCHA_POOL_TTL,
+            )
+            head += count
+            added += count
+            cache.set(HEAD_KEY, head, None)
+            # 补充期间可能有请求在取
+            take = cache.get(TAKE_KEY) or 0
+            if take > head:
+                head = take
+        return added
+    finally:
+        cache.delete(REFILL_LOCK_KEY)
+
+
+def run_refiller(interval=None, once=False):
+    """
+    补充进程主循环（manage.py refill_captcha_pool）
+
+    Returns:
+        int: 共放入的验证码数
+    """
+    interval = settings.CAPTCHA_REFILL_INTERVAL if interval is None else interval
+    total = 0
+    while True:
+        try:
+            total += refill()
+        except Exception:
+            logger.exception('验证码池补充失败')
+        if once:
+            return total
+        time.sleep(interval)
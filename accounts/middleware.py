@@ -0,0 +1,48 @@
+"""
+令牌认证中间件（放在AuthenticationMiddleware之后）
+
+- 请求头 Authorization: Bearer <令牌>：令牌有效时以令牌对应的用户身份处理请求，
+  不依赖会话和Cookie，因此不需要CSRF校验；令牌无效时返回401
+- 会话登录：会话中记录了登录时签发的令牌（user_token）时，令牌过期或被撤销后退出登录
+
+令牌校验结果有短时缓存（见accounts.tokens），正常请求不查询令牌表。
+"""
+from django.contrib.auth import SESSION_KEY, logout
+from django.http import JsonResponse
+
+from . import tokens
+from .models import User
+
+
+BEARER_PREFIX = 'Bearer '
+
+
+def _load_user(user_id):
+    return User.objects.filter(pk=user_id, is_active=True).first()
+
+
+class TokenAuthenticationMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        authorization = request.headers.get('Authorization', '')
+        if authorization.startswith(BEARER_PREFIX):
+            user_id = tokens.resolve(authorization[len(BEARER_PREFIX):].strip())
+            if user_id is None:
+                return JsonResponse({'success': False, 'error': '令牌无效或已过期'}, status=401)
+            user = _load_user(user_id)
+            if user is None:
+                return JsonResponse({'success': False, 'error': '令牌无效或已过期'}, status=401)
+            request.user = user
+            request._dont_enforce_csrf_checks = True
+            return self.get_response(request)
+
+        token = request.session.get('user_token')
+        if token:
+            # 与会话中的用户ID比较，不需要先加载用户
+            user_id = tokens.resolve(token)
+            if user_id is None or str(user_id) != str(request.session.get(SESSION_KEY)):
+                logout(request)
+        return self.get_response(request)
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.23 on 2026-10-17 04:28
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_token_expires_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('to_email', models.EmailField(max_length=254, verbose_name='收件人')),
+                ('subject', models.CharField(max_length=255, verbose_name='主题')),
+                ('body', models.TextField(verbose_name='正文')),
+                ('dedupe_key', models.CharField(blank=True, max_length=255, verbose_name='去重键')),
+                ('status', models.CharField(choices=[('queued', '排队中'), ('sending', '发送中'), ('sent', '已发送'), ('dead', '失败')], default='queued', max_length=20, verbose_name='发送状态')),
+                ('attempts', models.IntegerField(default=0, verbose_name='已尝试次数')),
+                ('next_send_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='下次发送时间')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='开始发送时间')),
+                ('last_error', models.TextField(blank=True, verbose_name='最近错误')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='发送时间')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '待发送邮件',
+                'verbose_name_plural': '待发送邮件',
+                'db_table': 'email_outbox',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'next_send_at'], name='email_outbox_status_send_idx'), models.Index(fields=['dedupe_key', 'status'], name='email_outbox_dedupe_idx')],
+            },
+        ),
+    ]
@@ -73,6 +73,10 @@ class UserToken(models.Model):
         db_table = 'user_tokens'
         verbose_name = '用户令牌'
         verbose_name_plural = '用户令牌'
+        indexes = [
+            # 过期令牌按该索引分批清理（manage.py purge_expired_tokens）
+            models.Index(fields=['expires_at'], name='user_tokens_expires_idx'),
+        ]
     
     def __str__(self):
         return f'{self.user.email} - {self.token[:20]}...'
@@ -80,3 +84,41 @@ class UserToken(models.Model):
     @property
     def is_expired(self):
         return timezone.now() > self.expires_at
+
+
+class EmailOutbox(models.Model):
+    """待发送邮件 - 由邮件发送进程（manage.py send_outbox）异步发送"""
+    STATUS_CHOICES = [
+        ('queued', '排队中'),
+        ('sending', '发送中'),
+        ('sent', '已发送'),
+        ('dead', '失败'),
+    ]
+    
+    to_email = models.EmailField('收件人')
+    subject = models.CharField('主题', max_length=255)
+    body = models.TextField('正文')
+    dedupe_key = models.CharField('去重键', max_length=255, blank=True)
+    
+    status = models.CharField('发送状态', max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.IntegerField('已尝试次数', default=0)
+    next_send_at = models.DateTimeField('下次发送时间', default=timezone.now)
+    locked_at = models.DateTimeField('开始发送时间', blank=True, null=True)
+    last_error = models.TextField('最近错误', blank=True)
+    sent_at = models.DateTimeField('发送时间', blank=True, null=True)
+    
+    created_at = models.DateTimeField('创建时间', auto_now_add=True)
+    updated_at = models.DateTimeField('更新时间', auto_now=True)
+    
+    class Meta:
+        db_table = 'email_outbox'
+        verbose_name = '待发送邮件'
+        verbose_name_plural = '待发送邮件'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_send_at'], name='email_outbox_status_send_idx'),
+            models.Index(fields=['dedupe_key', 'status'], name='email_outbox_dedupe_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.to_email} - {self.subject} ({self.get_status_display()})'
@@ -0,0 +1,188 @@
+"""
+待发送邮件队列
+
+请求中只把邮件写入EmailOutbox并立即返回，由发送进程（manage.py send_outbox）在请求之外发送，
+SMTP服务器变慢不再拖住登录请求。
+发送进程按批领取邮件，一批邮件复用同一个SMTP连接；发送失败的邮件按指数退避重新排队，
+超过最大尝试次数后标记为失败，可在后台重新排队。
+同一去重键（如同一邮箱的验证码）尚未发出的邮件只保留最新一封，刚发出过相同内容时不再重复发送。
+"""
+import logging
+import random
+import smtplib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(to_email, subject, body, dedupe_key=''):
+    """
+    邮件入队
+
+    Args:
+        dedupe_key (str): 去重键。同一键尚未发出的邮件改为本次的内容，不再另外入队；
+            EMAIL_DEDUPE_WINDOW内已发出（或正在发送）内容相同的邮件时不入队
+
+    Returns:
+        EmailOutbox: 入队（或被合并）的邮件；重复而被忽略时返回None
+    """
+    with transaction.atomic():
+        if dedupe_key:
+            queued = (
+                EmailOutbox.objects.filter(dedupe_key=dedupe_key, status='queued')
+                .order_by('-id')
+                .first()
+            )
+            if queued is not None:
+                queued.to_email = to_email
+                queued.subject = subject
+                queued.body = body
+                queued.save(update_fields=['to_email', 'subject', 'body', 'updated_at'])
+                return queued
+
+            recent = timezone.now() - timedelta(seconds=settings.EMAIL_DEDUPE_WINDOW)
+            if EmailOutbox.objects.filter(
+                Q(status='sending') | Q(status='sent', sent_at__gte=recent),
+                dedupe_key=dedupe_key,
+                body=body,
+            ).exists():
+                return None
+
+        return EmailOutbox.objects.create(
+            to_email=to_email,
+            subject=subject,
+            body=body,
+            dedupe_key=dedupe_key,
+        )
+
+
+def _retry_delay(attempts):
+    """指数退避加随机抖动"""
+    base = settings.EMAIL_RETRY_BASE_DELAY
+    delay = min(base * (2 ** (attempts - 1)), settings.EMAIL_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1.5)
+
+
+def _fail(email, error):
+    """发送失败：按退避时间重新排队；收件人被拒绝或超过最大尝试次数时标记为失败"""
+    email.attempts += 1
+    email.last_error = str(error)
+    email.locked_at = None
+    if isinstance(error, smtplib.SMTPRecipientsRefused) or email.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+        email.status = 'dead'
+        logger.warning('邮件 %s 发送失败，不再重试: %s', email.id, error)
+    else:
+        email.status = 'queued'
+        email.next_send_at = timezone.now() + timedelta(seconds=_retry_delay(email.attempts))
+    email.save(update_fields=['attempts', 'last_error', 'locked_at', 'status', 'next_send_at', 'updated_at'])
+
+
+def claim_emails(limit):
+    """
+    领取到期的邮件
+
+    通过带状态条件的UPDATE逐封抢占，多个发送进程同时运行时同一封邮件只会被领取一次；
+    发送超时（发送进程崩溃）的sending邮件会被重新领取。
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.EMAIL_OUTBOX_LEASE)
+
+    candidate_ids = list(
+        EmailOutbox.objects.filter(status='queued', next_send_at__lte=now)
+        .order_by('next_send_at', 'id')
+        .values_list('id', flat=True)[:limit]
+    )
+    candidate_ids += list(
+        EmailOutbox.objects.filter(status='sending', locked_at__lt=stale_before)
+        .values_list('id', flat=True)[:max(limit - len(candidate_ids), 0)]
+    )
+
+    claimable = Q(status='queued', next_send_at__lte=now) | Q(status='sending', locked_at__lt=stale_before)
+    claimed = []
+    for email_id in candidate_ids:
+        updated = EmailOutbox.objects.filter(claimable, id=email_id).update(
+            status='sending', locked_at=now, updated_at=now
+        )
+        if updated:
+            claimed.append(email_id)
+
+    return list(EmailOutbox.objects.filter(id__in=claimed).order_by('next_send_at', 'id'))
+
+
+def _close(connection):
+    """关闭连接（连接已断开时QUIT也会出错，忽略）"""
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+def send_batch(batch_size=None):
+    """
+    领取一批邮件，通过同一个SMTP连接逐封发送
+
+    某封邮件发送出错时关闭连接，下一封重新连接。
+
+    Returns:
+        int: 本批领取的邮件数
+    """
+    emails = claim_emails(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE)
+    if not emails:
+        return 0
+
+    connection = get_connection(fail_silently=False)
+    sent_ids = []
+    try:
+        for email in emails:
+            message = EmailMessage(email.subject, email.body, settings.DEFAULT_FROM_EMAIL, [email.to_email])
+            try:
+                # 连接已打开时open()什么也不做，send_messages也不会在发送后关闭连接
+                connection.open()
+                connection.send_messages([message])
+            except Exception as exc:
+                _fail(email, exc)
+                _close(connection)
+                continue
+            sent_ids.append(email.id)
+    finally:
+        _close(connection)
+
+    if sent_ids:
+        now = timezone.now()
+        EmailOutbox.objects.filter(id__in=sent_ids).update(
+            status='sent', sent_at=now, locked_at=None, attempts=F('attempts') + 1, updated_at=now
+        )
+    return len(emails)
+
+
+def run_worker(batch_size=None, poll_interval=None, once=False):
+    """
+    发送进程主循环（manage.py send_outbox）
+
+    Returns:
+        int: 共领取的邮件数
+    """
+    poll_interval = poll_interval if poll_interval is not None else settings.EMAIL_OUTBOX_POLL_INTERVAL
+    processed = 0
+    while True:
+        try:
+            count = send_batch(batch_size)
+        except Exception:
+            logger.exception('邮件发送进程出错')
+            count = 0
+        processed += count
+        if count:
+            continue
+        if once:
+            return processed
+        close_old_connections()
+        time.sleep(poll_interval)
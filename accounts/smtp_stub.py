@@ -0,0 +1,132 @@
+"""
+本地SMTP调试服务
+只实现发送邮件所需的最少命令，收到的邮件保存在内存中（可选打印），
+统计连接数和邮件数，可配置延迟和故障率，用于本地开发和测试邮件发送进程的
+连接复用和重试行为，不依赖外部服务。
+"""
+import random
+import socketserver
+import threading
+import time
+from email import message_from_bytes, policy
+
+
+class StubSMTPHandler(socketserver.StreamRequestHandler):
+
+    def _reply(self, line):
+        self.wfile.write(line.encode('utf-8') + b'\r\n')
+
+    def _read_data(self):
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b'.\r\n', b'.\n'):
+                break
+            # 去掉点填充
+            lines.append(line[1:] if line.startswith(b'..') else line)
+        return b''.join(lines)
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connection_count += 1
+        self._reply('220 booksite stub SMTP')
+        mail_from, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if verb in ('EHLO', 'HELO'):
+                self._reply('250 booksite')
+            elif verb == 'MAIL':
+                mail_from, recipients = command[10:].strip('<> '), []
+                self._reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command[8:].strip('<> '))
+                self._reply('250 OK')
+            elif verb == 'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                data = self._read_data()
+                if server.latency:
+                    time.sleep(server.latency)
+                if server.fail_rate and random.random() < server.fail_rate:
+                    self._reply('451 stub failure')
+                    continue
+                with server.lock:
+                    server.messages.append((mail_from, recipients, data))
+                if server.verbose:
+                    message = message_from_bytes(data, policy=policy.default)
+                    print(f"{mail_from} -> {', '.join(recipients)}: {message['subject']}")
+                    print(message.get_content().strip())
+                self._reply('250 OK')
+            elif verb in ('RSET', 'NOOP'):
+                mail_from, recipients = None, []
+                self._reply('250 OK')
+            elif verb == 'QUIT':
+                self._reply('221 Bye')
+                return
+            else:
+                self._reply('502 Command not implemented')
+
+
+class _ThreadingSMTPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class StubSMTPServer:
+    """
+    可在后台线程中运行的SMTP调试服务
+
+    用法：
+        with StubSMTPServer() as server:
+            settings.EMAIL_HOST, settings.EMAIL_PORT = server.host, server.port
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, fail_rate=0.0, verbose=False):
+        self.server = _ThreadingSMTPServer((host, port), StubSMTPHandler)
+        self.server.latency = latency
+        self.server.fail_rate = fail_rate
+        self.server.verbose = verbose
+        self.server.lock = threading.Lock()
+        self.server.connection_count = 0
+        self.server.messages = []
+        self._thread = None
+
+    @property
+    def host(self):
+        return self.server.server_address[0]
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    @property
+    def connection_count(self):
+        return self.server.connection_count
+
+    @property
+    def messages(self):
+        return self.server.messages
+
+    def configure(self, **options):
+        """运行中修改latency/fail_rate"""
+        for key, value in options.items():
+            setattr(self.server, key, value)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,108 @@
+"""
+用户令牌
+
+登录时签发令牌（UserToken）并写入会话；请求中的令牌（会话中的user_token或
+Authorization: Bearer 请求头）由TokenAuthenticationMiddleware校验。
+
+校验结果在共享缓存中短暂缓存：有效令牌缓存 (用户ID, 过期时间)，不存在或已过期的令牌
+缓存一个否定结果，伪造/过期令牌的重复请求也不会每次查询数据库。
+令牌撤销（退出登录）时立即写入否定结果，其他工作进程随即失效。
+缓存键使用令牌的哈希，缓存中不保存令牌原文。
+"""
+import hashlib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UserToken
+from .utils import generate_token
+
+
+# 否定结果的缓存值（令牌不存在或已过期）
+INVALID = 0
+
+
+def cache_key(token):
+    return 'accounts:token:' + hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def issue(user, remember_me=False):
+    """签发令牌"""
+    token = generate_token()
+    expires_at = timezone.now() + timedelta(days=30 if remember_me else 7)
+    UserToken.objects.create(user=user, token=token, expires_at=expires_at, is_remember_me=remember_me)
+    cache.set(cache_key(token), (user.pk, expires_at.timestamp()), settings.TOKEN_CACHE_TTL)
+    return token
+
+
+def resolve(token):
+    """
+    令牌对应的用户ID
+
+    Returns:
+        int: 用户ID；令牌不存在或已过期时返回None
+    """
+    if not token:
+        return None
+    key = cache_key(token)
+    cached = cache.get(key)
+    if cached == INVALID:
+        return None
+    if cached is not None:
+        user_id, expires = cached
+        return user_id if expires > time.time() else None
+
+    row = (
+        UserToken.objects.filter(token=token, expires_at__gt=timezone.now())
+        .values_list('user_id', 'expires_at')
+        .first()
+    )
+    if row is None:
+        cache.set(key, INVALID, settings.TOKEN_NEGATIVE_CACHE_TTL)
+        return None
+    user_id, expires_at = row
+    ttl = min(settings.TOKEN_CACHE_TTL, int(expires_at.timestamp() - time.time()))
+    cache.set(key, (user_id, expires_at.timestamp()), max(ttl, 1))
+    return user_id
+
+
+def revoke(token):
+    """撤销令牌（删除记录，缓存立即改为否定结果）"""
+    if not token:
+        return
+    UserToken.objects.filter(token=token).delete()
+    cache.set(cache_key(token), INVALID, settings.TOKEN_CACHE_TTL)
+
+
+def purge_expired(batch_size=None, pause=None):
+    """
+    分批删除过期令牌
+
+    每批按expires_at索引取一批ID，在单独的短事务中删除，批间暂停，
+    不会长时间持有写锁阻塞登录等写请求。
+
+    Returns:
+        int: 删除的令牌数
+    """
+    batch_size = batch_size or settings.TOKEN_PURGE_BATCH_SIZE
+    pause = settings.TOKEN_PURGE_PAUSE if pause is None else pause
+    cutoff = timezone.now()
+    deleted = 0
+    while True:
+        ids = list(
+            UserToken.objects.filter(expires_at__lte=cutoff)
+            .order_by('expires_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            deleted += UserToken.objects.filter(id__in=ids).delete()[0]
+        if len(ids) < batch_size:
+            return deleted
+        if pause:
+            time.sleep(pause)
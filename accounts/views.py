@@ -1,8 +1,5 @@
-import random
-import string
 import secrets
 from datetime import datetime, timedelta
-from io import BytesIO
 import base64
 
 from django.shortcuts import render, redirect
@@ -11,17 +8,43 @@ from django.contrib import messages
 from django.views.generic import TemplateView
 from django.views import View
 from django.http import JsonResponse, HttpResponse
-from django.core.mail import send_mail
 from django.core.cache import cache
 from django.conf import settings
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.db import IntegrityError
-from PIL import Image, ImageDraw, ImageFont
 
-from .models import User, UserToken
-from .utils import generate_verification_code, generate_token
+from booksite.ratelimit import ratelimit
+
+from . import captcha, outbox, tokens
+from .models import User
+from .utils import generate_verification_code
+
+
+def send_verification_code_email(email, subject):
+    """
+    生成邮箱验证码并放入待发送邮件队列
+
+    验证码未过期时沿用原来的验证码（不延长有效期），重复请求不会使已发出的邮件失效，
+    尚未发出的同一邮箱验证码邮件也只会发送一封。
+
+    Returns:
+        str: 验证码
+    """
+    cache_key = f'email_verification_{email}'
+    verification_code = None
+    while verification_code is None:
+        # 只有新生成的验证码才写入（1小时过期）；add失败说明已有验证码，读取时它可能恰好过期，重试
+        code = generate_verification_code()
+        verification_code = code if cache.add(cache_key, code, 3600) else cache.get(cache_key)
+    outbox.enqueue(
+        email,
+        subject,
+        f'您的验证码是：{verification_code}，有效期1小时。',
+        dedupe_key=f'verification_code:{email}',
+    )
+    return verification_code
 
 
 class LoginView(TemplateView):
@@ -32,6 +55,7 @@ class LoginView(TemplateView):
             return redirect('books:index')
         return super().get(request, *args, **kwargs)
     
+    @method_decorator(ratelimit('login'))
     def post(self, request, *args, **kwargs):
         email = request.POST.get('email', '').strip()
         captcha_code = request.POST.get('captcha_code', '').strip()
@@ -45,46 +69,24 @@ class LoginView(TemplateView):
                 messages.error(request, '请填写邮箱和验证码')
                 return render(request, self.template_name)
             
-            # 验证图片验证码
-            session_captcha = request.session.get('captcha_code', '')
-            print(f"用户输入: {captcha_code}, Session中存储: {session_captcha}")
-            if captcha_code.upper() != session_captcha.upper():
+            # 验证图片验证码（一次性，校验后作废）
+            if not captcha.verify(request.COOKIES.get(captcha.COOKIE_NAME), captcha_code):
                 messages.error(request, '图片验证码错误')
                 return render(request, self.template_name)
             
-            # 发送邮件验证码
-            verification_code = generate_verification_code()
-            cache_key = f'email_verification_{email}'
-            cache.set(cache_key, verification_code, 3600)  # 1小时过期
+            # 发送邮件验证码（入队后立即返回，由邮件发送进程发送）
+            verification_code = send_verification_code_email(email, '阅读网站登录验证码')
+            if settings.DEBUG:
+                print(f"[开发模式] 发送到 {email} 的验证码是: {verification_code}")
+                messages.success(request, f'验证码已发送到您的邮箱 (开发模式)')
+            else:
+                messages.success(request, '验证码已发送到您的邮箱')
             
-            try:
-                # 在开发环境下直接跳过邮件发送
-                if settings.DEBUG:
-                    print(f"[开发模式] 发送到 {email} 的验证码是: {verification_code}")
-                    messages.success(request, f'验证码已发送到您的邮箱 (开发模式)')
-                else:
-                    send_mail(
-                        subject='阅读网站登录验证码',
-                        message=f'您的验证码是：{verification_code}，有效期1小时。',
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        recipient_list=[email],
-                        fail_silently=False,
-                    )
-                    messages.success(request, '验证码已发送到您的邮箱')
-                
-                return render(request, self.template_name, {
-                    'step': '2',
-                    'email': email,
-                    'remember_me': remember_me
-                })
-            except Exception as e:
-                print(f"邮件发送失败: {e}")
-                messages.error(request, f'邮件发送失败，验证码是: {verification_code} (开发用)')
-                return render(request, self.template_name, {
-                    'step': '2',
-                    'email': email,
-                    'remember_me': remember_me
-                })
+            return render(request, self.template_name, {
+                'step': '2',
+                'email': email,
+                'remember_me': remember_me
+            })
 
         elif step == '2':
             # 第二步：验证邮件验证码
@@ -116,15 +118,7 @@ class LoginView(TemplateView):
             user, created = User.objects.get_or_create(email=email)
             
             # 生成令牌
-            token = generate_token()
-            expires_at = timezone.now() + timedelta(days=30 if remember_me else 7)
-            
-            UserToken.objects.create(
-                user=user,
-                token=token,
-                expires_at=expires_at,
-                is_remember_me=remember_me
-            )
+            token = tokens.issue(user, remember_me)
             
             # 登录用户
             login(request, user)
@@ -199,7 +193,7 @@ def logout_view(request):
     # 删除用户令牌
     user_token = request.session.get('user_token')
     if user_token:
-        UserToken.objects.filter(token=user_token).delete()
+        tokens.revoke(user_token)
     
     logout(request)
     messages.success(request, '已退出登录')
@@ -207,6 +201,7 @@ def logout_view(request):
 
 
 @csrf_exempt
+@ratelimit('verify_email')
 def verify_email(request):
     """发送邮箱验证码"""
     if request.method == 'POST':
@@ -215,21 +210,8 @@ def verify_email(request):
         if not email:
             return JsonResponse({'success': False, 'message': '请填写邮箱地址'})
         
-        verification_code = generate_verification_code()
-        cache_key = f'email_verification_{email}'
-        cache.set(cache_key, verification_code, 3600)  # 1小时过期
-        
-        try:
-            send_mail(
-                subject='阅读网站邮箱验证码',
-                message=f'您的验证码是：{verification_code}，有效期1小时。',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[email],
-                fail_silently=False,
-            )
-            return JsonResponse({'success': True, 'message': '验证码已发送'})
-        except Exception as e:
-            return JsonResponse({'success': False, 'message': '发送失败，请稍后重试'})
+        send_verification_code_email(email, '阅读网站邮箱验证码')
+        return JsonResponse({'success': True, 'message': '验证码已发送'})
     
     return JsonResponse({'success': False, 'message': '请求方法错误'})
 
@@ -241,15 +223,13 @@ def send_verification_code(request):
 
 
 @csrf_exempt
+@ratelimit('verify_captcha')
 def verify_captcha(request):
-    """验证图片验证码"""
+    """验证图片验证码（不作废验证码，答错多次后作废）"""
     if request.method == 'POST':
         captcha_code = request.POST.get('captcha_code', '').strip()
-        session_captcha = request.session.get('captcha_code', '')
-        
-        print(f"AJAX验证 - 用户输入: {captcha_code}, Session存储: {session_captcha}")
         
-        if captcha_code.upper() == session_captcha.upper():
+        if captcha.check(request.COOKIES.get(captcha.COOKIE_NAME), captcha_code):
             return JsonResponse({'success': True, 'message': '验证码正确'})
         else:
             return JsonResponse({'success': False, 'message': '验证码错误'})
@@ -257,49 +237,17 @@ def verify_captcha(request):
     return JsonResponse({'success': False, 'message': '请求方法错误'})
 
 
+@ratelimit('captcha')
 def generate_captcha(request):
-    """生成图片验证码"""
-    # 生成随机验证码
-    code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
-    request.session['captcha_code'] = code  # 存储原始大小写
-    
-    # 添加调试信息
-    print(f"生成验证码: {code}, 存储到session: {request.session['captcha_code']}")
-    
-    # 创建图片
-    width, height = 120, 50
-    image = Image.new('RGB', (width, height), color='white')
-    draw = ImageDraw.Draw(image)
-    
-    # 添加验证码文字
-    try:
-        # 尝试使用系统字体
-        font = ImageFont.load_default()
-    except:
-        font = None
-    
-    # 绘制验证码
-    text_width = 80
-    text_height = 30
-    x = (width - text_width) // 2
-    y = (height - text_height) // 2
-    
-    draw.text((x, y), code, fill='black', font=font)
-    
-    # 添加干扰线
-    for _ in range(3):
-        x1 = random.randint(0, width)
-        y1 = random.randint(0, height)
-        x2 = random.randint(0, width)
-        y2 = random.randint(0, height)
-        draw.line([(x1, y1), (x2, y2)], fill='gray', width=1)
-    
-    # 保存图片到内存
-    buffer = BytesIO()
-    image.save(buffer, format='PNG')
-    buffer.seek(0)
-    
-    return HttpResponse(buffer.getvalue(), content_type='image/png')
+    """生成图片验证码（从预渲染池中取出，答案存放在共享缓存中）"""
+    challenge_id, image = captcha.issue()
+    response = HttpResponse(image, content_type='image/png')
+    response['Cache-Control'] = 'no-store'
+    response.set_cookie(
+        captcha.COOKIE_NAME, challenge_id,
+        max_age=settings.CAPTCHA_TTL, httponly=True, samesite='Lax',
+    )
+    return response
 
 
 class CheckDisplayNameView(View):
@@ -1,13 +1,16 @@
 from django.contrib import admin
-from .models import Book, BookDraft
+from django.utils import timezone
+
+from . import search
+from .models import Book, BookDraft, Chapter, ChapterDraft, ChapterRevision, ModerationJob, ModerationVerdict
 
 
 @admin.register(Book)
 class BookAdmin(admin.ModelAdmin):
-    list_display = ('title', 'author', 'ai_check_title', 'ai_check_description', 'adm_check_title', 'adm_check_description', 'created_at', 'updated_at')
-    list_filter = ('ai_check_title', 'ai_check_description', 'adm_check_title', 'adm_check_description', 'created_at')
+    list_display = ('title', 'author', 'ai_check_title', 'ai_check_description', 'adm_check_title', 'adm_check_description', 'is_public', 'created_at', 'updated_at')
+    list_filter = ('is_public', 'ai_check_title', 'ai_check_description', 'adm_check_title', 'adm_check_description', 'created_at')
     search_fields = ('title', 'description', 'author__email', 'author__display_name')
-    readonly_fields = ('created_at', 'updated_at', 'last_chapter_update')
+    readonly_fields = ('is_public', 'created_at', 'updated_at', 'last_chapter_update')
     
     fieldsets = (
         ('基本信息', {
@@ -18,7 +21,7 @@ class BookAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('审核状态', {
-            'fields': ('ai_check_title', 'ai_check_description', 'adm_check_title', 'adm_check_description')
+            'fields': ('ai_check_title', 'ai_check_description', 'adm_check_title', 'adm_check_description', 'is_public')
         }),
         ('拒绝原因', {
             'fields': ('title_reject_reason', 'description_reject_reason'),
@@ -31,8 +34,85 @@ class BookAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(Chapter)
+class ChapterAdmin(admin.ModelAdmin):
+    list_display = ('book', 'chapter_number', 'title', 'word_count', 'ai_check_title', 'ai_check_content', 'adm_check_title', 'adm_check_content', 'updated_at')
+    list_filter = ('ai_check_title', 'ai_check_content', 'adm_check_title', 'adm_check_content', 'has_pending_content')
+    # 正文压缩存储，不能用数据库模糊查询；正文搜索走全文索引，见get_search_results
+    search_fields = ('title', 'title_pending', 'book__title', 'author__email')
+    list_select_related = ('book',)
+    readonly_fields = ('word_count', 'has_pending_content', 'created_at', 'updated_at')
+    
+    def get_queryset(self, request):
+        # 列表页不加载正文
+        queryset = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('changelist'):
+            queryset = queryset.defer('content', 'content_pending')
+        return queryset
+    
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        chapter_ids = search.matching_ids(search_term, 'chapter')
+        if chapter_ids:
+            results = results | queryset.filter(id__in=chapter_ids)
+        return results, may_have_duplicates
+
+
+@admin.register(ChapterDraft)
+class ChapterDraftAdmin(admin.ModelAdmin):
+    list_display = ('book', 'chapter_number', 'title', 'updated_at')
+    search_fields = ('book__title', 'title')
+    readonly_fields = ('updated_at',)
+    
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('changelist'):
+            queryset = queryset.defer('content_delta')
+        return queryset
+
+
+@admin.register(ChapterRevision)
+class ChapterRevisionAdmin(admin.ModelAdmin):
+    list_display = ('chapter', 'number', 'kind', 'source', 'author', 'length', 'inserted', 'deleted', 'created_at')
+    list_filter = ('kind', 'source')
+    search_fields = ('chapter__title', 'title', 'content_hash')
+    list_select_related = ('chapter', 'chapter__book', 'author')
+    readonly_fields = [field.name for field in ChapterRevision._meta.fields]
+    
+    def get_queryset(self, request):
+        # 列表页不加载快照正文或增量
+        queryset = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('changelist'):
+            queryset = queryset.defer('data')
+        return queryset
+
+
 @admin.register(BookDraft)
 class BookDraftAdmin(admin.ModelAdmin):
     list_display = ('book', 'title', 'updated_at')
     search_fields = ('book__title', 'title', 'description')
     readonly_fields = ('updated_at',)
+
+
+@admin.register(ModerationJob)
+class ModerationJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'target_type', 'target_id', 'field', 'status', 'attempts', 'result_approved', 'next_run_at', 'created_at')
+    list_filter = ('status', 'target_type', 'field')
+    search_fields = ('target_id', 'last_error')
+    readonly_fields = ('created_at', 'updated_at', 'locked_at')
+    actions = ['requeue_jobs']
+    
+    def requeue_jobs(self, request, queryset):
+        updated = queryset.filter(status__in=['dead', 'cancelled']).update(
+            status='queued', attempts=0, next_run_at=timezone.now(), updated_at=timezone.now()
+        )
+        self.message_user(request, f'已重新排队 {updated} 个任务')
+    requeue_jobs.short_description = '重新排队选中的失败任务'
+
+
+@admin.register(ModerationVerdict)
+class ModerationVerdictAdmin(admin.ModelAdmin):
+    list_display = ('content_hash', 'approved', 'reason', 'hits', 'last_used_at', 'expires_at')
+    list_filter = ('approved',)
+    search_fields = ('content_hash', 'reason')
+    readonly_fields = ('content_hash', 'created_at', 'last_used_at')
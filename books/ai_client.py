@@ -0,0 +1,262 @@
+"""
+AI审核接口HTTP客户端
+每个进程复用一个带连接池的Session（keep-alive），
+对可安全重试的失败做带抖动的退避重试，并用熔断器在上游故障时快速失败。
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class AICheckUnavailable(Exception):
+    """AI审核服务不可用（网络错误、超时或非200响应）"""
+
+
+class CircuitOpen(AICheckUnavailable):
+    """熔断器打开，请求未发出即失败"""
+
+
+class AIRequestRejected(AICheckUnavailable):
+    """上游以4xx拒绝了本次请求（内容过大、格式错误、鉴权失败等），原样重试不会成功"""
+
+
+# 请求肯定没有被上游处理、或上游明确表示可以重试的状态码
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    连续失败达到阈值后打开，打开期间所有调用直接失败；
+    经过reset_timeout后进入半开状态，只放行一个探测请求，成功则关闭，失败则重新打开。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self):
+        """是否放行本次请求"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            # 半开状态只允许一个探测请求
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info('AI审核服务已恢复，熔断器关闭')
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning('AI审核服务连续失败 %s 次，熔断器打开', self._failures)
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class ModerationClient:
+    """AI审核接口客户端"""
+
+    def __init__(self, api_url=None, api_key=None, connect_timeout=None, read_timeout=None,
+                 max_retries=None, backoff_base=None, breaker=None, pool_size=None):
+        self.api_url = api_url or settings.AI_CHECK_API_URL
+        self.api_key = api_key or settings.AI_CHECK_API_KEY
+        self.timeout = (
+            connect_timeout if connect_timeout is not None else settings.AI_CHECK_CONNECT_TIMEOUT,
+            read_timeout if read_timeout is not None else settings.AI_CHECK_READ_TIMEOUT,
+        )
+        self.max_retries = max_retries if max_retries is not None else settings.AI_CHECK_MAX_RETRIES
+        self.backoff_base = backoff_base if backoff_base is not None else settings.AI_CHECK_BACKOFF_BASE
+        self.breaker = breaker or CircuitBreaker(
+            settings.AI_CHECK_BREAKER_THRESHOLD,
+            settings.AI_CHECK_BREAKER_RESET_TIMEOUT,
+        )
+
+        pool_size = pool_size or settings.AI_CHECK_POOL_SIZE
+        self.session = requests.Session()
+        # 重试由本类控制（只重试安全的失败），关闭urllib3自带重试
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {self.api_key}',
+        })
+
+    def _sleep_before_retry(self, attempt, retry_after=None):
+        """全抖动指数退避；上游给出Retry-After时以其为下限"""
+        delay = random.uniform(0, self.backoff_base * (2 ** attempt))
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        time.sleep(delay)
+
+    def post(self, payload, read_timeout=None):
+        """
+        发送审核请求并返回解析后的JSON
+
+        read_timeout用于为单次调用单独指定读超时（如批量审核的单条超时）。
+
+        只在请求确定未被处理时重试：建立连接失败、或上游返回429/502/503/504。
+        读超时不重试（上游可能已经在处理，重试只会让等待时间翻倍）。
+        只有连接失败、超时和上述可重试状态码计入熔断器；其它状态码与请求本身有关
+        （如内容过大），不能因为某一条内容反复失败而对所有用户熔断。
+
+        Raises:
+            CircuitOpen: 熔断器打开
+            AIRequestRejected: 上游返回其它4xx
+            AICheckUnavailable: 重试后仍然失败
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpen('AI审核服务熔断中')
+
+        body = json.dumps(payload)
+        timeout = (self.timeout[0], read_timeout) if read_timeout is not None else self.timeout
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                response = self.session.post(self.api_url, data=body, timeout=timeout)
+            except requests.exceptions.ConnectionError as e:
+                # ConnectTimeout也是ConnectionError的子类；ReadTimeout不是，不在此重试
+                last_error = AICheckUnavailable(f'连接失败: {e}')
+            except requests.exceptions.RequestException as e:
+                self.breaker.record_failure()
+                raise AICheckUnavailable(str(e)) from e
+            else:
+                if response.status_code == 200:
+                    try:
+                        result = response.json()
+                    except ValueError as e:
+                        self.breaker.record_failure()
+                        raise AICheckUnavailable('响应格式错误') from e
+                    if not isinstance(result, dict):
+                        self.breaker.record_failure()
+                        raise AICheckUnavailable('响应格式错误')
+                    self.breaker.record_success()
+                    return result
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    # 上游正常响应了，只是不接受这个请求：不计入熔断（半开状态的探测请求也就此结束）
+                    self.breaker.record_success()
+                    if 400 <= response.status_code < 500:
+                        raise AIRequestRejected(f'HTTP {response.status_code}')
+                    raise AICheckUnavailable(f'HTTP {response.status_code}')
+                last_error = AICheckUnavailable(f'HTTP {response.status_code}')
+                retry_after = response.headers.get('Retry-After')
+
+            if attempt < self.max_retries:
+                self._sleep_before_retry(attempt, retry_after)
+
+        self.breaker.record_failure()
+        raise last_error
+
+    @staticmethod
+    def _parse_result(result):
+        if not isinstance(result, dict):
+            raise AICheckUnavailable('响应格式错误')
+        return {
+            'approved': result.get('approved', False),
+            'reason': result.get('reason', ''),
+            'confidence': result.get('confidence', 0.0)
+        }
+
+    def check(self, content, read_timeout=None):
+        """
+        审核单条内容
+
+        Returns:
+            dict: {'approved': bool, 'reason': str, 'confidence': float}
+        """
+        result = self.post({'content': content, 'check_type': 'text'}, read_timeout=read_timeout)
+        return self._parse_result(result)
+
+    def check_many(self, contents, read_timeout=None):
+        """
+        在一个请求中审核多条内容（需要上游支持数组请求，见AI_CHECK_SUPPORTS_BATCH）
+
+        请求体为 {'contents': [...]}，响应体为 {'results': [...]}，顺序与请求一致。
+
+        Returns:
+            list: 审核结果列表
+        """
+        result = self.post({'contents': list(contents), 'check_type': 'text'}, read_timeout=read_timeout)
+        items = result.get('results')
+        if not isinstance(items, list) or len(items) != len(contents):
+            raise AICheckUnavailable('批量审核响应条数不匹配')
+        return [self._parse_result(item) for item in items]
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    获取当前进程的共享客户端
+
+    按进程ID缓存，gunicorn预加载后fork出的工作进程会各自重新创建连接池，
+    不会共用父进程的socket。
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = ModerationClient()
+                _client_pid = pid
+    return _client
+
+
+def reset_client():
+    """丢弃当前进程的客户端（配置变更后使用）"""
+    global _client, _client_pid
+    with _client_lock:
+        if _client is not None:
+            _client.session.close()
+        _client = None
+        _client_pid = None
@@ -0,0 +1,112 @@
+"""
+本地AI审核接口模拟服务
+用本地敏感词过滤模拟AI审核结果，可配置延迟和故障率，
+用于本地开发和测试客户端的重试/熔断行为，不依赖外部服务。
+"""
+import json
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubModerationHandler(BaseHTTPRequestHandler):
+    """处理 POST /api/check"""
+
+    protocol_version = 'HTTP/1.1'  # 支持keep-alive
+
+    def setup(self):
+        super().setup()
+        # 响应头和响应体分两次写出，关闭Nagle避免与客户端的延迟ACK叠加
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        from .ai_utils import simple_content_filter
+
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length)
+        self.server.request_count += 1
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.server.fail_rate and random.random() < self.server.fail_rate:
+            self._send_json(self.server.fail_status, {'error': 'stub failure'}, {'Retry-After': '0'})
+            return
+
+        try:
+            payload = json.loads(raw or b'{}')
+        except ValueError:
+            self._send_json(400, {'error': 'invalid json'})
+            return
+
+        if isinstance(payload.get('contents'), list):
+            results = [simple_content_filter(str(item)) for item in payload['contents']]
+            self._send_json(200, {'results': results})
+            return
+
+        self._send_json(200, simple_content_filter(str(payload.get('content', ''))))
+
+
+class StubModerationServer:
+    """
+    可在后台线程中运行的模拟服务
+
+    用法：
+        with StubModerationServer(fail_rate=0.5) as server:
+            settings.AI_CHECK_API_URL = server.url
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, fail_rate=0.0, fail_status=503, verbose=False):
+        self.httpd = ThreadingHTTPServer((host, port), StubModerationHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.fail_rate = fail_rate
+        self.httpd.fail_status = fail_status
+        self.httpd.verbose = verbose
+        self.httpd.request_count = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/api/check'
+
+    @property
+    def request_count(self):
+        return self.httpd.request_count
+
+    def configure(self, **options):
+        """运行中修改latency/fail_rate/fail_status"""
+        for key, value in options.items():
+            setattr(self.httpd, key, value)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -2,9 +2,250 @@
 AI审核工具类
 调用AI接口进行内容审核
 """
-import requests
-import json
+import hashlib
+import random
+import re
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import timedelta
+
 from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from .ai_client import AICheckUnavailable, AIRequestRejected, CircuitOpen, get_client
+from .sensitive_words import find_sensitive_words
+
+
+def _call_ai_api(content):
+    """调用AI审核接口（不经过缓存），服务不可用时抛出AICheckUnavailable"""
+    return get_client().check(content)
+
+
+# ---------------------------------------------------------------------------
+# 审核结果缓存
+# ---------------------------------------------------------------------------
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_for_cache(content):
+    """全角转半角、合并空白，使只有排版差异的文本得到相同的缓存键"""
+    text = unicodedata.normalize('NFKC', content or '')
+    return WHITESPACE_RE.sub(' ', text).strip()
+
+
+def content_cache_key(content):
+    """计算内容的缓存键（规范化文本的SHA-256）"""
+    normalized = normalize_for_cache(content)
+    raw = f'{settings.MODERATION_CACHE_VERSION}:{normalized}'
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+# 命中/未命中计数在共享缓存中的键；数据库计数器只由flush_counters定期写入
+COUNTER_PREFIX = 'moderation-cache:counter'
+COUNTER_FLUSH_DUE_KEY = 'moderation-cache:counter-flush-due'
+BUFFERED_COUNTERS = ('hits', 'misses')
+
+
+def _verdict_hits_key(verdict_id):
+    return f'moderation-cache:verdict-hits:{verdict_id}'
+
+
+def _incr_counter(name, amount=1):
+    from .models import ModerationCacheCounter
+
+    updated = ModerationCacheCounter.objects.filter(name=name).update(value=F('value') + amount)
+    if not updated:
+        try:
+            ModerationCacheCounter.objects.create(name=name, value=amount)
+        except IntegrityError:
+            ModerationCacheCounter.objects.filter(name=name).update(value=F('value') + amount)
+
+
+def _cache_incr(key, amount=1, timeout=None):
+    """共享缓存中的原子计数，键不存在时创建"""
+    try:
+        return cache.incr(key, amount)
+    except ValueError:
+        if cache.add(key, amount, timeout):
+            return amount
+        return cache.incr(key, amount)
+
+
+def _take(key):
+    """取出并扣减共享缓存中的计数（用decr扣减，取出期间其他进程累加的计数不会丢失）"""
+    value = cache.get(key) or 0
+    if value:
+        try:
+            cache.decr(key, value)
+        except ValueError:
+            # 键恰好过期或被淘汰
+            return 0
+    return value
+
+
+def flush_counters():
+    """把共享缓存中累加的命中/未命中计数写入数据库计数器"""
+    for name in BUFFERED_COUNTERS:
+        value = _take(f'{COUNTER_PREFIX}:{name}')
+        if value:
+            _incr_counter(name, value)
+
+
+def _count(name):
+    """
+    命中/未命中计数
+
+    每次查询都写数据库计数器会使查询缓存的请求和工作进程在数据库写锁上排队（SQLite整库只有一把写锁），
+    这里只在共享缓存中递增，每MODERATION_CACHE_COUNTER_FLUSH_INTERVAL秒由一个进程写入数据库。
+    """
+    _cache_incr(f'{COUNTER_PREFIX}:{name}')
+    if cache.add(COUNTER_FLUSH_DUE_KEY, 1, settings.MODERATION_CACHE_COUNTER_FLUSH_INTERVAL):
+        flush_counters()
+
+
+def get_cached_verdict(content):
+    """
+    查询缓存的审核结果
+
+    条目的命中次数和最后使用时间（LRU淘汰依据）最多每MODERATION_CACHE_TOUCH_RESOLUTION秒写一次数据库，
+    期间的命中次数累加在共享缓存中，下次写入时一并加上。
+
+    Returns:
+        dict | None: 命中时返回审核结果，未命中或已过期返回None
+    """
+    from .models import ModerationVerdict
+
+    now = timezone.now()
+    key = content_cache_key(content)
+    verdict = ModerationVerdict.objects.filter(content_hash=key, expires_at__gt=now).first()
+    if verdict is None:
+        _count('misses')
+        return None
+
+    _count('hits')
+    hits_key = _verdict_hits_key(verdict.id)
+    if now - verdict.last_used_at < timedelta(seconds=settings.MODERATION_CACHE_TOUCH_RESOLUTION):
+        _cache_incr(hits_key, timeout=settings.MODERATION_CACHE_TTL)
+    else:
+        ModerationVerdict.objects.filter(id=verdict.id).update(
+            hits=F('hits') + _take(hits_key) + 1, last_used_at=now
+        )
+    return {
+        'approved': verdict.approved,
+        'reason': verdict.reason,
+        'confidence': verdict.confidence,
+    }
+
+
+def store_verdict(content, result):
+    """
+    写入审核结果缓存
+
+    只应传入AI接口真实返回的结果；传输层失败不会走到这里，因此不会被缓存。
+    """
+    from .models import ModerationVerdict
+
+    now = timezone.now()
+    ModerationVerdict.objects.update_or_create(
+        content_hash=content_cache_key(content),
+        defaults={
+            'approved': result['approved'],
+            'reason': result.get('reason', ''),
+            'confidence': result.get('confidence', 0.0),
+            'last_used_at': now,
+            'expires_at': now + timedelta(seconds=settings.MODERATION_CACHE_TTL),
+        },
+    )
+
+    # 按概率触发淘汰，避免每次写入都统计行数
+    if random.random() < settings.MODERATION_CACHE_EVICT_PROBABILITY:
+        evict_verdicts()
+
+
+def evict_verdicts():
+    """
+    淘汰缓存：删除过期条目，超出容量时按最近使用时间淘汰最旧的条目
+
+    Returns:
+        int: 删除的条目数
+    """
+    from .models import ModerationVerdict
+
+    deleted, _ = ModerationVerdict.objects.filter(expires_at__lte=timezone.now()).delete()
+
+    overflow = ModerationVerdict.objects.count() - settings.MODERATION_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        stale_ids = list(
+            ModerationVerdict.objects.order_by('last_used_at').values_list('id', flat=True)[:overflow]
+        )
+        evicted, _ = ModerationVerdict.objects.filter(id__in=stale_ids).delete()
+        deleted += evicted
+
+    if deleted:
+        _incr_counter('evictions', deleted)
+    return deleted
+
+
+def get_cache_stats():
+    """
+    审核结果缓存统计
+
+    Returns:
+        dict: {'hits', 'misses', 'evictions', 'entries', 'hit_rate'}
+    """
+    from .models import ModerationCacheCounter, ModerationVerdict
+
+    flush_counters()
+
+    counters = dict(ModerationCacheCounter.objects.values_list('name', 'value'))
+    hits = counters.get('hits', 0)
+    misses = counters.get('misses', 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'evictions': counters.get('evictions', 0),
+        'entries': ModerationVerdict.objects.count(),
+        'hit_rate': hits / total if total else 0.0,
+    }
+
+
+def request_ai_check(content):
+    """
+    调用AI接口审核内容，服务不可用时抛出异常
+    
+    与check_content_by_ai不同，传输层失败不会被转换成"不通过"，
+    供需要区分"内容被拒绝"和"服务不可用"的调用方（如审核队列的重试逻辑）使用。
+    相同内容（规范化后）的审核结果会被缓存，重复提交不再调用AI接口。
+    
+    Args:
+        content (str): 要审核的内容
+    
+    Returns:
+        dict: 审核结果，格式同check_content_by_ai
+    
+    Raises:
+        AICheckUnavailable: AI审核服务不可用
+    """
+    rejected = local_prefilter(content)
+    if rejected is not None:
+        return rejected
+    
+    if not settings.MODERATION_CACHE_ENABLED:
+        return _call_ai_api(content)
+    
+    cached = get_cached_verdict(content)
+    if cached is not None:
+        return cached
+    
+    result = _call_ai_api(content)
+    store_verdict(content, result)
+    return result
 
 
 def check_content_by_ai(content):
@@ -23,47 +264,12 @@ def check_content_by_ai(content):
         }
     """
     try:
-        # 构建请求数据
-        data = {
-            'content': content,
-            'check_type': 'text',
-        }
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {settings.AI_CHECK_API_KEY}',
-        }
-        
-        # 发送请求到AI审核接口
-        response = requests.post(
-            settings.AI_CHECK_API_URL,
-            data=json.dumps(data),
-            headers=headers,
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return {
-                'approved': result.get('approved', False),
-                'reason': result.get('reason', ''),
-                'confidence': result.get('confidence', 0.0)
-            }
-        else:
-            # API调用失败，默认不通过
-            return {
-                'approved': False,
-                'reason': 'AI审核服务暂时不可用',
-                'confidence': 0.0
-            }
-    
-    except requests.exceptions.Timeout:
-        return {
-            'approved': False,
-            'reason': 'AI审核暂不可用',
-            'confidence': 0.0
-        }
-    except requests.exceptions.RequestException:
+        return request_ai_check(content)
+    except CircuitOpen:
+        # 上游故障期间不再等待超时，直接使用本地过滤
+        return simple_content_filter(content)
+    except AICheckUnavailable:
+        # API调用失败，默认不通过
         return {
             'approved': False,
             'reason': 'AI审核暂不可用',
@@ -77,25 +283,196 @@ def check_content_by_ai(content):
         }
 
 
-def batch_check_content(contents):
+def _pack_tasks(texts):
+    """
+    把待审核文本分组为上游请求
+
+    上游支持数组请求时，把短文本按AI_CHECK_BATCH_SIZE打包成一个请求；
+    长文本和不支持数组时每条单独请求。
+
+    Returns:
+        list: [[下标, ...], ...]，每组对应一个上游请求
+    """
+    if not settings.AI_CHECK_SUPPORTS_BATCH:
+        return [[index] for index in range(len(texts))]
+
+    tasks = []
+    pack = []
+    for index, text in enumerate(texts):
+        if len(text) > settings.AI_CHECK_BATCH_ITEM_MAX_CHARS:
+            tasks.append([index])
+            continue
+        pack.append(index)
+        if len(pack) >= settings.AI_CHECK_BATCH_SIZE:
+            tasks.append(pack)
+            pack = []
+    if pack:
+        tasks.append(pack)
+    return tasks
+
+
+def _run_task(texts, read_timeout):
+    """在线程池中执行一个上游请求（不访问数据库）"""
+    client = get_client()
+    if len(texts) == 1:
+        return [client.check(texts[0], read_timeout=read_timeout)]
+    try:
+        return client.check_many(texts, read_timeout=read_timeout)
+    except AIRequestRejected:
+        # 打包请求被拒绝（如整体过大）时逐条重新提交，只有出问题的那条被拒绝
+        results = []
+        for text in texts:
+            try:
+                results.append(client.check(text, read_timeout=read_timeout))
+            except AICheckUnavailable as e:
+                results.append(e)
+        return results
+
+
+def request_ai_check_many(contents, max_workers=None, timeout=None):
+    """
+    并发批量审核，返回值与输入一一对应
+    
+    相同内容只审核一次；命中本地敏感词或缓存的内容不调用AI接口；
+    其余内容按上游能力打包后在有界线程池中并发请求。
+    每个上游请求的读超时为timeout，超时或失败的条目以AICheckUnavailable异常对象返回，
+    不影响其它条目。数据库读写（缓存）都在调用线程中完成。
+    
+    Args:
+        contents (list): 要审核的内容列表
+        max_workers (int): 最大并发请求数，默认AI_CHECK_BATCH_CONCURRENCY
+        timeout (float): 单个请求的读超时（秒），默认AI_CHECK_READ_TIMEOUT
+    
+    Returns:
+        list: 每项为审核结果dict，或AICheckUnavailable实例
+    """
+    contents = list(contents)
+    results = [None] * len(contents)
+    if not contents:
+        return results
+    
+    timeout = timeout if timeout is not None else settings.AI_CHECK_READ_TIMEOUT
+    max_workers = max_workers or settings.AI_CHECK_BATCH_CONCURRENCY
+    
+    # 按缓存键去重
+    positions = {}
+    for index, content in enumerate(contents):
+        positions.setdefault(content_cache_key(content), []).append(index)
+    
+    pending = []
+    for key, indexes in positions.items():
+        content = contents[indexes[0]]
+        # 命中本地敏感词的内容直接不通过，不再调用AI接口
+        cached = local_prefilter(content)
+        if cached is None and settings.MODERATION_CACHE_ENABLED:
+            cached = get_cached_verdict(content)
+        if cached is not None:
+            for index in indexes:
+                results[index] = cached
+        else:
+            pending.append((content, indexes))
+    
+    if not pending:
+        return results
+    
+    texts = [content for content, _ in pending]
+    tasks = _pack_tasks(texts)
+    
+    workers = min(max_workers, len(tasks))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ai-check')
+    timed_out = False
+    try:
+        futures = {
+            executor.submit(_run_task, [texts[i] for i in task], timeout): task
+            for task in tasks
+        }
+        # 单个请求的耗时上限由连接/读超时和重试次数决定，整批按轮次计算总等待上限，
+        # 防止异常的请求卡住整批
+        rounds = -(-len(tasks) // workers)
+        per_request = (settings.AI_CHECK_CONNECT_TIMEOUT + timeout) * (settings.AI_CHECK_MAX_RETRIES + 1)
+        deadline = time.monotonic() + per_request * rounds
+        for future, task in futures.items():
+            try:
+                outcome = future.result(timeout=max(deadline - time.monotonic(), 0))
+            except AICheckUnavailable as e:
+                outcome = [e] * len(task)
+            except FutureTimeout:
+                timed_out = True
+                outcome = [AICheckUnavailable('审核超时')] * len(task)
+            except Exception as e:
+                outcome = [AICheckUnavailable(str(e))] * len(task)
+            
+            for text_index, result in zip(task, outcome):
+                content, indexes = pending[text_index]
+                if settings.MODERATION_CACHE_ENABLED and not isinstance(result, AICheckUnavailable):
+                    store_verdict(content, result)
+                for index in indexes:
+                    results[index] = result
+    finally:
+        # 超时后不等待仍在进行的请求（由各自的读超时结束），未开始的任务直接取消，
+        # 整批的等待上限才真正生效
+        executor.shutdown(wait=not timed_out, cancel_futures=timed_out)
+    
+    return results
+
+
+def batch_check_content(contents, max_workers=None, timeout=None):
     """
     批量审核内容
     
+    并发执行，结果顺序与输入一致；单条失败按check_content_by_ai的规则处理
+    （熔断时使用本地过滤，其它失败默认不通过）。
+    
     Args:
         contents (list): 要审核的内容列表
+        max_workers (int): 最大并发请求数
+        timeout (float): 单个请求的读超时（秒）
     
     Returns:
         list: 审核结果列表
     """
     results = []
     
-    for content in contents:
-        result = check_content_by_ai(content)
+    for content, result in zip(contents, request_ai_check_many(contents, max_workers, timeout)):
+        if isinstance(result, CircuitOpen):
+            result = simple_content_filter(content)
+        elif isinstance(result, AICheckUnavailable):
+            result = {
+                'approved': False,
+                'reason': 'AI审核暂不可用',
+                'confidence': 0.0
+            }
         results.append(result)
     
     return results
 
 
+def _sensitive_word_result(content):
+    """命中敏感词时返回不通过的审核结果（附带全部命中位置），否则返回None"""
+    matches = find_sensitive_words(content)
+    if not matches:
+        return None
+    words = list(dict.fromkeys(match['word'] for match in matches))
+    return {
+        'approved': False,
+        'reason': f"包含敏感词: {'、'.join(words)}",
+        'confidence': 0.9,
+        'matches': matches,
+    }
+
+
+def local_prefilter(content):
+    """
+    本地敏感词预检，在查缓存和调用AI接口之前执行
+    
+    Returns:
+        dict | None: 命中敏感词时返回不通过的审核结果，否则返回None
+    """
+    if not settings.MODERATION_LOCAL_PREFILTER:
+        return None
+    return _sensitive_word_result(content)
+
+
 def simple_content_filter(content):
     """
     简单的本地内容过滤（作为AI审核的备用方案）
@@ -104,23 +481,11 @@ def simple_content_filter(content):
         content (str): 要检查的内容
     
     Returns:
-        dict: 审核结果
+        dict: 审核结果，命中敏感词时附带'matches'（全部命中词及其在原文中的位置）
     """
-    # 敏感词列表（示例）
-    sensitive_words = [
-        '暴力', '色情', '政治敏感', '违法', '广告',
-        # 可以根据需要添加更多敏感词
-    ]
-    
-    content_lower = content.lower()
-    
-    for word in sensitive_words:
-        if word in content_lower:
-            return {
-                'approved': False,
-                'reason': f'包含敏感词: {word}',
-                'confidence': 0.9
-            }
+    rejected = _sensitive_word_result(content)
+    if rejected is not None:
+        return rejected
     
     # 检查内容长度
     if len(content.strip()) < 5:
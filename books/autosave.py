@@ -0,0 +1,514 @@
+"""
+草稿自动保存（写缓冲）
+
+编辑页面每隔AUTO_SAVE_INTERVAL秒保存一次草稿。自动保存请求只修改缓存中的草稿，
+不写数据库；刷写进程（manage.py flush_autosave，或到期后的第一个自动保存请求）
+每隔AUTOSAVE_FLUSH_INTERVAL秒把有修改的草稿合并后用bulk_update写入BookDraft/ChapterDraft。
+同一草稿在一个刷写周期内保存多少次，数据库都只写一次。
+
+版本号：
+    每个草稿有一个递增的版本号，客户端保存时带上它所基于的版本号。
+    版本号相同才接受保存；小于当前版本说明其他窗口已经保存过（过期窗口），返回冲突；
+    大于当前版本说明缓存中的草稿丢失（缓存被清除或淘汰），要求客户端提交完整正文重新同步。
+    同一版本号只对应一份内容，客户端因此可以只提交相对上次保存内容的增量（格式见books.revisions）。
+
+缓存中的条目：
+    books:autosave:chapter:<章节id>  {'version', 'book_id', 'chapter_number', 'author_id', 'title', 'content', 'dirty', 'saved_at'}
+    books:autosave:book:<作品id>     {'version', 'title', 'description', 'dirty', 'saved_at'}
+条目从干净变为有修改时追加一条待刷写记录（booksite.writebehind.PendingLog），
+刷写进程从上次刷写到的位置开始读取，不需要扫描缓存。
+"""
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from booksite.writebehind import PendingLog
+
+from . import revisions
+from .diffs import content_digest
+from .models import Book, BookDraft, Chapter, ChapterDraft, ChapterRevision
+
+
+logger = logging.getLogger(__name__)
+
+CHAPTER_KEY_PREFIX = 'books:autosave:chapter:'
+BOOK_KEY_PREFIX = 'books:autosave:book:'
+FLUSH_LOCK_KEY = 'books:autosave:flush-lock'
+FLUSH_DUE_KEY = 'books:autosave:flush-due'
+
+LOCK_RETRY_DELAY = 0.02
+
+# 待刷写的草稿缓存键
+pending = PendingLog('books:autosave', settings.AUTOSAVE_BUFFER_TTL)
+
+
+class AutoSaveError(Exception):
+    """自动保存失败"""
+
+
+class StaleVersion(AutoSaveError):
+    """客户端基于的版本已经不是最新版本（其他窗口已经保存过）"""
+
+    def __init__(self, version):
+        super().__init__('草稿已在其他窗口中修改，请刷新页面后再编辑')
+        self.version = version
+
+
+class ResyncRequired(AutoSaveError):
+    """缓存中没有客户端基于的版本，需要提交完整内容"""
+
+    def __init__(self, version):
+        super().__init__('草稿缓存已失效，请提交完整内容')
+        self.version = version
+
+
+class Busy(AutoSaveError):
+    """草稿正被其他请求保存"""
+
+
+def chapter_key(chapter_id):
+    return f'{CHAPTER_KEY_PREFIX}{chapter_id}'
+
+
+def book_key(book_id):
+    return f'{BOOK_KEY_PREFIX}{book_id}'
+
+
+@contextmanager
+def _lock(key):
+    """
+    以缓存add实现的短时锁，保证同一草稿的版本号检查和写入不会交错
+
+    锁有超时时间，持有锁的进程崩溃后会自动释放。
+    """
+    lock_key = f'{key}:lock'
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + settings.AUTOSAVE_LOCK_TIMEOUT
+    while not cache.add(lock_key, token, settings.AUTOSAVE_LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            raise Busy('草稿正在保存中，请稍后重试')
+        time.sleep(LOCK_RETRY_DELAY)
+    try:
+        yield
+    finally:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def _store(key, entry, was_dirty):
+    """
+    写回缓存条目；变为有修改，或上次追加待刷写记录已超过一个刷写周期
+    （记录丢失或刷写滞后）时追加待刷写记录，重复的记录在刷写时合并
+    """
+    now = time.time()
+    queue = entry['dirty'] and (
+        not was_dirty or now - entry.get('queued_at', 0) >= settings.AUTOSAVE_FLUSH_INTERVAL
+    )
+    if queue:
+        entry['queued_at'] = now
+    cache.set(key, entry, settings.AUTOSAVE_BUFFER_TTL)
+    if queue:
+        pending.append(key)
+
+
+def _apply_edit(base, value, patch):
+    """
+    计算保存后的文本：有增量时作用到上次保存的内容上，否则直接使用完整内容
+
+    Raises:
+        ValueError: 增量格式错误或与上次保存的内容不匹配
+    """
+    if patch is None:
+        return value or ''
+    ops = revisions.decode_delta(patch)
+    if not isinstance(ops, list) or not all(isinstance(op, (int, str)) and not isinstance(op, bool) for op in ops):
+        raise ValueError('增量格式错误')
+    return revisions.apply_delta(base, ops)
+
+
+def _check_version(entry, version, patched, has_draft):
+    """
+    检查客户端基于的版本；还没有可用的草稿时接受任何完整内容
+
+    Raises:
+        StaleVersion: 客户端版本落后
+        ResyncRequired: 客户端版本超前（缓存丢失），或基于未知版本提交增量
+    """
+    if not has_draft or version is None:
+        if patched:
+            raise ResyncRequired(entry['version'])
+        return
+    if version < entry['version']:
+        raise StaleVersion(entry['version'])
+    if version > entry['version']:
+        raise ResyncRequired(entry['version'])
+
+
+# ---------------------------------------------------------------------------
+# 章节草稿
+# ---------------------------------------------------------------------------
+
+def _load_chapter_entry(chapter):
+    """读取缓存中的章节草稿；不在缓存中时从数据库加载（不标记为有修改）"""
+    entry = cache.get(chapter_key(chapter.id))
+    if entry is not None:
+        return entry
+    draft = (
+        ChapterDraft.objects.filter(book_id=chapter.book_id, chapter_number=chapter.chapter_number)
+        .first()
+    )
+    if draft is not None:
+        content = revisions.draft_content(draft, chapter)
+        if content is not None:
+            return {
+                'version': draft.version, 'book_id': chapter.book_id, 'chapter_number': chapter.chapter_number,
+                'author_id': draft.author_id, 'title': draft.title, 'content': content,
+                'dirty': False, 'saved_at': draft.updated_at.timestamp(),
+            }
+    return {
+        'version': draft.version if draft is not None else 0,
+        'book_id': chapter.book_id, 'chapter_number': chapter.chapter_number,
+        'author_id': None, 'title': None, 'content': None, 'dirty': False, 'saved_at': None,
+    }
+
+
+def save_chapter(chapter, author, version, title, content=None, patch=None):
+    """
+    自动保存章节草稿（只写缓存）
+
+    Args:
+        chapter: 章节（只需要id、book_id、chapter_number，缓存未命中时才读取正文）
+        version (int|None): 客户端基于的版本号
+        content (str): 完整正文，与patch二选一
+        patch (str): 相对上次保存内容的增量（JSON）
+
+    Returns:
+        int: 保存后的版本号
+
+    Raises:
+        StaleVersion, ResyncRequired, Busy, ValueError
+    """
+    key = chapter_key(chapter.id)
+    with _lock(key):
+        entry = _load_chapter_entry(chapter)
+        _check_version(entry, version, patch is not None, entry['content'] is not None)
+        new_content = _apply_edit(entry['content'], content, patch)
+        was_dirty = entry['dirty']
+        entry.update({
+            'version': entry['version'] + 1,
+            'chapter_number': chapter.chapter_number,
+            'author_id': author.id,
+            'title': title,
+            'content': new_content,
+            'dirty': True,
+            'saved_at': time.time(),
+        })
+        _store(key, entry, was_dirty)
+    return entry['version']
+
+
+def load_chapter_draft(book, chapter):
+    """
+    读取章节草稿（缓存中未刷写的修改优先）
+
+    Returns:
+        dict: {'title', 'content', 'updated_at', 'version'}；没有草稿时返回None
+    """
+    entry = cache.get(chapter_key(chapter.id))
+    if entry is not None and entry['content'] is not None:
+        return {
+            'title': entry['title'],
+            'content': entry['content'],
+            'updated_at': datetime.fromtimestamp(entry['saved_at'], tz=dt_timezone.utc),
+            'version': entry['version'],
+        }
+    return revisions.load_draft(book, chapter)
+
+
+def publish_chapter_draft(book, chapter, author, title, content):
+    """
+    提交章节时保存草稿：与缓存中的修改合并为一次写入，草稿立即落库
+
+    缓存中未刷写的草稿被提交的内容取代，版本号在缓存中的版本上加1，
+    其他窗口基于旧版本的自动保存会被拒绝。须在保存章节的事务中调用。
+    """
+    key = chapter_key(chapter.id)
+    with _lock(key):
+        entry = cache.get(key)
+        version = entry['version'] + 1 if entry is not None else None
+        draft = revisions.save_draft(
+            book, chapter.chapter_number, author, title, content, chapter=chapter, version=version,
+        )
+        cache.set(key, {
+            'version': draft.version, 'book_id': book.id, 'chapter_number': chapter.chapter_number,
+            'author_id': author.id, 'title': title, 'content': content,
+            'dirty': False, 'saved_at': time.time(),
+        }, settings.AUTOSAVE_BUFFER_TTL)
+    return draft
+
+
+# ---------------------------------------------------------------------------
+# 作品草稿
+# ---------------------------------------------------------------------------
+
+def _load_book_entry(book):
+    entry = cache.get(book_key(book.id))
+    if entry is not None:
+        return entry
+    draft = BookDraft.objects.filter(book_id=book.id).first()
+    if draft is None:
+        return {'version': 0, 'title': None, 'description': None, 'dirty': False, 'saved_at': None}
+    return {
+        'version': draft.version, 'title': draft.title, 'description': draft.description,
+        'dirty': False, 'saved_at': draft.updated_at.timestamp(),
+    }
+
+
+def save_book(book, version, title, description=None, patch=None):
+    """
+    自动保存作品草稿（只写缓存），参数含义同save_chapter，增量作用于简介
+
+    Returns:
+        int: 保存后的版本号
+    """
+    key = book_key(book.id)
+    with _lock(key):
+        entry = _load_book_entry(book)
+        _check_version(entry, version, patch is not None, entry['description'] is not None)
+        new_description = _apply_edit(entry['description'], description, patch)
+        was_dirty = entry['dirty']
+        entry.update({
+            'version': entry['version'] + 1,
+            'title': title,
+            'description': new_description,
+            'dirty': True,
+            'saved_at': time.time(),
+        })
+        _store(key, entry, was_dirty)
+    return entry['version']
+
+
+def publish_book_draft(book, title, description):
+    """提交作品修改时保存草稿，用法同publish_chapter_draft"""
+    key = book_key(book.id)
+    with _lock(key):
+        entry = _load_book_entry(book)
+        draft = BookDraft.objects.filter(book=book).first() or BookDraft(book=book)
+        draft.title = title
+        draft.description = description
+        draft.version = max(entry['version'], draft.version) + 1
+        draft.save()
+        cache.set(key, {
+            'version': draft.version, 'title': title, 'description': description,
+            'dirty': False, 'saved_at': time.time(),
+        }, settings.AUTOSAVE_BUFFER_TTL)
+    return draft
+
+
+# ---------------------------------------------------------------------------
+# 刷写
+# ---------------------------------------------------------------------------
+
+def _as_datetime(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+
+
+def _flush_chapters(entries):
+    """
+    把章节草稿写入数据库
+
+    Args:
+        entries: {章节id: 条目}
+
+    Returns:
+        dict: {章节id: 已写入（或已无需写入）的版本号}
+    """
+    chapters = {
+        chapter.id: chapter
+        for chapter in Chapter.objects.filter(id__in=entries).only('id', 'book_id', 'chapter_number', 'title', 'content')
+    }
+    # 已删除的章节直接丢弃缓存中的草稿
+    done = {chapter_id: entries[chapter_id]['version'] for chapter_id in entries if chapter_id not in chapters}
+    if not chapters:
+        return done
+
+    # 草稿的基准（已发布内容）须在修订历史中有对应版本，一次查询找出缺少的
+    digests = {chapter_id: content_digest(chapter.content) for chapter_id, chapter in chapters.items()}
+    recorded = set(
+        ChapterRevision.objects.filter(chapter_id__in=chapters, content_hash__in=set(digests.values()))
+        .values_list('chapter_id', 'content_hash')
+    )
+
+    with transaction.atomic():
+        for chapter_id, chapter in chapters.items():
+            if chapter.content and (chapter_id, digests[chapter_id]) not in recorded:
+                revisions.record_revision(chapter, chapter.title, chapter.content, source='published')
+
+        positions = Q()
+        for chapter in chapters.values():
+            positions |= Q(book_id=chapter.book_id, chapter_number=chapter.chapter_number)
+        # 锁定草稿行，避免与同时提交章节时写入的新版本交错（SQLite下写事务本身是串行的）
+        existing = {
+            (draft.book_id, draft.chapter_number): draft
+            for draft in ChapterDraft.objects.select_for_update().filter(positions).defer('content_delta')
+        }
+
+        to_update, to_create = [], []
+        for chapter_id, chapter in chapters.items():
+            entry = entries[chapter_id]
+            done[chapter_id] = entry['version']
+            draft = existing.get((chapter.book_id, chapter.chapter_number))
+            if draft is not None and draft.version >= entry['version']:
+                continue
+            if draft is None:
+                draft = ChapterDraft(book_id=chapter.book_id, chapter_number=chapter.chapter_number)
+                to_create.append(draft)
+            else:
+                to_update.append(draft)
+            draft.author_id = entry['author_id']
+            draft.title = entry['title'] or ''
+            draft.base_hash = digests[chapter_id]
+            draft.content_delta = revisions.encode_delta(revisions.make_delta(chapter.content, entry['content']))
+            draft.version = entry['version']
+            draft.updated_at = _as_datetime(entry['saved_at'])
+
+        batch_size = settings.AUTOSAVE_FLUSH_BATCH_SIZE
+        if to_update:
+            ChapterDraft.objects.bulk_update(
+                to_update, ['author', 'title', 'base_hash', 'content_delta', 'version', 'updated_at'],
+                batch_size=batch_size,
+            )
+        if to_create:
+            ChapterDraft.objects.bulk_create(to_create, batch_size=batch_size)
+    return done
+
+
+def _flush_books(entries):
+    """把作品草稿写入数据库，参数和返回值同_flush_chapters"""
+    done = {}
+    with transaction.atomic():
+        existing = {
+            draft.book_id: draft
+            for draft in BookDraft.objects.select_for_update().filter(book_id__in=entries)
+        }
+        to_update, to_create = [], []
+        for book_id, entry in entries.items():
+            done[book_id] = entry['version']
+            draft = existing.get(book_id)
+            if draft is not None and draft.version >= entry['version']:
+                continue
+            if draft is None:
+                draft = BookDraft(book_id=book_id)
+                to_create.append(draft)
+            else:
+                to_update.append(draft)
+            draft.title = entry['title'] or ''
+            draft.description = entry['description'] or ''
+            draft.version = entry['version']
+            draft.updated_at = _as_datetime(entry['saved_at'])
+
+        batch_size = settings.AUTOSAVE_FLUSH_BATCH_SIZE
+        if to_update:
+            BookDraft.objects.bulk_update(
+                to_update, ['title', 'description', 'version', 'updated_at'], batch_size=batch_size,
+            )
+        if to_create:
+            # 跳过刷写前已被删除的作品
+            alive = set(Book.objects.filter(id__in=[draft.book_id for draft in to_create]).values_list('id', flat=True))
+            BookDraft.objects.bulk_create([draft for draft in to_create if draft.book_id in alive], batch_size=batch_size)
+    return done
+
+
+def _mark_clean(key, version):
+    """刷写成功后把条目标记为干净；刷写期间又有新的保存时重新追加待刷写记录"""
+    with _lock(key):
+        entry = cache.get(key)
+        if entry is None or not entry['dirty']:
+            return
+        if entry['version'] <= version:
+            entry['dirty'] = False
+            cache.set(key, entry, settings.AUTOSAVE_BUFFER_TTL)
+        else:
+            entry['queued_at'] = time.time()
+            cache.set(key, entry, settings.AUTOSAVE_BUFFER_TTL)
+            pending.append(key)
+
+
+def flush():
+    """
+    把缓存中有修改的草稿批量写入数据库
+
+    多个刷写进程同时运行时只有一个真正执行。
+
+    Returns:
+        int: 写入的草稿数；其他进程正在刷写时返回0
+    """
+    if not cache.add(FLUSH_LOCK_KEY, 1, settings.AUTOSAVE_FLUSH_LOCK_TIMEOUT):
+        return 0
+    try:
+        flushed = 0
+        for keys in pending.batches(settings.AUTOSAVE_FLUSH_BATCH_SIZE):
+            entries = cache.get_many(set(keys))
+            chapter_entries, book_entries = {}, {}
+            for key, entry in entries.items():
+                if not entry['dirty']:
+                    continue
+                if key.startswith(CHAPTER_KEY_PREFIX):
+                    chapter_entries[int(key[len(CHAPTER_KEY_PREFIX):])] = entry
+                else:
+                    book_entries[int(key[len(BOOK_KEY_PREFIX):])] = entry
+
+            if chapter_entries:
+                for chapter_id, version in _flush_chapters(chapter_entries).items():
+                    _mark_clean(chapter_key(chapter_id), version)
+            if book_entries:
+                for book_id, version in _flush_books(book_entries).items():
+                    _mark_clean(book_key(book_id), version)
+            flushed += len(chapter_entries) + len(book_entries)
+        return flushed
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+
+
+def maybe_flush():
+    """
+    到期时在当前请求中刷写
+
+    默认关闭，由manage.py flush_autosave刷写；开启AUTOSAVE_FLUSH_IN_REQUEST时
+    （不运行刷写进程的开发环境），由每个刷写周期内的第一个自动保存请求顺带刷写。
+    """
+    if not settings.AUTOSAVE_FLUSH_IN_REQUEST:
+        return 0
+    if not cache.add(FLUSH_DUE_KEY, 1, settings.AUTOSAVE_FLUSH_INTERVAL):
+        return 0
+    try:
+        return flush()
+    except Exception:
+        logger.exception('自动保存草稿刷写失败')
+        return 0
+
+
+def run_flusher(interval=None, once=False):
+    """
+    刷写进程主循环（manage.py flush_autosave）
+
+    Returns:
+        int: 共写入的草稿数
+    """
+    interval = settings.AUTOSAVE_FLUSH_INTERVAL if interval is None else interval
+    total = 0
+    while True:
+        try:
+            total += flush()
+        except Exception:
+            logger.exception('自动保存草稿刷写失败')
+        if once:
+            return total
+        time.sleep(interval)
@@ -0,0 +1,151 @@
+"""
+章节修改对比
+在作者提交修改时计算已发布内容与待审核内容的差异并保存，审核页面直接读取，不重复计算。
+
+先按段落做行级对比，再对被修改的段落做词级对比：汉字逐字比较，英文/数字按单词比较。
+未修改的大段内容只保留前后几行上下文，审核人员只需要看改动部分。
+"""
+import hashlib
+import re
+from difflib import SequenceMatcher
+
+from django.db import transaction
+
+from .models import ChapterReviewDiff
+from .search import CJK_RANGES
+
+
+# 汉字逐字切分，英文/数字按单词切分，空白和标点各自成词
+DIFF_TOKEN_RE = re.compile(f'[{CJK_RANGES}]|\\w+|\\s+|[^\\w\\s]')
+
+# 未修改段落折叠后保留的上下文行数
+CONTEXT_LINES = 2
+
+# 两段文本词数乘积超过该值时不再做词级对比，直接按整段删除/新增显示
+MAX_TOKEN_PRODUCT = 4_000_000
+
+
+def content_digest(text):
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+
+
+def tokenize(text):
+    return DIFF_TOKEN_RE.findall(text)
+
+
+def _append(ops, op, text):
+    """追加差异片段，与前一个同类片段合并"""
+    if not text:
+        return
+    if ops and ops[-1]['op'] == op:
+        ops[-1]['text'] += text
+    else:
+        ops.append({'op': op, 'text': text})
+
+
+def _diff_tokens(ops, old, new):
+    """对一组被修改的段落做词级对比"""
+    old_tokens = tokenize(old)
+    new_tokens = tokenize(new)
+    if len(old_tokens) * len(new_tokens) > MAX_TOKEN_PRODUCT:
+        _append(ops, 'delete', old)
+        _append(ops, 'insert', new)
+        return
+
+    matcher = SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            _append(ops, 'equal', ''.join(old_tokens[i1:i2]))
+        else:
+            _append(ops, 'delete', ''.join(old_tokens[i1:i2]))
+            _append(ops, 'insert', ''.join(new_tokens[j1:j2]))
+
+
+def _equal_lines(ops, lines, first, last):
+    """追加未修改的段落，中间部分折叠"""
+    if len(lines) > CONTEXT_LINES * 2 + 1:
+        head = [] if first else lines[:CONTEXT_LINES]
+        tail = [] if last else lines[-CONTEXT_LINES:]
+        skipped = len(lines) - len(head) - len(tail)
+        if head:
+            _append(ops, 'equal', '\n'.join(head) + '\n')
+        ops.append({'op': 'skip', 'text': '', 'lines': skipped})
+        if tail:
+            _append(ops, 'equal', '\n'.join(tail) + '\n')
+    else:
+        _append(ops, 'equal', '\n'.join(lines) + '\n')
+
+
+def compute_diff(old, new):
+    """
+    计算两段文本的差异
+
+    Returns:
+        dict: {'ops': [{'op': 'equal'|'insert'|'delete'|'skip', 'text': str}, ...],
+               'inserted': 新增字符数, 'deleted': 删除字符数}
+    """
+    old_lines = (old or '').splitlines()
+    new_lines = (new or '').splitlines()
+    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    opcodes = matcher.get_opcodes()
+
+    ops = []
+    for index, (tag, i1, i2, j1, j2) in enumerate(opcodes):
+        if tag == 'equal':
+            _equal_lines(ops, old_lines[i1:i2], index == 0, index == len(opcodes) - 1)
+        elif tag == 'delete':
+            _append(ops, 'delete', '\n'.join(old_lines[i1:i2]) + '\n')
+        elif tag == 'insert':
+            _append(ops, 'insert', '\n'.join(new_lines[j1:j2]) + '\n')
+        else:
+            _diff_tokens(ops, '\n'.join(old_lines[i1:i2]) + '\n', '\n'.join(new_lines[j1:j2]) + '\n')
+
+    return {
+        'ops': ops,
+        'inserted': sum(len(op['text'].strip()) for op in ops if op['op'] == 'insert'),
+        'deleted': sum(len(op['text'].strip()) for op in ops if op['op'] == 'delete'),
+    }
+
+
+def store_chapter_diff(chapter):
+    """
+    计算并保存章节已发布内容与待审核内容的差异（作者提交修改时调用）
+
+    没有待审核内容或没有已发布内容（新章节）时删除旧的对比结果。
+    """
+    if not chapter.content_pending or not chapter.content:
+        # 新章节没有已发布内容，审核页面直接显示全文
+        ChapterReviewDiff.objects.filter(chapter_id=chapter.id).delete()
+        return None
+
+    diff = compute_diff(chapter.content, chapter.content_pending)
+    with transaction.atomic():
+        record, _ = ChapterReviewDiff.objects.update_or_create(
+            chapter_id=chapter.id,
+            defaults={
+                'base_hash': content_digest(chapter.content),
+                'pending_hash': content_digest(chapter.content_pending),
+                'ops': diff['ops'],
+                'inserted': diff['inserted'],
+                'deleted': diff['deleted'],
+            },
+        )
+    return record
+
+
+def get_chapter_diff(chapter):
+    """
+    获取章节的修改对比
+
+    已保存的结果与当前内容不一致（例如已发布内容在提交后又被更新）时重新计算。
+    """
+    if not chapter.content_pending or not chapter.content:
+        return None
+    record = ChapterReviewDiff.objects.filter(chapter_id=chapter.id).first()
+    if (
+        record is None
+        or record.base_hash != content_digest(chapter.content)
+        or record.pending_hash != content_digest(chapter.content_pending)
+    ):
+        record = store_chapter_diff(chapter)
+    return record
@@ -0,0 +1,86 @@
+"""
+压缩存储的文本字段
+章节正文、待审核正文、章节草稿和审核任务中的待审内容都是大段文本，按zlib压缩后以二进制存储，
+数据库文件和页缓存占用通常能减少一半以上。
+
+存储格式：1字节格式头 + 数据
+    0x00  未压缩的UTF-8（短文本或压缩后没有变小）
+    0x01  zlib压缩的UTF-8
+其他首字节视为转换前写入的纯文本（正常文本不会以这两个控制字符开头），
+因此迁移可以分批进行，未转换的行照常读取。
+"""
+import zlib
+
+from django.db import models
+
+
+FORMAT_PLAIN = b'\x00'
+FORMAT_ZLIB = b'\x01'
+
+# 小于该字节数的文本不压缩（压缩收益不抵格式开销）
+COMPRESS_MIN_BYTES = 256
+COMPRESS_LEVEL = 6
+
+
+def compress_text(text):
+    """文本编码为带格式头的字节串"""
+    data = text.encode('utf-8')
+    if len(data) >= COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(data, COMPRESS_LEVEL)
+        if len(compressed) < len(data):
+            return FORMAT_ZLIB + compressed
+    return FORMAT_PLAIN + data
+
+
+def decompress_text(value):
+    """带格式头的字节串（或转换前的纯文本）解码为文本"""
+    if isinstance(value, str):
+        return value
+    value = bytes(value)
+    header, payload = value[:1], value[1:]
+    if header == FORMAT_ZLIB:
+        return zlib.decompress(payload).decode('utf-8')
+    if header == FORMAT_PLAIN:
+        return payload.decode('utf-8')
+    return value.decode('utf-8')
+
+
+def is_compressed(value):
+    """数据库中的原始值是否已经是带格式头的存储格式"""
+    return isinstance(value, (bytes, memoryview)) and bytes(value[:1]) in (FORMAT_PLAIN, FORMAT_ZLIB)
+
+
+class CompressedTextField(models.TextField):
+    """
+    压缩存储的文本字段
+
+    在Python中与TextField完全一样（读写str，管理后台使用多行文本框），数据库列为二进制类型。
+    读取时在from_db_value中解压，values()/values_list()返回的也是文本；
+    列表类查询应通过only()/defer()跳过这些列，只在真正使用正文时才读取和解压。
+    压缩后的列不支持在数据库中做包含/模糊查询，正文搜索请使用全文索引（books.search）。
+    """
+
+    def get_internal_type(self):
+        return 'BinaryField'
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return decompress_text(value)
+
+    def to_python(self, value):
+        if isinstance(value, (bytes, memoryview)):
+            return decompress_text(value)
+        return super().to_python(value)
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None:
+            return value
+        return compress_text(value)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        value = super().get_db_prep_value(value, connection, prepared)
+        if value is not None:
+            return connection.Database.Binary(value)
+        return value
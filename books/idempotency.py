@@ -0,0 +1,120 @@
+"""
+创建类接口的幂等键
+客户端在请求头Idempotency-Key（或表单字段idempotency_key）中携带同一个键重试时，
+直接返回第一次成功的响应，不会重复创建作品/章节，也不会因为唯一约束冲突而报错。
+
+幂等键记录与业务数据在同一个事务中写入：并发的重复请求在唯一约束上排队，
+前一个请求提交后再读取它记录的响应。请求失败时幂等键随事务回滚，客户端可以用同一个键重试。
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+
+IDEMPOTENCY_KEY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_KEY_FIELD = 'idempotency_key'
+MAX_KEY_LENGTH = 64
+
+# 计算请求参数哈希时忽略的表单字段
+IGNORED_FIELDS = {'csrfmiddlewaretoken', IDEMPOTENCY_KEY_FIELD}
+
+
+def get_idempotency_key(request):
+    return (request.headers.get(IDEMPOTENCY_KEY_HEADER) or request.POST.get(IDEMPOTENCY_KEY_FIELD) or '').strip()
+
+
+def request_digest(request):
+    """请求路径和参数的哈希，同一个键用于不同请求时拒绝重放"""
+    if request.POST:
+        params = sorted(
+            (name, value)
+            for name, values in request.POST.lists() if name not in IGNORED_FIELDS
+            for value in values
+        )
+        payload = json.dumps(params, ensure_ascii=False)
+    else:
+        payload = request.body.decode('utf-8', 'replace')
+    return hashlib.sha256(f'{request.path}\n{payload}'.encode('utf-8')).hexdigest()
+
+
+def _replay(record, digest):
+    if record.request_hash != digest:
+        return JsonResponse({'success': False, 'error': '幂等键已用于其他请求'}, status=422)
+    response = JsonResponse(record.response, status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _should_store(response):
+    """只记录成功的JSON响应，失败的请求允许用同一个键重试"""
+    if response.status_code >= 400 or not response.get('Content-Type', '').startswith('application/json'):
+        return None
+    try:
+        data = json.loads(response.content)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) and data.get('success') else None
+
+
+def idempotent(scope):
+    """
+    视图装饰器：按 (用户, scope, 幂等键) 保证同一请求只执行一次
+
+    未携带幂等键或未登录的请求照常执行。类视图的方法通过method_decorator使用。
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            key = get_idempotency_key(request)
+            if not key or not request.user.is_authenticated:
+                return view_func(request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return JsonResponse({'success': False, 'error': '幂等键过长'}, status=400)
+
+            digest = request_digest(request)
+            records = IdempotencyKey.objects.filter(user=request.user, scope=scope, key=key)
+            cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+            record = records.first()
+            if record is not None:
+                if record.created_at >= cutoff:
+                    return _replay(record, digest)
+                records.filter(created_at__lt=cutoff).delete()
+
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        record = IdempotencyKey.objects.create(
+                            user=request.user, scope=scope, key=key, request_hash=digest,
+                        )
+                except IntegrityError:
+                    # 并发的重复请求：等前一个请求提交后返回它的结果
+                    record = None
+                if record is None:
+                    return _replay(records.get(), digest)
+
+                response = view_func(request, *args, **kwargs)
+                data = _should_store(response)
+                if data is None:
+                    transaction.set_rollback(True)
+                    return response
+                record.status_code = response.status_code
+                record.response = data
+                record.save(update_fields=['status_code', 'response'])
+            return response
+        return wrapper
+    return decorator
+
+
+def purge_expired():
+    """删除过期的幂等键，返回删除的条数"""
+    cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,68 @@
+import random
+import string
+import time
+import uuid
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from PIL import Image, ImageDraw, ImageFont
+
+from accounts import captcha
+
+
+def _render_inline():
+    """原来的generate_captcha：每张都新建图片、加载字体、RGB编码"""
+    code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
+    image = Image.new('RGB', (120, 50), color='white')
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default()
+    draw.text((20, 10), code, fill='black', font=font)
+    for _ in range(3):
+        draw.line([(random.randint(0, 120), random.randint(0, 50)), (random.randint(0, 120), random.randint(0, 50))],
+                  fill='gray', width=1)
+    buffer = BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = '验证码吞吐量基准：逐张现场渲染、成批渲染、从池中发出'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=500, help='每项测量的验证码数')
+
+    def _rate(self, label, count, func):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{label:<24}{count / elapsed:>10.0f} 张/秒  平均 {elapsed / count * 1000:.3f} ms')
+        return count / elapsed
+
+    def handle(self, *args, **options):
+        count = options['count']
+        self.stdout.write(f'缓存后端 {settings.CACHES["default"]["BACKEND"]}，每项 {count} 张')
+
+        inline = self._rate('逐张现场渲染（原实现）', count, lambda: [_render_inline() for _ in range(count)])
+        self._rate('成批渲染', count, lambda: captcha.render_batch(count))
+
+        # 使用同一缓存后端，但换用独立的键前缀，不会取走线上验证码池中的图片
+        isolated = {
+            **settings.CACHES,
+            'default': {**settings.CACHES['default'], 'KEY_PREFIX': f'bench-captcha-{uuid.uuid4().hex}'},
+        }
+        with override_settings(CACHES=isolated):
+            try:
+                # 池大小临时设为count，补满后全部从池中取出
+                with override_settings(CAPTCHA_POOL_SIZE=count):
+                    captcha.refill()
+                pooled = self._rate('从池中发出', count, lambda: [captcha.issue() for _ in range(count)])
+                # 池已取空，之后的请求现场渲染
+                self._rate('池为空时发出', count, lambda: [captcha.issue() for _ in range(count)])
+            finally:
+                # 发出的答案按CAPTCHA_TTL过期，池序号不过期，需要删除
+                cache.delete_many([captcha.HEAD_KEY, captcha.TAKE_KEY])
+
+        self.stdout.write(self.style.SUCCESS(f'从池中发出是逐张现场渲染的 {pooled / inline:.1f} 倍'))
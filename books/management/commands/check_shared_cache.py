@@ -0,0 +1,81 @@
+import multiprocessing
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _worker(prefix, index, iterations):
+    """
+    子进程（spawn启动，不继承父进程的任何缓存状态）：
+    原子递增计数；用add实现的锁保护一段非原子的读-改-写；写入一个只有本进程知道的值
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'booksite.settings')
+    import django
+    django.setup()
+    from django.core.cache import cache
+
+    lock_key = f'{prefix}:lock'
+    for _ in range(iterations):
+        cache.incr(f'{prefix}:counter')
+        while not cache.add(lock_key, index, 10):
+            time.sleep(0.001)
+        try:
+            value = cache.get(f'{prefix}:guarded')
+            cache.set(f'{prefix}:guarded', value + 1, 60)
+        finally:
+            cache.delete(lock_key)
+    cache.set(f'{prefix}:worker:{index}', f'from-{os.getpid()}', 60)
+
+
+class Command(BaseCommand):
+    help = '用多个进程并发读写缓存，检查缓存是否在进程间共享、incr和add是否原子（多进程部署前的自检）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4, help='进程数')
+        parser.add_argument('--iterations', type=int, default=200, help='每个进程的递增次数')
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        iterations = options['iterations']
+        prefix = f'check-shared-cache:{uuid.uuid4().hex}'
+        backend = settings.CACHES['default']['BACKEND']
+        self.stdout.write(f'缓存后端 {backend}，{processes} 个进程 × {iterations} 次')
+
+        cache.set(f'{prefix}:counter', 0, 60)
+        cache.set(f'{prefix}:guarded', 0, 60)
+
+        context = multiprocessing.get_context('spawn')
+        started = time.perf_counter()
+        workers = [context.Process(target=_worker, args=(prefix, i, iterations)) for i in range(processes)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        expected = processes * iterations
+        counter = cache.get(f'{prefix}:counter')
+        guarded = cache.get(f'{prefix}:guarded')
+        visible = cache.get_many([f'{prefix}:worker:{i}' for i in range(processes)])
+        cache.delete_many(
+            [f'{prefix}:counter', f'{prefix}:guarded'] + [f'{prefix}:worker:{i}' for i in range(processes)]
+        )
+
+        failures = []
+        if any(worker.exitcode != 0 for worker in workers):
+            failures.append('有子进程异常退出')
+        if counter != expected:
+            failures.append(f'incr计数 {counter}，应为 {expected}')
+        if guarded != expected:
+            failures.append(f'add锁保护的计数 {guarded}，应为 {expected}')
+        if len(visible) != processes:
+            failures.append(f'只读到 {len(visible)}/{processes} 个子进程写入的值')
+
+        self.stdout.write(f'incr计数 {counter}，锁保护计数 {guarded}，子进程写入可见 {len(visible)}/{processes}，耗时 {elapsed:.2f}s')
+        if failures:
+            raise CommandError('缓存未通过多进程检查：' + '；'.join(failures))
+        self.stdout.write(self.style.SUCCESS('缓存在进程间共享，incr和add均为原子操作'))
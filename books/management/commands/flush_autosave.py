@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from books.autosave import run_flusher
+
+
+class Command(BaseCommand):
+    help = '运行自动保存草稿刷写进程，定期把缓存中的草稿批量写入数据库'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=settings.AUTOSAVE_FLUSH_INTERVAL,
+                            help='刷写间隔（秒）')
+        parser.add_argument('--once', action='store_true', help='刷写一次后退出')
+
+    def handle(self, *args, **options):
+        try:
+            flushed = run_flusher(interval=options['interval'], once=options['once'])
+        except KeyboardInterrupt:
+            self.stdout.write('刷写进程已停止')
+            return
+        self.stdout.write(self.style.SUCCESS(f'共写入 {flushed} 个草稿'))
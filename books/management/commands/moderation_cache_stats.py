@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from books.ai_utils import evict_verdicts, get_cache_stats
+
+
+class Command(BaseCommand):
+    help = '查看AI审核结果缓存的命中统计'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--evict', action='store_true', help='先执行一次过期/超量淘汰')
+
+    def handle(self, *args, **options):
+        if options['evict']:
+            deleted = evict_verdicts()
+            self.stdout.write(f'已淘汰 {deleted} 条缓存')
+
+        stats = get_cache_stats()
+        self.stdout.write(f"缓存条目: {stats['entries']}")
+        self.stdout.write(f"命中: {stats['hits']}  未命中: {stats['misses']}  淘汰: {stats['evictions']}")
+        self.stdout.write(f"命中率: {stats['hit_rate']:.1%}（节省 {stats['hits']} 次AI调用）")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from accounts import tokens
+
+
+class Command(BaseCommand):
+    help = '分批删除已过期的用户令牌（可由cron定期执行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='每批删除条数（默认TOKEN_PURGE_BATCH_SIZE）')
+        parser.add_argument('--pause', type=float, default=None, help='批间暂停秒数（默认TOKEN_PURGE_PAUSE）')
+
+    def handle(self, *args, **options):
+        deleted = tokens.purge_expired(batch_size=options['batch_size'], pause=options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'已删除 {deleted} 个过期令牌'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from books import idempotency
+
+
+class Command(BaseCommand):
+    help = '删除超过IDEMPOTENCY_KEY_TTL的幂等键记录（可由cron定期执行）'
+
+    def handle(self, *args, **options):
+        deleted = idempotency.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'已删除 {deleted} 条过期幂等键'))
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from booksite.ratelimit import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = '查看各接口限流策略的拒绝次数'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='显示后清零')
+
+    def handle(self, *args, **options):
+        if not settings.RATELIMIT_ENABLED:
+            self.stdout.write('限流未启用（RATELIMIT_ENABLED=False）')
+        stats = get_stats()
+        for label, rejected in stats.items():
+            self.stdout.write(f'{label:<32}{rejected:>10}')
+        self.stdout.write(f'共拒绝 {sum(stats.values())} 次请求')
+        if options['reset']:
+            reset_stats()
+            self.stdout.write('已清零')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from books import review_queue
+
+
+class Command(BaseCommand):
+    help = '重建管理员审核队列和面板统计计数'
+
+    def handle(self, *args, **options):
+        counts = review_queue.rebuild()
+        for name, value in counts.items():
+            self.stdout.write(f'{name}: {value}')
+        self.stdout.write(self.style.SUCCESS('审核队列和统计计数重建完成'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from books import search
+
+
+class Command(BaseCommand):
+    help = '重建作品/章节全文搜索索引'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stderr.write('当前数据库不支持FTS5全文搜索')
+            return
+        count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'索引重建完成，共 {count} 条'))
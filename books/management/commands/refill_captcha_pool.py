@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.captcha import run_refiller
+
+
+class Command(BaseCommand):
+    help = '运行验证码补充进程，定期把预渲染的验证码补充到共享缓存中的验证码池'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=settings.CAPTCHA_REFILL_INTERVAL,
+                            help='补充间隔（秒）')
+        parser.add_argument('--once', action='store_true', help='补满一次后退出')
+
+    def handle(self, *args, **options):
+        try:
+            added = run_refiller(interval=options['interval'], once=options['once'])
+        except KeyboardInterrupt:
+            self.stdout.write('补充进程已停止')
+            return
+        self.stdout.write(self.style.SUCCESS(f'共放入 {added} 张验证码'))
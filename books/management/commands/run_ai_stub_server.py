@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from books.ai_stub import StubModerationServer
+
+
+class Command(BaseCommand):
+    help = '启动本地AI审核模拟服务（用本地敏感词过滤模拟审核结果）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument('--latency', type=float, default=0.0, help='每个请求的模拟延迟（秒）')
+        parser.add_argument('--fail-rate', type=float, default=0.0, help='随机返回错误的比例（0~1）')
+        parser.add_argument('--fail-status', type=int, default=503, help='模拟错误时返回的状态码')
+
+    def handle(self, *args, **options):
+        server = StubModerationServer(
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'],
+            fail_rate=options['fail_rate'],
+            fail_status=options['fail_status'],
+            verbose=True,
+        )
+        self.stdout.write(f'AI审核模拟服务已启动: {server.url}')
+        self.stdout.write(f'请设置 AI_CHECK_API_URL={server.url}')
+        try:
+            server.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.httpd.server_close()
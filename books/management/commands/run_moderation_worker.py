@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from books.moderation import run_worker
+
+
+class Command(BaseCommand):
+    help = '运行AI审核任务工作进程'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=settings.MODERATION_WORKER_THREADS,
+                            help='线程池大小（同时进行的AI请求数上限）')
+        parser.add_argument('--batch-size', type=int, default=None, help='每批领取的任务数')
+        parser.add_argument('--poll-interval', type=float, default=settings.MODERATION_POLL_INTERVAL,
+                            help='没有任务时的轮询间隔（秒）')
+        parser.add_argument('--once', action='store_true', help='处理完当前到期的任务后退出')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"审核工作进程启动，线程数 {options['threads']}")
+        try:
+            processed = run_worker(
+                threads=options['threads'],
+                batch_size=options['batch_size'],
+                poll_interval=options['poll_interval'],
+                once=options['once'],
+            )
+        except KeyboardInterrupt:
+            self.stdout.write('审核工作进程已停止')
+            return
+        self.stdout.write(self.style.SUCCESS(f'共处理 {processed} 个审核任务'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from accounts.smtp_stub import StubSMTPServer
+
+
+class Command(BaseCommand):
+    help = '启动本地SMTP调试服务（打印收到的邮件，统计连接数）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=1025)
+        parser.add_argument('--latency', type=float, default=0.0, help='每封邮件的模拟延迟（秒）')
+        parser.add_argument('--fail-rate', type=float, default=0.0, help='随机拒收（451）的比例（0~1）')
+
+    def handle(self, *args, **options):
+        stub = StubSMTPServer(
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'],
+            fail_rate=options['fail_rate'],
+            verbose=True,
+        )
+        self.stdout.write(f'SMTP调试服务已启动: {stub.host}:{stub.port}')
+        self.stdout.write(
+            f'请设置 EMAIL_BACKEND=django.core.mail.backends.smtp.EmailBackend '
+            f'EMAIL_HOST={stub.host} EMAIL_PORT={stub.port} EMAIL_USE_TLS=False'
+        )
+        try:
+            stub.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stdout.write(f'共 {stub.connection_count} 个连接，{len(stub.messages)} 封邮件')
+            stub.server.server_close()
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.outbox import run_worker
+
+
+class Command(BaseCommand):
+    help = '运行邮件发送进程，按批发送待发送邮件（同一批复用一个SMTP连接）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+                            help='每批领取的邮件数')
+        parser.add_argument('--poll-interval', type=float, default=settings.EMAIL_OUTBOX_POLL_INTERVAL,
+                            help='没有邮件时的轮询间隔（秒）')
+        parser.add_argument('--once', action='store_true', help='发送完当前到期的邮件后退出')
+
+    def handle(self, *args, **options):
+        try:
+            processed = run_worker(
+                batch_size=options['batch_size'],
+                poll_interval=options['poll_interval'],
+                once=options['once'],
+            )
+        except KeyboardInterrupt:
+            self.stdout.write('邮件发送进程已停止')
+            return
+        self.stdout.write(self.style.SUCCESS(f'共处理 {processed} 封邮件'))
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.23 on 2026-10-17 03:41
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def backfill_is_public(apps, schema_editor):
+    """根据现有审核状态回填is_public（管理员结果优先于AI结果）"""
+    Book = apps.get_model('books', 'Book')
+    title_approved = (
+        Q(adm_check_title='approved') |
+        Q(adm_check_title__isnull=True, ai_check_title='approved')
+    )
+    description_approved = (
+        Q(adm_check_description='approved') |
+        Q(adm_check_description__isnull=True, ai_check_description='approved')
+    )
+    Book.objects.filter(title_approved & description_approved).update(is_public=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0002_remove_book_mongodb_id_chapterdraft_chapter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='is_public',
+            field=models.BooleanField(default=False, editable=False, verbose_name='是否公开'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['is_public', '-updated_at'], name='books_public_updated_idx'),
+        ),
+        migrations.RunPython(backfill_is_public, migrations.RunPython.noop),
+    ]
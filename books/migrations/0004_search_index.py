@@ -0,0 +1,100 @@
+# Generated by Django 4.2.23 on 2026-10-17 04:10
+
+import re
+import unicodedata
+
+from django.db import migrations
+from django.db.models import Q
+
+
+# 以下为创建本迁移时books.search中的分词和rowid规则（冻结的副本，之后修改books.search不影响本迁移）
+SEARCH_TABLE = 'search_index'
+
+KIND_CODES = {'chapter': 0, 'book': 1}
+
+CJK_RANGES = (
+    '\u3040-\u30ff'   # 日文假名
+    '\u3400-\u4dbf'   # CJK扩展A
+    '\u4e00-\u9fff'   # CJK统一汉字
+    '\uac00-\ud7af'   # 韩文音节
+    '\uf900-\ufaff'   # CJK兼容汉字
+)
+TOKEN_RE = re.compile(f'([{CJK_RANGES}]+)|([^\\W_{CJK_RANGES}]+)')
+
+
+def segment(text):
+    """把文本切分成以空格分隔的词序列（CJK按重叠二元组切分，末尾单字也写入）"""
+    tokens = []
+    for cjk, word in TOKEN_RE.findall(unicodedata.normalize('NFKC', text or '').lower()):
+        if len(cjk) == 1:
+            tokens.append(cjk)
+        elif cjk:
+            tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+            tokens.append(cjk[-1])
+        else:
+            tokens.append(word)
+    return ' '.join(tokens)
+
+
+def entry_rowid(kind, object_id):
+    return object_id * 2 + KIND_CODES[kind]
+
+
+def create_search_index(apps, schema_editor):
+    """创建FTS5虚拟表并写入现有的作品和已审核通过的章节"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5('
+        f'kind UNINDEXED, book_id UNINDEXED, title, body, '
+        f"tokenize = 'unicode61 remove_diacritics 2')"
+    )
+
+    Book = apps.get_model('books', 'Book')
+    Chapter = apps.get_model('books', 'Chapter')
+    insert_sql = (
+        f'INSERT INTO {SEARCH_TABLE} (rowid, kind, book_id, title, body) '
+        f'VALUES (%s, %s, %s, %s, %s)'
+    )
+
+    with schema_editor.connection.cursor() as cursor:
+        for book in Book.objects.only('id', 'title', 'description').iterator():
+            cursor.execute(insert_sql, [
+                entry_rowid('book', book.id), 'book', book.id,
+                segment(book.title), segment(book.description),
+            ])
+
+        title_approved = (
+            Q(adm_check_title='approved') |
+            Q(adm_check_title__isnull=True, ai_check_title='approved')
+        )
+        content_approved = (
+            Q(adm_check_content='approved') |
+            Q(adm_check_content__isnull=True, ai_check_content='approved')
+        )
+        chapters = Chapter.objects.filter(title_approved & content_approved).only(
+            'id', 'book_id', 'title', 'content'
+        )
+        for chapter in chapters.iterator():
+            cursor.execute(insert_sql, [
+                entry_rowid('chapter', chapter.id), 'chapter', chapter.book_id,
+                segment(chapter.title), segment(chapter.content),
+            ])
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0003_book_is_public'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
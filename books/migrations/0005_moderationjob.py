@@ -0,0 +1,40 @@
+# Generated by Django 4.2.23 on 2026-10-17 03:45
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModerationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_type', models.CharField(choices=[('book', '作品'), ('chapter', '章节'), ('comment', '评论')], max_length=20, verbose_name='审核对象类型')),
+                ('target_id', models.BigIntegerField(verbose_name='审核对象ID')),
+                ('field', models.CharField(max_length=20, verbose_name='审核字段')),
+                ('content', models.TextField(verbose_name='提交审核的内容')),
+                ('status', models.CharField(choices=[('queued', '排队中'), ('running', '执行中'), ('done', '已完成'), ('cancelled', '已取消'), ('dead', '失败')], default='queued', max_length=20, verbose_name='任务状态')),
+                ('attempts', models.IntegerField(default=0, verbose_name='已尝试次数')),
+                ('next_run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='下次执行时间')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='开始执行时间')),
+                ('last_error', models.TextField(blank=True, verbose_name='最近错误')),
+                ('result_approved', models.BooleanField(blank=True, null=True, verbose_name='审核结果')),
+                ('result_reason', models.TextField(blank=True, verbose_name='审核原因')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': 'AI审核任务',
+                'verbose_name_plural': 'AI审核任务',
+                'db_table': 'moderation_jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'next_run_at'], name='moderation_status_run_idx'), models.Index(fields=['target_type', 'target_id', 'field'], name='moderation_target_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.23 on 2026-10-17 03:46
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_moderationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModerationCacheCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='名称')),
+                ('value', models.BigIntegerField(default=0, verbose_name='计数')),
+            ],
+            options={
+                'verbose_name': 'AI审核缓存计数',
+                'verbose_name_plural': 'AI审核缓存计数',
+                'db_table': 'moderation_cache_counters',
+            },
+        ),
+        migrations.CreateModel(
+            name='ModerationVerdict',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True, verbose_name='内容哈希')),
+                ('approved', models.BooleanField(verbose_name='是否通过')),
+                ('reason', models.TextField(blank=True, verbose_name='原因')),
+                ('confidence', models.FloatField(default=0.0, verbose_name='置信度')),
+                ('hits', models.IntegerField(default=0, verbose_name='命中次数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='最后使用时间')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='过期时间')),
+            ],
+            options={
+                'verbose_name': 'AI审核结果缓存',
+                'verbose_name_plural': 'AI审核结果缓存',
+                'db_table': 'moderation_verdicts',
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.23 on 2026-10-17 03:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_moderation_verdict_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChapterChunkApproval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chunk_hash', models.CharField(max_length=64, verbose_name='段落块哈希')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('chapter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='approved_chunks', to='books.chapter', verbose_name='章节')),
+            ],
+            options={
+                'verbose_name': '已审核段落块',
+                'verbose_name_plural': '已审核段落块',
+                'db_table': 'chapter_chunk_approvals',
+                'unique_together': {('chapter', 'chunk_hash')},
+            },
+        ),
+    ]
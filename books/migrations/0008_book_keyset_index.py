@@ -0,0 +1,21 @@
+# Generated by Django 4.2.23 on 2026-10-17 03:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_chapterchunkapproval'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='book',
+            name='books_public_updated_idx',
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['is_public', '-updated_at', '-id'], name='books_public_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 4.2.23 on 2026-10-17 03:55
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def needs_review(*fields):
+    """任一字段AI审核中，或AI审核不通过且管理员尚未审核"""
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f'ai_check_{field}': 'pending'})
+        condition |= Q(**{f'ai_check_{field}': 'rejected', f'adm_check_{field}__isnull': True})
+    return condition
+
+
+def backfill_review_queue(apps, schema_editor):
+    """根据现有审核状态填充审核队列和面板计数"""
+    User = apps.get_model('accounts', 'User')
+    Book = apps.get_model('books', 'Book')
+    Chapter = apps.get_model('books', 'Chapter')
+    Comment = apps.get_model('comments', 'Comment')
+    ReviewQueueItem = apps.get_model('books', 'ReviewQueueItem')
+    DashboardCounter = apps.get_model('books', 'DashboardCounter')
+
+    items = []
+    books = Book.objects.filter(needs_review('title', 'description')).select_related('author')
+    for book in books.only('id', 'title', 'title_pending', 'updated_at', 'author__display_name', 'author__email'):
+        items.append(ReviewQueueItem(
+            target_type='book', target_id=book.id, book_id=book.id,
+            title=book.title or book.title_pending or '',
+            author_name=book.author.display_name or book.author.email[:50],
+            updated_at=book.updated_at,
+        ))
+    chapters = Chapter.objects.filter(needs_review('title', 'content')).select_related('author')
+    for chapter in chapters.only(
+        'id', 'book_id', 'chapter_number', 'title', 'title_pending', 'updated_at',
+        'author__display_name', 'author__email',
+    ):
+        items.append(ReviewQueueItem(
+            target_type='chapter', target_id=chapter.id, book_id=chapter.book_id,
+            chapter_number=chapter.chapter_number,
+            title=chapter.title or chapter.title_pending or '',
+            author_name=chapter.author.display_name or chapter.author.email[:50],
+            updated_at=chapter.updated_at,
+        ))
+    ReviewQueueItem.objects.bulk_create(items, batch_size=500)
+
+    counts = {
+        'total_users': User.objects.count(),
+        'total_books': Book.objects.count(),
+        'total_chapters': Chapter.objects.count(),
+        'total_comments': Comment.objects.count(),
+        'pending_books': sum(1 for item in items if item.target_type == 'book'),
+        'pending_chapters': sum(1 for item in items if item.target_type == 'chapter'),
+    }
+    DashboardCounter.objects.bulk_create(
+        [DashboardCounter(name=name, value=value) for name, value in counts.items()]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_book_keyset_index'),
+        ('comments', '0002_comment_keyset_index'),
+        ('accounts', '0002_alter_user_display_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='名称')),
+                ('value', models.BigIntegerField(default=0, verbose_name='计数')),
+            ],
+            options={
+                'verbose_name': '面板统计计数',
+                'verbose_name_plural': '面板统计计数',
+                'db_table': 'dashboard_counters',
+            },
+        ),
+        migrations.CreateModel(
+            name='ReviewQueueItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_type', models.CharField(choices=[('book', '作品'), ('chapter', '章节')], max_length=20, verbose_name='对象类型')),
+                ('target_id', models.PositiveIntegerField(verbose_name='对象ID')),
+                ('book_id', models.PositiveIntegerField(verbose_name='所属作品ID')),
+                ('chapter_number', models.PositiveIntegerField(blank=True, null=True, verbose_name='章节号')),
+                ('title', models.CharField(blank=True, max_length=200, verbose_name='标题')),
+                ('author_name', models.CharField(blank=True, max_length=50, verbose_name='作者')),
+                ('is_open', models.BooleanField(default=True, verbose_name='待审核')),
+                ('updated_at', models.DateTimeField(verbose_name='内容更新时间')),
+            ],
+            options={
+                'verbose_name': '审核队列',
+                'verbose_name_plural': '审核队列',
+                'db_table': 'review_queue',
+                'indexes': [models.Index(condition=models.Q(('is_open', True)), fields=['target_type', '-updated_at'], name='review_queue_open_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reviewqueueitem',
+            constraint=models.UniqueConstraint(fields=('target_type', 'target_id'), name='review_queue_target_uniq'),
+        ),
+        migrations.RunPython(backfill_review_queue, migrations.RunPython.noop),
+    ]
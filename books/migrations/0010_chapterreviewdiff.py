@@ -0,0 +1,32 @@
+# Generated by Django 4.2.23 on 2026-10-17 03:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0009_review_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChapterReviewDiff',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base_hash', models.CharField(max_length=64, verbose_name='已发布内容哈希')),
+                ('pending_hash', models.CharField(max_length=64, verbose_name='待审核内容哈希')),
+                ('ops', models.JSONField(default=list, verbose_name='差异片段')),
+                ('inserted', models.PositiveIntegerField(default=0, verbose_name='新增字数')),
+                ('deleted', models.PositiveIntegerField(default=0, verbose_name='删除字数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='计算时间')),
+                ('chapter', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='review_diff', to='books.chapter', verbose_name='章节')),
+            ],
+            options={
+                'verbose_name': '章节修改对比',
+                'verbose_name_plural': '章节修改对比',
+                'db_table': 'chapter_review_diffs',
+            },
+        ),
+    ]
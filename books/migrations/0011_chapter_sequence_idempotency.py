@@ -0,0 +1,60 @@
+# Generated by Django 4.2.23 on 2026-10-17 04:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_chapter_sequence(apps, schema_editor):
+    """用现有的最大章节号初始化各作品的章节号序列"""
+    Book = apps.get_model('books', 'Book')
+    Chapter = apps.get_model('books', 'Chapter')
+    last_number = (
+        Chapter.objects.filter(book=OuterRef('pk'))
+        .values('book')
+        .annotate(last=Max('chapter_number'))
+        .values('last')
+    )
+    Book.objects.update(chapter_sequence=Coalesce(Subquery(last_number), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('books', '0010_chapterreviewdiff'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='chapter_sequence',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='已分配章节号'),
+        ),
+        migrations.RunPython(backfill_chapter_sequence, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=50, verbose_name='接口')),
+                ('key', models.CharField(max_length=64, verbose_name='幂等键')),
+                ('request_hash', models.CharField(max_length=64, verbose_name='请求参数哈希')),
+                ('status_code', models.PositiveSmallIntegerField(default=200, verbose_name='响应状态码')),
+                ('response', models.JSONField(default=dict, verbose_name='响应内容')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_keys', to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '幂等键',
+                'verbose_name_plural': '幂等键',
+                'db_table': 'idempotency_keys',
+                'indexes': [models.Index(fields=['created_at'], name='idempotency_keys_created_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='idempotencykey',
+            constraint=models.UniqueConstraint(fields=('user', 'scope', 'key'), name='idempotency_keys_uniq'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.23 on 2026-10-17 04:04
+
+import re
+
+from django.db import migrations, models
+
+
+BATCH_SIZE = 200
+
+
+def backfill_toc_fields(apps, schema_editor):
+    """按批读取正文计算字数，待审核标记直接用一条UPDATE设置"""
+    Chapter = apps.get_model('books', 'Chapter')
+    whitespace = re.compile(r'\s+')
+
+    Chapter.objects.exclude(content_pending__isnull=True).exclude(content_pending='').update(has_pending_content=True)
+
+    last_id = 0
+    while True:
+        rows = list(
+            Chapter.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'content')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        chapters = [Chapter(id=chapter_id, word_count=len(whitespace.sub('', content or ''))) for chapter_id, content in rows]
+        Chapter.objects.bulk_update(chapters, ['word_count'])
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0011_chapter_sequence_idempotency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapter',
+            name='has_pending_content',
+            field=models.BooleanField(default=False, editable=False, verbose_name='有待审核内容'),
+        ),
+        migrations.AddField(
+            model_name='chapter',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='字数'),
+        ),
+        migrations.RunPython(backfill_toc_fields, migrations.RunPython.noop),
+    ]
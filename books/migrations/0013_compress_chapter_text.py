@@ -0,0 +1,29 @@
+# Generated by Django 4.2.23 on 2026-10-17 04:07
+
+import books.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0012_chapter_toc_fields'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chapter',
+            name='content',
+            field=books.fields.CompressedTextField(verbose_name='章节内容'),
+        ),
+        migrations.AlterField(
+            model_name='chapter',
+            name='content_pending',
+            field=books.fields.CompressedTextField(blank=True, null=True, verbose_name='待审核内容'),
+        ),
+        migrations.AlterField(
+            model_name='chapterdraft',
+            name='content',
+            field=books.fields.CompressedTextField(blank=True, verbose_name='草稿内容'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations, transaction
+
+
+BATCH_SIZE = 200
+
+# 需要转换的模型及其压缩字段
+COMPRESSED_FIELDS = {
+    'Chapter': ('content', 'content_pending'),
+    'ChapterDraft': ('content',),
+}
+
+
+def compress_existing_rows(apps, schema_editor):
+    """
+    把转换前写入的纯文本重新保存为压缩格式
+
+    按ID分批读取并bulk_update，每批单独提交，中途中断后重新执行会从头再过一遍，
+    已转换的行读出后原样写回，不影响结果。
+    """
+    for model_name, fields in COMPRESSED_FIELDS.items():
+        model = apps.get_model('books', model_name)
+        last_id = 0
+        while True:
+            rows = list(
+                model.objects.filter(id__gt=last_id).order_by('id').values_list('id', *fields)[:BATCH_SIZE]
+            )
+            if not rows:
+                break
+            objs = [model(id=row[0], **dict(zip(fields, row[1:]))) for row in rows]
+            with transaction.atomic():
+                model.objects.bulk_update(objs, fields)
+            last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('books', '0013_compress_chapter_text'),
+    ]
+
+    operations = [
+        migrations.RunPython(compress_existing_rows, migrations.RunPython.noop),
+    ]
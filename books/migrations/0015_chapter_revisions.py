@@ -0,0 +1,114 @@
+# Generated by Django 4.2.23 on 2026-10-17 04:10
+
+import books.fields
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from books.diffs import content_digest
+from books.revisions import delta_stats, encode_delta, make_delta
+
+
+BATCH_SIZE = 200
+
+
+def backfill_revisions(apps, schema_editor):
+    """
+    为现有章节记录初始版本：已发布内容为快照，待审核内容为相对它的增量；
+    草稿正文转换为相对已发布内容的增量
+    """
+    Chapter = apps.get_model('books', 'Chapter')
+    ChapterDraft = apps.get_model('books', 'ChapterDraft')
+    ChapterRevision = apps.get_model('books', 'ChapterRevision')
+
+    last_id = 0
+    while True:
+        rows = list(
+            Chapter.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'author_id', 'title', 'title_pending', 'content', 'content_pending')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        revisions = []
+        for chapter_id, author_id, title, title_pending, content, content_pending in rows:
+            common = {'chapter_id': chapter_id, 'author_id': author_id}
+            if content:
+                revisions.append(ChapterRevision(
+                    number=1, kind='snapshot', source='published', title=title, data=content,
+                    content_hash=content_digest(content), length=len(content), inserted=len(content), **common,
+                ))
+            if content_pending:
+                ops = make_delta(content, content_pending)
+                encoded = encode_delta(ops)
+                inserted, deleted = delta_stats(ops)
+                snapshot = not content or len(encoded) > len(content_pending) // 2
+                revisions.append(ChapterRevision(
+                    number=2 if content else 1,
+                    kind='snapshot' if snapshot else 'delta', source='edit',
+                    title=title_pending or title, data=content_pending if snapshot else encoded,
+                    content_hash=content_digest(content_pending), length=len(content_pending),
+                    inserted=inserted, deleted=deleted, **common,
+                ))
+        ChapterRevision.objects.bulk_create(revisions)
+        last_id = rows[-1][0]
+
+    for draft in ChapterDraft.objects.order_by('id').iterator():
+        base = (
+            Chapter.objects.filter(book_id=draft.book_id, chapter_number=draft.chapter_number)
+            .values_list('content', flat=True)
+            .first()
+        ) or ''
+        draft.base_hash = content_digest(base)
+        draft.content_delta = encode_delta(make_delta(base, draft.content))
+        draft.save(update_fields=['base_hash', 'content_delta'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('books', '0014_compress_existing_chapter_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapterdraft',
+            name='base_hash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='基准内容哈希'),
+        ),
+        migrations.AddField(
+            model_name='chapterdraft',
+            name='content_delta',
+            field=books.fields.CompressedTextField(blank=True, verbose_name='草稿增量'),
+        ),
+        migrations.CreateModel(
+            name='ChapterRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(verbose_name='版本号')),
+                ('kind', models.CharField(choices=[('snapshot', '完整快照'), ('delta', '增量')], max_length=20, verbose_name='存储方式')),
+                ('source', models.CharField(choices=[('create', '新建章节'), ('edit', '修改章节'), ('restore', '恢复历史版本'), ('published', '已发布版本')], default='edit', max_length=20, verbose_name='来源')),
+                ('title', models.CharField(blank=True, max_length=200, verbose_name='章节标题')),
+                ('data', books.fields.CompressedTextField(verbose_name='快照正文或增量')),
+                ('content_hash', models.CharField(max_length=64, verbose_name='正文哈希')),
+                ('length', models.PositiveIntegerField(default=0, verbose_name='正文长度')),
+                ('inserted', models.PositiveIntegerField(default=0, verbose_name='新增字数')),
+                ('deleted', models.PositiveIntegerField(default=0, verbose_name='删除字数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='提交时间')),
+                ('author', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='chapter_revisions', to=settings.AUTH_USER_MODEL, verbose_name='提交人')),
+                ('chapter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='books.chapter', verbose_name='章节')),
+            ],
+            options={
+                'verbose_name': '章节修订历史',
+                'verbose_name_plural': '章节修订历史',
+                'db_table': 'chapter_revisions',
+                'indexes': [models.Index(fields=['chapter', 'content_hash'], name='chapter_revisions_hash_idx')],
+                'unique_together': {('chapter', 'number')},
+            },
+        ),
+        migrations.RunPython(backfill_revisions, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='chapterdraft',
+            name='content',
+        ),
+    ]
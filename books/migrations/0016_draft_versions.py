@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-17 04:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0015_chapter_revisions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookdraft',
+            name='version',
+            field=models.PositiveIntegerField(default=0, verbose_name='草稿版本'),
+        ),
+        migrations.AddField(
+            model_name='chapterdraft',
+            name='version',
+            field=models.PositiveIntegerField(default=0, verbose_name='草稿版本'),
+        ),
+    ]
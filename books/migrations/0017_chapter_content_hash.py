@@ -0,0 +1,42 @@
+# Generated by Django 4.2.23 on 2026-10-17 05:02
+
+import hashlib
+
+from django.db import migrations, models
+
+
+BATCH_SIZE = 200
+
+
+def backfill_content_hash(apps, schema_editor):
+    Chapter = apps.get_model('books', 'Chapter')
+
+    last_id = 0
+    while True:
+        rows = list(
+            Chapter.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'content')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        chapters = [
+            Chapter(id=chapter_id, content_hash=hashlib.sha256((content or '').encode('utf-8')).hexdigest())
+            for chapter_id, content in rows
+        ]
+        Chapter.objects.bulk_update(chapters, ['content_hash'])
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0016_draft_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapter',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='正文哈希'),
+        ),
+        migrations.RunPython(backfill_content_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.23 on 2026-10-17 06:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_author(apps, schema_editor):
+    """按队列行对应的作品/章节填写作者ID"""
+    ReviewQueueItem = apps.get_model('books', 'ReviewQueueItem')
+    models_by_type = {
+        'book': apps.get_model('books', 'Book'),
+        'chapter': apps.get_model('books', 'Chapter'),
+    }
+    for target_type, model in models_by_type.items():
+        items = list(ReviewQueueItem.objects.filter(target_type=target_type).only('id', 'target_id'))
+        authors = dict(
+            model.objects.filter(id__in=[item.target_id for item in items]).values_list('id', 'author_id')
+        )
+        for item in items:
+            item.author_id = authors.get(item.target_id)
+        ReviewQueueItem.objects.bulk_update(items, ['author_id'], batch_size=500)
+    # 对象已不存在的行（正常情况下不会出现）直接删除，rebuild_review_queue可重建计数
+    ReviewQueueItem.objects.filter(author_id__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('books', '0017_chapter_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewqueueitem',
+            name='author',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='作者'),
+        ),
+        migrations.RunPython(backfill_author, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='reviewqueueitem',
+            name='author',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='作者'),
+        ),
+        migrations.RemoveField(
+            model_name='reviewqueueitem',
+            name='author_name',
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.23 on 2026-10-17 04:45
+
+import books.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0018_review_queue_author'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='moderationjob',
+            name='content',
+            field=books.fields.CompressedTextField(verbose_name='提交审核的内容'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations, transaction
+
+
+BATCH_SIZE = 200
+
+
+def compress_existing_rows(apps, schema_editor):
+    """
+    把转换前写入的审核任务内容重新保存为压缩格式
+
+    与0014相同：按ID分批读取并bulk_update，每批单独提交，中断后重新执行不影响结果。
+    """
+    ModerationJob = apps.get_model('books', 'ModerationJob')
+    last_id = 0
+    while True:
+        rows = list(
+            ModerationJob.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'content')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        jobs = [ModerationJob(id=job_id, content=content) for job_id, content in rows]
+        with transaction.atomic():
+            ModerationJob.objects.bulk_update(jobs, ['content'])
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('books', '0019_compress_moderation_job_content'),
+    ]
+
+    operations = [
+        migrations.RunPython(compress_existing_rows, migrations.RunPython.noop),
+    ]
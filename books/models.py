@@ -1,7 +1,25 @@
+import hashlib
+import re
+
 from django.db import models
 from django.utils import timezone
 from accounts.models import User
 
+from .fields import CompressedTextField
+
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def count_words(text):
+    """字数统计：不计空白字符（中文按字计）"""
+    return len(WHITESPACE_RE.sub('', text or ''))
+
+
+def content_hash(text):
+    """正文哈希（与books.diffs.content_digest相同，可与修订历史中的哈希直接比较）"""
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+
 
 class Book(models.Model):
     """作品模型 - 存储在MySQL中"""
@@ -32,11 +50,20 @@ class Book(models.Model):
     updated_at = models.DateTimeField('更新时间', auto_now=True)
     last_chapter_update = models.DateTimeField('最后章节更新时间', blank=True, null=True)
     
+    # 章节号序列：等于当前章节数，新建章节时原子地加一并取回（见books.ordering.allocate_chapter_number）
+    chapter_sequence = models.PositiveIntegerField('已分配章节号', default=0, editable=False)
+    
+    # 公开可见性（由审核状态推导，保存时自动维护，用于数据库侧过滤）
+    is_public = models.BooleanField('是否公开', default=False, editable=False)
+    
     class Meta:
         db_table = 'books'
         verbose_name = '作品'
         verbose_name_plural = '作品'
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['is_public', '-updated_at', '-id'], name='books_public_updated_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -73,6 +100,20 @@ class Book(models.Model):
     def is_visible_to_public(self):
         """是否对公众可见"""
         return self.is_title_approved and self.is_description_approved
+    
+    def save(self, *args, **kwargs):
+        """保存时自动更新公开可见性"""
+        self.is_public = self.is_visible_to_public
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            # 章节号序列只由原子UPDATE维护，整行保存时不写回内存中可能已过期的值
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'chapter_sequence'
+            ]
+        elif update_fields is not None and 'is_public' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['is_public']
+        super().save(*args, **kwargs)
 
 
 class BookDraft(models.Model):
@@ -80,6 +121,7 @@ class BookDraft(models.Model):
     book = models.OneToOneField(Book, on_delete=models.CASCADE, related_name='draft')
     title = models.CharField('草稿标题', max_length=200, blank=True)
     description = models.TextField('草稿简介', blank=True)
+    version = models.PositiveIntegerField('草稿版本', default=0)
     updated_at = models.DateTimeField('更新时间', auto_now=True)
     
     class Meta:
@@ -100,11 +142,11 @@ class Chapter(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chapters', verbose_name='作者')
     chapter_number = models.IntegerField('章节序号')
     title = models.CharField('章节标题', max_length=200)
-    content = models.TextField('章节内容')
+    content = CompressedTextField('章节内容')
     
     # 审核相关字段
     title_pending = models.CharField('待审核标题', max_length=200, blank=True, null=True)
-    content_pending = models.TextField('待审核内容', blank=True, null=True)
+    content_pending = CompressedTextField('待审核内容', blank=True, null=True)
     
     ai_check_title = models.CharField('标题AI审核状态', max_length=20, choices=REVIEW_STATUS_CHOICES, default='pending')
     ai_check_content = models.CharField('内容AI审核状态', max_length=20, choices=REVIEW_STATUS_CHOICES, default='pending')
@@ -115,6 +157,12 @@ class Chapter(models.Model):
     title_reject_reason = models.TextField('标题拒绝原因', blank=True)
     content_reject_reason = models.TextField('内容拒绝原因', blank=True)
     
+    # 目录字段（由正文推导，保存时自动维护，目录页不需要加载正文）
+    word_count = models.PositiveIntegerField('字数', default=0, editable=False)
+    has_pending_content = models.BooleanField('有待审核内容', default=False, editable=False)
+    # 已发布正文的哈希，阅读页面按它读取缓存的渲染结果（见books.reading）
+    content_hash = models.CharField('正文哈希', max_length=64, blank=True, editable=False)
+    
     created_at = models.DateTimeField('创建时间', auto_now_add=True)
     updated_at = models.DateTimeField('更新时间', auto_now=True)
     
@@ -128,6 +176,41 @@ class Chapter(models.Model):
     def __str__(self):
         return f"{self.book.title} - 第{self.chapter_number}章: {self.title}"
     
+    def refresh_toc_fields(self, fields=('content', 'content_pending')):
+        """
+        根据正文更新目录字段
+
+        Returns:
+            list: 被更新的目录字段名
+        """
+        updated = []
+        if 'content' in fields:
+            self.word_count = count_words(self.content)
+            new_hash = content_hash(self.content)
+            if self.content_hash and self.content_hash != new_hash:
+                # 记下被替换的正文哈希，保存后清除它的渲染缓存（见books.reading.forget_replaced_body）
+                self._replaced_content_hash = self.content_hash
+            self.content_hash = new_hash
+            updated.extend(['word_count', 'content_hash'])
+        if 'content_pending' in fields:
+            self.has_pending_content = bool(self.content_pending)
+            updated.append('has_pending_content')
+        return updated
+    
+    def save(self, *args, **kwargs):
+        """保存时自动更新目录字段（只在正文已加载或本次写入正文时计算）"""
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            deferred = self.get_deferred_fields()
+            self.refresh_toc_fields([name for name in ('content', 'content_pending') if name not in deferred])
+        else:
+            update_fields = list(update_fields)
+            kwargs['update_fields'] = update_fields + [
+                name for name in self.refresh_toc_fields(update_fields)
+                if name not in update_fields
+            ]
+        super().save(*args, **kwargs)
+    
     @property
     def display_title(self):
         """显示标题（包含审核状态）"""
@@ -171,12 +254,20 @@ class Chapter(models.Model):
 
 
 class ChapterDraft(models.Model):
-    """章节草稿 - 用于自动保存"""
+    """
+    章节草稿 - 用于自动保存
+    
+    正文存为相对已发布内容的增量（读写见books.revisions.save_draft/draft_content），
+    base_hash记录生成增量时已发布内容的哈希，已发布内容变化后从修订历史中找回原来的基准。
+    自动保存先写入缓存，再由books.autosave批量刷写；version随每次保存递增，用于拒绝过期窗口的保存。
+    """
     book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='chapter_drafts')
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chapter_drafts')
     chapter_number = models.IntegerField('章节序号')
     title = models.CharField('草稿标题', max_length=200, blank=True)
-    content = models.TextField('草稿内容', blank=True)
+    base_hash = models.CharField('基准内容哈希', max_length=64, blank=True)
+    content_delta = CompressedTextField('草稿增量', blank=True)
+    version = models.PositiveIntegerField('草稿版本', default=0)
     updated_at = models.DateTimeField('更新时间', auto_now=True)
     
     class Meta:
@@ -184,3 +275,251 @@ class ChapterDraft(models.Model):
         verbose_name = '章节草稿'
         verbose_name_plural = '章节草稿'
         unique_together = [['book', 'chapter_number']]
+
+
+class ChapterRevision(models.Model):
+    """
+    章节修订历史 - 作者每次提交（新建、修改、恢复历史版本）记录一个版本
+    
+    大部分版本只保存相对上一版本的增量，每隔若干版本（或增量过大时）保存一次完整快照，
+    还原任意版本最多回放一个快照间隔内的增量。列表所需的字数、增删字数等直接存储，
+    列出历史版本不需要还原正文。
+    """
+    KIND_CHOICES = [
+        ('snapshot', '完整快照'),
+        ('delta', '增量'),
+    ]
+    SOURCE_CHOICES = [
+        ('create', '新建章节'),
+        ('edit', '修改章节'),
+        ('restore', '恢复历史版本'),
+        ('published', '已发布版本'),
+    ]
+    
+    chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE, related_name='revisions', verbose_name='章节')
+    number = models.PositiveIntegerField('版本号')
+    kind = models.CharField('存储方式', max_length=20, choices=KIND_CHOICES)
+    source = models.CharField('来源', max_length=20, choices=SOURCE_CHOICES, default='edit')
+    author = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='chapter_revisions', verbose_name='提交人')
+    title = models.CharField('章节标题', max_length=200, blank=True)
+    data = CompressedTextField('快照正文或增量')
+    content_hash = models.CharField('正文哈希', max_length=64)
+    length = models.PositiveIntegerField('正文长度', default=0)
+    inserted = models.PositiveIntegerField('新增字数', default=0)
+    deleted = models.PositiveIntegerField('删除字数', default=0)
+    created_at = models.DateTimeField('提交时间', auto_now_add=True)
+    
+    class Meta:
+        db_table = 'chapter_revisions'
+        verbose_name = '章节修订历史'
+        verbose_name_plural = '章节修订历史'
+        unique_together = [['chapter', 'number']]
+        indexes = [
+            models.Index(fields=['chapter', 'content_hash'], name='chapter_revisions_hash_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.chapter_id} v{self.number} ({self.kind})'
+
+
+class ModerationJob(models.Model):
+    """AI审核任务 - 由审核工作进程（manage.py run_moderation_worker）异步执行"""
+    TARGET_TYPE_CHOICES = [
+        ('book', '作品'),
+        ('chapter', '章节'),
+        ('comment', '评论'),
+    ]
+    STATUS_CHOICES = [
+        ('queued', '排队中'),
+        ('running', '执行中'),
+        ('done', '已完成'),
+        ('cancelled', '已取消'),
+        ('dead', '失败'),
+    ]
+    
+    target_type = models.CharField('审核对象类型', max_length=20, choices=TARGET_TYPE_CHOICES)
+    target_id = models.BigIntegerField('审核对象ID')
+    field = models.CharField('审核字段', max_length=20)
+    content = CompressedTextField('提交审核的内容')
+    
+    status = models.CharField('任务状态', max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.IntegerField('已尝试次数', default=0)
+    next_run_at = models.DateTimeField('下次执行时间', default=timezone.now)
+    locked_at = models.DateTimeField('开始执行时间', blank=True, null=True)
+    last_error = models.TextField('最近错误', blank=True)
+    
+    result_approved = models.BooleanField('审核结果', blank=True, null=True)
+    result_reason = models.TextField('审核原因', blank=True)
+    
+    created_at = models.DateTimeField('创建时间', auto_now_add=True)
+    updated_at = models.DateTimeField('更新时间', auto_now=True)
+    
+    class Meta:
+        db_table = 'moderation_jobs'
+        verbose_name = 'AI审核任务'
+        verbose_name_plural = 'AI审核任务'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_run_at'], name='moderation_status_run_idx'),
+            models.Index(fields=['target_type', 'target_id', 'field'], name='moderation_target_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_target_type_display()}#{self.target_id}.{self.field} ({self.get_status_display()})"
+
+
+class ModerationVerdict(models.Model):
+    """AI审核结果缓存 - 以规范化文本的哈希为键，多个工作进程共享"""
+    content_hash = models.CharField('内容哈希', max_length=64, unique=True)
+    approved = models.BooleanField('是否通过')
+    reason = models.TextField('原因', blank=True)
+    confidence = models.FloatField('置信度', default=0.0)
+    hits = models.IntegerField('命中次数', default=0)
+    created_at = models.DateTimeField('创建时间', auto_now_add=True)
+    last_used_at = models.DateTimeField('最后使用时间', default=timezone.now, db_index=True)
+    expires_at = models.DateTimeField('过期时间', db_index=True)
+    
+    class Meta:
+        db_table = 'moderation_verdicts'
+        verbose_name = 'AI审核结果缓存'
+        verbose_name_plural = 'AI审核结果缓存'
+    
+    def __str__(self):
+        return f"{self.content_hash[:12]}... ({'通过' if self.approved else '不通过'})"
+
+
+class ModerationCacheCounter(models.Model):
+    """AI审核结果缓存计数器（命中/未命中等）"""
+    name = models.CharField('名称', max_length=50, primary_key=True)
+    value = models.BigIntegerField('计数', default=0)
+    
+    class Meta:
+        db_table = 'moderation_cache_counters'
+        verbose_name = 'AI审核缓存计数'
+        verbose_name_plural = 'AI审核缓存计数'
+    
+    def __str__(self):
+        return f'{self.name}: {self.value}'
+
+
+class ChapterChunkApproval(models.Model):
+    """章节内容中已审核通过的段落块 - 编辑章节时只需审核新增或修改的段落块"""
+    chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE, related_name='approved_chunks', verbose_name='章节')
+    chunk_hash = models.CharField('段落块哈希', max_length=64)
+    created_at = models.DateTimeField('创建时间', auto_now_add=True)
+    
+    class Meta:
+        db_table = 'chapter_chunk_approvals'
+        verbose_name = '已审核段落块'
+        verbose_name_plural = '已审核段落块'
+        unique_together = [['chapter', 'chunk_hash']]
+
+
+class ReviewQueueItem(models.Model):
+    """
+    管理员审核队列 - 作品/章节进入AI审核中或AI审核不通过（待管理员审核）状态时写入
+    
+    每个作品/章节一行，is_open表示是否仍在队列中；列表所需的标题等字段冗余存储，
+    管理员面板只读这张表（连接作者表取显示名），不需要扫描作品/章节表或加载章节正文。
+    """
+    TARGET_TYPE_CHOICES = [
+        ('book', '作品'),
+        ('chapter', '章节'),
+    ]
+    
+    target_type = models.CharField('对象类型', max_length=20, choices=TARGET_TYPE_CHOICES)
+    target_id = models.PositiveIntegerField('对象ID')
+    book_id = models.PositiveIntegerField('所属作品ID')
+    chapter_number = models.PositiveIntegerField('章节号', blank=True, null=True)
+    title = models.CharField('标题', max_length=200, blank=True)
+    # 队列行随作品/章节的删除信号移除，不随用户级联删除（否则待审核计数无法同步扣减）
+    author = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+', verbose_name='作者'
+    )
+    is_open = models.BooleanField('待审核', default=True)
+    updated_at = models.DateTimeField('内容更新时间')
+    
+    class Meta:
+        db_table = 'review_queue'
+        verbose_name = '审核队列'
+        verbose_name_plural = '审核队列'
+        constraints = [
+            models.UniqueConstraint(fields=['target_type', 'target_id'], name='review_queue_target_uniq'),
+        ]
+        indexes = [
+            # 部分索引只包含仍在队列中的行，已处理的历史行不影响索引大小
+            models.Index(
+                fields=['target_type', '-updated_at'],
+                condition=models.Q(is_open=True),
+                name='review_queue_open_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f'{self.get_target_type_display()} {self.target_id}: {self.title}'
+    
+    @property
+    def author_name(self):
+        return self.author.display_name or self.author.email[:50]
+
+
+class DashboardCounter(models.Model):
+    """管理员面板统计计数器 - 由信号增量维护，避免对整表执行COUNT(*)"""
+    name = models.CharField('名称', max_length=50, primary_key=True)
+    value = models.BigIntegerField('计数', default=0)
+    
+    class Meta:
+        db_table = 'dashboard_counters'
+        verbose_name = '面板统计计数'
+        verbose_name_plural = '面板统计计数'
+    
+    def __str__(self):
+        return f'{self.name}: {self.value}'
+
+
+class ChapterReviewDiff(models.Model):
+    """章节修改对比 - 作者提交修改时计算已发布内容与待审核内容的差异，审核页面直接读取"""
+    chapter = models.OneToOneField(Chapter, on_delete=models.CASCADE, related_name='review_diff', verbose_name='章节')
+    base_hash = models.CharField('已发布内容哈希', max_length=64)
+    pending_hash = models.CharField('待审核内容哈希', max_length=64)
+    ops = models.JSONField('差异片段', default=list)
+    inserted = models.PositiveIntegerField('新增字数', default=0)
+    deleted = models.PositiveIntegerField('删除字数', default=0)
+    updated_at = models.DateTimeField('计算时间', auto_now=True)
+    
+    class Meta:
+        db_table = 'chapter_review_diffs'
+        verbose_name = '章节修改对比'
+        verbose_name_plural = '章节修改对比'
+    
+    def __str__(self):
+        return f'{self.chapter_id}: +{self.inserted} -{self.deleted}'
+
+
+class IdempotencyKey(models.Model):
+    """
+    幂等键 - 创建类接口按 (用户, 接口, 客户端提供的键) 记录第一次成功的响应
+    
+    客户端重试或重复提交同一请求时直接返回记录的响应，不会重复创建。
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys', verbose_name='用户')
+    scope = models.CharField('接口', max_length=50)
+    key = models.CharField('幂等键', max_length=64)
+    request_hash = models.CharField('请求参数哈希', max_length=64)
+    status_code = models.PositiveSmallIntegerField('响应状态码', default=200)
+    response = models.JSONField('响应内容', default=dict)
+    created_at = models.DateTimeField('创建时间', auto_now_add=True)
+    
+    class Meta:
+        db_table = 'idempotency_keys'
+        verbose_name = '幂等键'
+        verbose_name_plural = '幂等键'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope', 'key'], name='idempotency_keys_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], name='idempotency_keys_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.scope}: {self.key}'
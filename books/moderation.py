@@ -0,0 +1,570 @@
+"""
+AI审核任务队列
+发布内容时只写入待审核字段并入队，由工作进程在请求和写事务之外调用AI接口，
+再把审核结果写回 *_pending / ai_check_* 字段。
+工作进程按批领取任务，通过request_ai_check_many在有界线程池中并发审核。
+"""
+import hashlib
+import logging
+import random
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .ai_utils import (
+    AICheckUnavailable, AIRequestRejected, CircuitOpen, normalize_for_cache, request_ai_check_many,
+)
+from .models import ChapterChunkApproval, ChapterReviewDiff, ModerationJob
+
+logger = logging.getLogger(__name__)
+
+
+# 审核对象 -> 模型及字段映射
+# (target_type, field): (模型, 正式字段, 待审核字段, AI审核字段, 管理员审核字段, 拒绝原因字段)
+MODERATION_TARGETS = {
+    ('book', 'title'): ('books.Book', 'title', 'title_pending', 'ai_check_title', 'adm_check_title', 'title_reject_reason'),
+    ('book', 'description'): ('books.Book', 'description', 'description_pending', 'ai_check_description', 'adm_check_description', 'description_reject_reason'),
+    ('chapter', 'title'): ('books.Chapter', 'title', 'title_pending', 'ai_check_title', 'adm_check_title', 'title_reject_reason'),
+    ('chapter', 'content'): ('books.Chapter', 'content', 'content_pending', 'ai_check_content', 'adm_check_content', 'content_reject_reason'),
+    ('comment', 'content'): ('comments.Comment', 'content', 'content_pending', 'ai_check', 'adm_check', 'reject_reason'),
+}
+
+
+def _target(target_type, field):
+    model_label, *fields = MODERATION_TARGETS[(target_type, field)]
+    return apps.get_model(model_label), fields
+
+
+def mark_pending(obj, target_type, field, content):
+    """
+    把内容写入待审核字段并重置审核状态（不保存）
+
+    Returns:
+        list: 被修改的字段名，可用于save(update_fields=...)
+    """
+    _, (published, pending, ai_check, adm_check, reason) = _target(target_type, field)
+    setattr(obj, pending, content)
+    setattr(obj, ai_check, 'pending')
+    setattr(obj, adm_check, None)
+    setattr(obj, reason, '')
+    return [pending, ai_check, adm_check, reason]
+
+
+def mark_approved(obj, target_type, field, content, reason=''):
+    """直接以通过状态发布内容（不保存），用于无需审核的内容（如空简介）"""
+    _, (published, pending, ai_check, adm_check, reason_field) = _target(target_type, field)
+    setattr(obj, published, content)
+    setattr(obj, pending, None)
+    setattr(obj, ai_check, 'approved')
+    setattr(obj, adm_check, None)
+    setattr(obj, reason_field, reason)
+    return [published, pending, ai_check, adm_check, reason_field]
+
+
+def cancel_queued(target_type, target_id, fields):
+    """取消对象这些字段尚未执行的审核任务（内容被重新提交或管理员已作出决定）"""
+    ModerationJob.objects.filter(
+        target_type=target_type,
+        target_id=target_id,
+        field__in=fields,
+        status='queued',
+    ).update(status='cancelled', updated_at=timezone.now())
+
+
+def enqueue(target_type, target_id, field, content):
+    """
+    创建审核任务
+
+    同一对象同一字段尚未执行的旧任务会被取消，工作进程只审核最新提交的内容。
+    应在保存待审核内容的同一事务中调用。
+    """
+    cancel_queued(target_type, target_id, [field])
+
+    return ModerationJob.objects.create(
+        target_type=target_type,
+        target_id=target_id,
+        field=field,
+        content=content,
+    )
+
+
+# ---------------------------------------------------------------------------
+# 章节内容分块审核
+# ---------------------------------------------------------------------------
+
+def chunk_hash(text):
+    """段落块哈希（规范化文本的SHA-256），只有排版差异的段落哈希相同"""
+    return hashlib.sha256(normalize_for_cache(text).encode('utf-8')).hexdigest()
+
+
+def split_chunks(content):
+    """
+    把章节内容切分为段落块
+
+    按段落（行）切分后做基于内容的分组：累计长度达到MODERATION_CHUNK_MIN_CHARS后，
+    在哈希值满足条件的段落处断开，超过MODERATION_CHUNK_MAX_CHARS时强制断开。
+    断点只取决于段落自身内容，修改某一段只会影响它所在的块，其余块的哈希保持不变。
+
+    Returns:
+        list: [(哈希, 文本), ...]
+    """
+    min_chars = settings.MODERATION_CHUNK_MIN_CHARS
+    max_chars = settings.MODERATION_CHUNK_MAX_CHARS
+    boundary_mod = settings.MODERATION_CHUNK_BOUNDARY_MOD
+
+    paragraphs = []
+    for line in (content or '').splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        # 超长段落按固定长度切开
+        paragraphs.extend(line[i:i + max_chars] for i in range(0, len(line), max_chars))
+
+    chunks = []
+    current = []
+    size = 0
+    for paragraph in paragraphs:
+        current.append(paragraph)
+        size += len(paragraph)
+        at_boundary = int(chunk_hash(paragraph)[:8], 16) % boundary_mod == 0
+        if size >= max_chars or (size >= min_chars and at_boundary):
+            text = '\n'.join(current)
+            chunks.append((chunk_hash(text), text))
+            current = []
+            size = 0
+    if current:
+        text = '\n'.join(current)
+        chunks.append((chunk_hash(text), text))
+    return chunks
+
+
+def record_approved_chunks(chapter_id, content):
+    """记录章节当前发布内容的全部段落块为已审核通过"""
+    hashes = {digest for digest, _ in split_chunks(content)}
+    ChapterChunkApproval.objects.filter(chapter_id=chapter_id).exclude(chunk_hash__in=hashes).delete()
+    existing = set(
+        ChapterChunkApproval.objects.filter(chapter_id=chapter_id).values_list('chunk_hash', flat=True)
+    )
+    ChapterChunkApproval.objects.bulk_create([
+        ChapterChunkApproval(chapter_id=chapter_id, chunk_hash=digest)
+        for digest in hashes - existing
+    ])
+
+
+def merge_chunk_outcomes(outcomes):
+    """
+    合并段落块的审核结果
+
+    任一块审核服务不可用则整体视为不可用（任务重试）；任一块不通过则整体不通过，
+    原因中注明不通过的块序号。
+
+    Args:
+        outcomes (list): [(块序号, 审核结果或AICheckUnavailable), ...]
+    """
+    unavailable = [outcome for _, outcome in outcomes if isinstance(outcome, AICheckUnavailable)]
+    if unavailable:
+        # 有块被上游拒绝时整体不能重试；有块真正请求失败时按失败处理（计入尝试次数），只有熔断时才按熔断处理
+        for kind in (AIRequestRejected, AICheckUnavailable):
+            for outcome in unavailable:
+                if isinstance(outcome, kind) and not isinstance(outcome, CircuitOpen):
+                    return outcome
+        return unavailable[0]
+
+    rejected = [(index, outcome) for index, outcome in outcomes if not outcome['approved']]
+    if rejected:
+        return {
+            'approved': False,
+            'reason': '；'.join(f"第{index + 1}部分：{outcome.get('reason', '')}" for index, outcome in rejected),
+            'confidence': min(outcome.get('confidence', 0.0) for _, outcome in rejected),
+        }
+    return {
+        'approved': True,
+        'reason': '',
+        'confidence': min((outcome.get('confidence', 0.0) for _, outcome in outcomes), default=1.0),
+    }
+
+
+def _plan_job_checks(jobs):
+    """
+    为一批任务生成需要提交AI的文本
+
+    章节内容任务只提交尚未审核通过的段落块，其它任务提交完整内容。
+
+    Returns:
+        list: 与jobs对应的 [(块序号, 文本), ...]
+    """
+    chapter_ids = [job.target_id for job in jobs if (job.target_type, job.field) == ('chapter', 'content')]
+    approved = {}
+    for chapter_id, digest in ChapterChunkApproval.objects.filter(
+        chapter_id__in=chapter_ids
+    ).values_list('chapter_id', 'chunk_hash'):
+        approved.setdefault(chapter_id, set()).add(digest)
+
+    plans = []
+    for job in jobs:
+        if (job.target_type, job.field) == ('chapter', 'content'):
+            known = approved.get(job.target_id, set())
+            plans.append([
+                (index, text)
+                for index, (digest, text) in enumerate(split_chunks(job.content))
+                if digest not in known
+            ])
+        else:
+            plans.append([(0, job.content)])
+    return plans
+
+
+def apply_result(job, result):
+    """
+    把AI审核结果写回审核对象
+
+    如果对象已被删除、待审核内容已被新的提交覆盖或管理员已作出决定，任务直接结束，不修改对象。
+    """
+    model, (published, pending, ai_check, adm_check, reason) = _target(job.target_type, job.field)
+
+    with transaction.atomic():
+        obj = model.objects.filter(id=job.target_id).first()
+
+        job.status = 'done'
+        job.result_approved = result['approved']
+        job.result_reason = result.get('reason', '')
+        job.locked_at = None
+
+        if obj is None:
+            job.last_error = '审核对象已删除'
+        elif getattr(obj, pending) != job.content or getattr(obj, ai_check) != 'pending':
+            job.last_error = '内容已被新的提交覆盖'
+        elif getattr(obj, adm_check) is not None:
+            # 重新提交时adm_check会被重置；仍有值说明管理员在任务执行前已经审核
+            job.last_error = '管理员已审核'
+        elif result['approved']:
+            setattr(obj, published, job.content)
+            setattr(obj, pending, None)
+            setattr(obj, ai_check, 'approved')
+            setattr(obj, reason, '')
+            obj.save(update_fields=[published, pending, ai_check, reason, 'updated_at'])
+            if (job.target_type, job.field) == ('chapter', 'content'):
+                record_approved_chunks(obj.id, job.content)
+                ChapterReviewDiff.objects.filter(chapter_id=obj.id).delete()
+        else:
+            setattr(obj, ai_check, 'rejected')
+            setattr(obj, reason, result.get('reason', ''))
+            obj.save(update_fields=[ai_check, reason, 'updated_at'])
+
+        job.save(update_fields=['status', 'result_approved', 'result_reason', 'locked_at', 'last_error', 'updated_at'])
+
+
+def _retry_delay(attempts):
+    """指数退避加随机抖动"""
+    base = settings.MODERATION_RETRY_BASE_DELAY
+    delay = min(base * (2 ** (attempts - 1)), settings.MODERATION_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1.5)
+
+
+def _postpone_job(job, outcome):
+    """熔断期间重新排队，不增加尝试次数，避免上游故障期间任务被成批转入死信"""
+    job.status = 'queued'
+    job.last_error = str(outcome)
+    job.locked_at = None
+    job.next_run_at = timezone.now() + timedelta(seconds=settings.AI_CHECK_BREAKER_RESET_TIMEOUT)
+    job.save(update_fields=['last_error', 'locked_at', 'status', 'next_run_at', 'updated_at'])
+    return job.status
+
+
+def finish_job(job, outcome):
+    """
+    处理单个审核任务的结果
+
+    outcome为审核结果dict时写回审核对象；为AICheckUnavailable时按退避时间重新排队，
+    超过最大尝试次数后标记为失败（死信），对象保持待审核状态，由管理员在后台人工审核。
+    上游拒绝请求（AIRequestRejected，重试不会成功）时直接转入死信。
+    熔断器打开（CircuitOpen，请求未发出）时不计入尝试次数，等熔断器放行探测请求后再执行。
+    """
+    if isinstance(outcome, CircuitOpen):
+        return _postpone_job(job, outcome)
+    job.attempts += 1
+    try:
+        if isinstance(outcome, AICheckUnavailable):
+            job.last_error = str(outcome)
+            job.locked_at = None
+            if isinstance(outcome, AIRequestRejected):
+                job.status = 'dead'
+                logger.warning('审核任务 %s 被上游拒绝，转入死信: %s', job.id, outcome)
+            elif job.attempts >= settings.MODERATION_MAX_ATTEMPTS:
+                job.status = 'dead'
+                logger.warning('审核任务 %s 多次失败，转入死信: %s', job.id, outcome)
+            else:
+                job.status = 'queued'
+                job.next_run_at = timezone.now() + timedelta(seconds=_retry_delay(job.attempts))
+            job.save(update_fields=['attempts', 'last_error', 'locked_at', 'status', 'next_run_at', 'updated_at'])
+            return job.status
+
+        job.save(update_fields=['attempts', 'updated_at'])
+        apply_result(job, outcome)
+        return job.status
+    except Exception:
+        logger.exception('审核任务 %s 执行异常', job.id)
+        ModerationJob.objects.filter(id=job.id, status='running').update(
+            status='queued',
+            locked_at=None,
+            next_run_at=timezone.now() + timedelta(seconds=settings.MODERATION_RETRY_BASE_DELAY),
+            updated_at=timezone.now(),
+        )
+        return 'error'
+
+
+def claim_jobs(limit):
+    """
+    领取到期的任务
+
+    通过带状态条件的UPDATE逐个抢占，多个工作进程同时运行时同一任务只会被领取一次；
+    执行超时（工作进程崩溃）的running任务会被重新领取。
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.MODERATION_JOB_LEASE)
+
+    candidate_ids = list(
+        ModerationJob.objects.filter(status='queued', next_run_at__lte=now)
+        .order_by('next_run_at', 'id')
+        .values_list('id', flat=True)[:limit]
+    )
+    candidate_ids += list(
+        ModerationJob.objects.filter(status='running', locked_at__lt=stale_before)
+        .values_list('id', flat=True)[:max(limit - len(candidate_ids), 0)]
+    )
+
+    claimable = Q(status='queued', next_run_at__lte=now) | Q(status='running', locked_at__lt=stale_before)
+    claimed = []
+    for job_id in candidate_ids:
+        updated = ModerationJob.objects.filter(claimable, id=job_id).update(
+            status='running', locked_at=now, updated_at=now
+        )
+        if updated:
+            claimed.append(job_id)
+
+    return list(ModerationJob.objects.filter(id__in=claimed).order_by('next_run_at', 'id'))
+
+
+def run_batch(batch_size, threads=None):
+    """
+    领取一批任务并批量审核
+
+    同一次发布的标题/正文等任务会在同一批中被领取，章节内容按段落块只提交新增或修改的部分，
+    全部文本由request_ai_check_many并发（或打包）请求上游，结果按任务合并后依次写回。
+
+    Returns:
+        int: 本批执行的任务数
+    """
+    jobs = claim_jobs(batch_size)
+    if not jobs:
+        return 0
+
+    plans = _plan_job_checks(jobs)
+    texts = [text for plan in plans for _, text in plan]
+    results = iter(request_ai_check_many(texts, max_workers=threads))
+
+    for job, plan in zip(jobs, plans):
+        outcomes = [(index, next(results)) for index, _ in plan]
+        if (job.target_type, job.field) == ('chapter', 'content'):
+            finish_job(job, merge_chunk_outcomes(outcomes))
+        else:
+            finish_job(job, outcomes[0][1])
+    return len(jobs)
+
+
+def run_worker(threads=None, batch_size=None, poll_interval=None, once=False, stop_event=None):
+    """
+    审核工作进程主循环
+
+    Args:
+        threads (int): 同时进行的AI请求数上限
+        batch_size (int): 每批领取的任务数
+        poll_interval (float): 没有任务时的轮询间隔（秒）
+        once (bool): 只处理当前到期的任务后退出
+        stop_event (threading.Event): 设置后退出循环
+    """
+    threads = threads or settings.MODERATION_WORKER_THREADS
+    batch_size = batch_size or threads * 2
+    poll_interval = poll_interval if poll_interval is not None else settings.MODERATION_POLL_INTERVAL
+
+    processed = 0
+    while stop_event is None or not stop_event.is_set():
+        count = run_batch(batch_size, threads)
+        processed += count
+        if count:
+            continue
+        if once:
+            break
+        close_old_connections()
+        if stop_event is not None:
+            stop_event.wait(poll_interval)
+        else:
+            time.sleep(poll_interval)
+    return processed
+
+
+# ---------------------------------------------------------------------------
+# 管理员批量审核
+# ---------------------------------------------------------------------------
+
+ADMIN_ACTIONS = ('approve', 'reject')
+DEFAULT_REJECT_REASON = '不符合社区规范'
+
+
+def _target_fields(target_type):
+    """对象类型的全部审核字段"""
+    return [field for t, field in MODERATION_TARGETS if t == target_type]
+
+
+def _needs_admin_review(obj, target_type, field):
+    _, (published, pending, ai_check, adm_check, reason) = _target(target_type, field)
+    return getattr(obj, ai_check) in ('pending', 'rejected') and getattr(obj, adm_check) is None
+
+
+def _parse_review_item(item):
+    """
+    校验单条批量审核请求
+
+    Returns:
+        tuple: (target_type, id, field, action, reason)，field为None表示该对象所有待审核字段
+
+    Raises:
+        ValueError: 请求格式错误
+    """
+    if not isinstance(item, dict):
+        raise ValueError('格式错误')
+    target_type = item.get('type')
+    field = item.get('field') or None
+    action = item.get('action')
+    if not _target_fields(target_type):
+        raise ValueError('不支持的审核类型')
+    if field is not None and (target_type, field) not in MODERATION_TARGETS:
+        raise ValueError('不支持的审核字段')
+    if action not in ADMIN_ACTIONS:
+        raise ValueError('无效的审核操作')
+    try:
+        target_id = int(item.get('id'))
+    except (TypeError, ValueError):
+        raise ValueError('无效的ID')
+    return target_type, target_id, field, action, str(item.get('reason') or '')
+
+
+def _apply_admin_decision(obj, target_type, field, action, reason):
+    """把管理员审核结果写到对象上（不保存），返回被修改的字段"""
+    _, (published, pending, ai_check, adm_check, reason_field) = _target(target_type, field)
+    if action == 'approve':
+        content = getattr(obj, pending)
+        if content:
+            setattr(obj, published, content)
+            setattr(obj, pending, None)
+        setattr(obj, adm_check, 'approved')
+        setattr(obj, reason_field, '')
+    else:
+        setattr(obj, adm_check, 'rejected')
+        setattr(obj, reason_field, reason or DEFAULT_REJECT_REASON)
+    return {published, pending, adm_check, reason_field}
+
+
+def bulk_admin_review(items):
+    """
+    管理员批量审核
+
+    每种对象类型用一次查询加载全部目标，在一个事务中用bulk_update写回。
+    bulk_update不会调用save()和触发信号，因此公开/可见状态、全文索引、审核队列
+    和章节已审核段落块在这里显式维护。
+
+    Args:
+        items (list): [{'type', 'id', 'field'（可选）, 'action', 'reason'（可选）}, ...]
+
+    Returns:
+        list: 与items一一对应的 {'type', 'id', 'field', 'success', 'error'（失败时）}
+    """
+    from . import reading, review_queue, search, toc
+
+    results = [None] * len(items)
+    parsed = {}
+    for index, item in enumerate(items):
+        try:
+            parsed[index] = _parse_review_item(item)
+        except ValueError as e:
+            raw = item if isinstance(item, dict) else {}
+            results[index] = {
+                'type': raw.get('type'), 'id': raw.get('id'), 'field': raw.get('field'),
+                'success': False, 'error': str(e),
+            }
+
+    ids_by_type = {}
+    for target_type, target_id, *_ in parsed.values():
+        ids_by_type.setdefault(target_type, set()).add(target_id)
+
+    now = timezone.now()
+    with transaction.atomic():
+        objects = {}
+        for target_type, ids in ids_by_type.items():
+            model = _target(target_type, _target_fields(target_type)[0])[0]
+            objects[target_type] = model.objects.select_for_update().in_bulk(ids)
+
+        changed = {}
+        approved_chapter_content = set()
+        for index, (target_type, target_id, field, action, reason) in parsed.items():
+            result = {'type': target_type, 'id': target_id, 'field': field, 'success': False}
+            results[index] = result
+            obj = objects[target_type].get(target_id)
+            if obj is None:
+                result['error'] = '审核对象不存在'
+                continue
+
+            fields = [field] if field else [
+                name for name in _target_fields(target_type)
+                if _needs_admin_review(obj, target_type, name)
+            ]
+            if not fields:
+                result['error'] = '没有需要审核的内容'
+                continue
+
+            updated_fields = changed.setdefault(target_type, {}).setdefault(target_id, (obj, set()))[1]
+            cancel_queued(target_type, target_id, fields)
+            for name in fields:
+                updated_fields.update(_apply_admin_decision(obj, target_type, name, action, reason))
+                if (target_type, name, action) == ('chapter', 'content', 'approve'):
+                    approved_chapter_content.add(target_id)
+            result['success'] = True
+
+        for target_type, entries in changed.items():
+            model = _target(target_type, _target_fields(target_type)[0])[0]
+            objs = [obj for obj, _ in entries.values()]
+            update_fields = set().union(*(fields for _, fields in entries.values())) | {'updated_at'}
+            for obj in objs:
+                obj.updated_at = now
+                # 派生字段与save()中的维护逻辑保持一致
+                if target_type == 'book':
+                    obj.is_public = obj.is_visible_to_public
+                    update_fields.add('is_public')
+                elif target_type == 'chapter':
+                    update_fields.update(obj.refresh_toc_fields(update_fields))
+                elif target_type == 'comment':
+                    obj.is_visible = obj.is_approved
+                    update_fields.add('is_visible')
+            model.objects.bulk_update(objs, sorted(update_fields), batch_size=500)
+
+            if target_type == 'book':
+                for obj in objs:
+                    search.index_book(obj)
+                review_queue.sync_many('book', objs)
+            elif target_type == 'chapter':
+                for obj in objs:
+                    search.index_chapter(obj)
+                    reading.forget_replaced_body(obj)
+                    if obj.id in approved_chapter_content:
+                        record_approved_chunks(obj.id, obj.content)
+                ChapterReviewDiff.objects.filter(chapter_id__in=approved_chapter_content).delete()
+                review_queue.sync_many('chapter', objs)
+                for book_id in {obj.book_id for obj in objs}:
+                    toc.invalidate(book_id)
+
+    return results
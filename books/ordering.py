@@ -0,0 +1,177 @@
+"""
+章节排序
+删除、中间插入和任意调整顺序都用固定条数的集合更新语句完成，语句条数与章节数无关。
+
+新章节号由作品行上的章节号序列（Book.chapter_sequence）原子分配，
+同一作品的并发创建请求在作品行上排队，不会拿到相同的章节号。
+
+(book, chapter_number) 有唯一约束，逐行改号会在中间状态撞上约束。
+这里采用两阶段改号：先把受影响的行取负号移到负数区间（不会与任何正常章节号冲突），
+再从负数一次性换算成最终章节号。章节草稿按同样的方式同步移动。
+"""
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import Book, Chapter, ChapterDraft, ReviewQueueItem
+
+# 任意排序时每条CASE语句包含的章节数上限（避免单条SQL参数过多）
+REORDER_BATCH_SIZE = 500
+
+
+class ReorderError(ValueError):
+    """排序请求与作品当前章节不一致"""
+
+
+def _shift(book, start, delta):
+    """
+    把章节号 >= start 的章节（及其草稿）整体移动delta
+
+    Args:
+        book: 作品
+        start (int): 起始章节号
+        delta (int): 移动量，+1为腾出位置，-1为填补空位
+    """
+    for model in (Chapter, ChapterDraft):
+        rows = model.objects.filter(book=book)
+        # 第一阶段：移到负数区间
+        rows.filter(chapter_number__gte=start).update(chapter_number=-F('chapter_number'))
+        # 第二阶段：换算成最终章节号
+        rows.filter(chapter_number__lt=0).update(chapter_number=-F('chapter_number') + delta)
+
+    ReviewQueueItem.objects.filter(
+        target_type='chapter', book_id=book.id, chapter_number__gte=start
+    ).update(chapter_number=F('chapter_number') + delta)
+
+
+def allocate_chapter_number(book):
+    """
+    原子地分配作品的下一个章节号（须在事务中调用）
+
+    UPDATE ... RETURNING在一条语句内完成加一和读取。数据库不支持RETURNING时
+    （以INSERT ... RETURNING的支持情况判断，如MySQL）退化为UPDATE后在同一事务内读取，
+    UPDATE持有的行锁保证读到的是本事务写入的值。
+
+    Returns:
+        int: 分配到的章节号
+    """
+    if connection.features.can_return_columns_from_insert:
+        qn = connection.ops.quote_name
+        table = qn(Book._meta.db_table)
+        column = qn(Book._meta.get_field('chapter_sequence').column)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET {column} = {column} + 1 WHERE {qn("id")} = %s RETURNING {column}',
+                [book.id],
+            )
+            number = cursor.fetchone()[0]
+    else:
+        Book.objects.filter(id=book.id).update(chapter_sequence=F('chapter_sequence') + 1)
+        number = Book.objects.filter(id=book.id).values_list('chapter_sequence', flat=True).get()
+    book.chapter_sequence = number
+    return number
+
+
+def _lock_book(book):
+    """
+    锁定作品行（须在事务中调用）
+
+    与分配章节号相同，先对作品行执行UPDATE：SQLite下立即取得写锁，
+    其他数据库取得行锁，同一作品的创建、删除和排序在作品行上排队，
+    事务内随后读到的章节列表在提交前不会被其他请求修改。
+    """
+    Book.objects.filter(id=book.id).update(chapter_sequence=F('chapter_sequence'))
+
+
+def _touch(book):
+    """更新作品的最后章节更新时间"""
+    book.last_chapter_update = timezone.now()
+    book.save(update_fields=['last_chapter_update', 'updated_at'])
+
+
+def delete_chapter(chapter):
+    """删除章节及其草稿，并把后续章节号依次前移"""
+    book = chapter.book
+    with transaction.atomic():
+        _lock_book(book)
+        ChapterDraft.objects.filter(book=book, chapter_number=chapter.chapter_number).delete()
+        chapter.delete()
+        _shift(book, chapter.chapter_number + 1, -1)
+        Book.objects.filter(id=book.id, chapter_sequence__gt=0).update(chapter_sequence=F('chapter_sequence') - 1)
+        _touch(book)
+
+
+def make_room(book, position=None):
+    """
+    分配新章节的章节号（须在事务中调用）
+
+    先原子地分配末尾之后的章节号；指定position时再把原position及之后的章节依次后移，
+    在中间腾出位置。分配语句锁住了作品行，后续移动不会与同一作品的其他请求交错。
+
+    Returns:
+        int: 新章节应使用的章节号
+    """
+    number = allocate_chapter_number(book)
+    if position is None or position >= number:
+        return number
+    position = max(position, 1)
+    _shift(book, position, 1)
+    return position
+
+
+def _case(mapping, field):
+    return Case(
+        *[When(**{field: old}, then=Value(new)) for old, new in mapping.items()],
+        output_field=IntegerField(),
+    )
+
+
+def reorder_chapters(book, chapter_ids):
+    """
+    按给定顺序重新编号作品的全部章节（从1开始连续编号）
+
+    Args:
+        book: 作品
+        chapter_ids (list): 作品全部章节的ID，按新的顺序排列
+
+    Raises:
+        ReorderError: ID列表与作品当前章节不一致
+    """
+    with transaction.atomic():
+        # 读取和校验当前章节与改号在同一个写事务中，期间并发创建/删除的章节不会漏掉
+        _lock_book(book)
+        current = dict(Chapter.objects.filter(book=book).values_list('id', 'chapter_number'))
+        if len(chapter_ids) != len(current) or set(chapter_ids) != set(current):
+            raise ReorderError('章节列表与作品当前章节不一致')
+
+        new_numbers = {chapter_id: index for index, chapter_id in enumerate(chapter_ids, start=1)}
+        # 旧章节号 -> 新章节号，用于移动草稿
+        number_mapping = {current[chapter_id]: number for chapter_id, number in new_numbers.items()}
+        changed = {chapter_id: number for chapter_id, number in new_numbers.items() if current[chapter_id] != number}
+        if not changed:
+            return 0
+
+        chapters = Chapter.objects.filter(book=book)
+        drafts = ChapterDraft.objects.filter(book=book, chapter_number__in=list(number_mapping))
+        # 第一阶段：移到负数区间
+        chapters.filter(id__in=list(changed)).update(chapter_number=-F('chapter_number'))
+        drafts.update(chapter_number=-F('chapter_number'))
+
+        # 第二阶段：按映射写入最终章节号
+        items = list(changed.items())
+        for i in range(0, len(items), REORDER_BATCH_SIZE):
+            batch = dict(items[i:i + REORDER_BATCH_SIZE])
+            chapters.filter(id__in=list(batch)).update(chapter_number=_case(batch, 'id'))
+            ReviewQueueItem.objects.filter(
+                target_type='chapter', target_id__in=list(batch)
+            ).update(chapter_number=_case(batch, 'target_id'))
+
+        negative_mapping = list((-old, new) for old, new in number_mapping.items())
+        for i in range(0, len(negative_mapping), REORDER_BATCH_SIZE):
+            batch = dict(negative_mapping[i:i + REORDER_BATCH_SIZE])
+            ChapterDraft.objects.filter(book=book, chapter_number__in=list(batch)).update(
+                chapter_number=_case(batch, 'chapter_number')
+            )
+
+        _touch(book)
+    return len(changed)
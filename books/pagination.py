@@ -0,0 +1,166 @@
+"""
+游标分页（keyset pagination）工具类
+
+页码分页需要先COUNT(*)再OFFSET跳过前面的行，越往后翻越慢。
+游标分页记住上一页最后一条记录的排序键，下一页直接用 WHERE (排序键) < (游标) 在索引上定位，
+每一页的代价与页数无关，适合无限滚动。
+
+排序键必须唯一，因此总是以时间字段加主键作为排序，例如 ('-updated_at', '-id')。
+游标对客户端不透明：排序键的值和翻页方向经JSON序列化后做URL安全的base64编码。
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析"""
+
+
+def encode_cursor(values, reverse=False):
+    """
+    把排序键的值编码为游标
+
+    Args:
+        values (list): 排序键的值（datetime会转为ISO格式）
+        reverse (bool): 是否为向前翻页的游标
+    """
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    data = json.dumps({'v': payload, 'r': int(reverse)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    解析游标
+
+    Returns:
+        tuple: (排序键的值列表, 是否向前翻页)
+
+    Raises:
+        InvalidCursor: 游标格式错误
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return list(data['v']), bool(data.get('r'))
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        raise InvalidCursor('无效的分页游标') from e
+
+
+class CursorPage:
+    """游标分页的一页"""
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class CursorPaginator:
+    """
+    游标分页器
+
+    Args:
+        queryset: 要分页的查询集
+        ordering (tuple): 排序字段，最后一个必须是唯一字段（通常是'-id'），
+                          所有字段方向需一致，并应有对应的联合索引
+        per_page (int): 每页条数
+    """
+
+    def __init__(self, queryset, ordering=('-updated_at', '-id'), per_page=20):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.descending = self.ordering[0].startswith('-')
+
+    def _seek_filter(self, values, forward):
+        """
+        构造 (f1, f2, ...) 在游标之后（或之前）的条件，
+        即 f1 < v1 OR (f1 = v1 AND f2 < v2) OR ...
+        """
+        lookup = 'lt' if self.descending == forward else 'gt'
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            clause = Q(**{f'{field}__{lookup}': values[i]})
+            for prior_field, prior_value in zip(self.fields[:i], values[:i]):
+                clause &= Q(**{prior_field: prior_value})
+            condition |= clause
+        return condition
+
+    def _values(self, obj):
+        return [getattr(obj, field) for field in self.fields]
+
+    def _parse_values(self, values):
+        """把游标中的值转换为字段类型；游标由客户端传回，null、列表、对象等都视为无效"""
+        if len(values) != len(self.fields):
+            raise InvalidCursor('无效的分页游标')
+        parsed = []
+        for field, value in zip(self.fields, values):
+            if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+                raise InvalidCursor('无效的分页游标')
+            model_field = self.queryset.model._meta.get_field(field)
+            try:
+                value = model_field.to_python(value)
+            except Exception as e:
+                raise InvalidCursor('无效的分页游标') from e
+            if value is None:
+                raise InvalidCursor('无效的分页游标')
+            parsed.append(value)
+        return parsed
+
+    def page(self, cursor=None):
+        """
+        获取游标所指的一页
+
+        每页多取一条用于判断是否还有下一页，不执行COUNT查询。
+
+        Raises:
+            InvalidCursor: 游标格式错误
+        """
+        queryset = self.queryset
+        reverse = False
+        if cursor:
+            values, reverse = decode_cursor(cursor)
+            queryset = queryset.filter(self._seek_filter(self._parse_values(values), forward=not reverse))
+
+        if reverse:
+            ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+        else:
+            ordering = self.ordering
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if reverse:
+            rows.reverse()
+            has_next = True
+            has_previous = has_more
+        else:
+            has_next = has_more
+            has_previous = bool(cursor)
+
+        next_cursor = encode_cursor(self._values(rows[-1])) if rows and has_next else None
+        previous_cursor = encode_cursor(self._values(rows[0]), reverse=True) if rows and has_previous else None
+        return CursorPage(rows, next_cursor, previous_cursor)
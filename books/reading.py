@@ -0,0 +1,112 @@
+"""
+阅读页面的缓存
+
+章节正文渲染（linebreaks）后的HTML按正文哈希（Chapter.content_hash）缓存：
+缓存命中时既不读取、解压正文，也不重新渲染；正文修改后旧哈希的缓存随即清除。
+
+作品详情页和章节阅读页支持条件请求：ETag由作品/章节的更新时间和访问者身份推导，
+浏览器重新验证时内容没有变化则返回304，不渲染模板、不重新传输正文。
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.template.defaultfilters import linebreaks_filter
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.utils.safestring import mark_safe
+
+
+def body_cache_key(content_hash):
+    return f'books:chapter-body:{content_hash}'
+
+
+def render_chapter_body(chapter):
+    """
+    章节正文渲染后的HTML
+
+    chapter可以是不含正文列的实例（defer('content')），只有缓存未命中时才读取正文。
+    """
+    if not chapter.content_hash:
+        return linebreaks_filter(chapter.content)
+    key = body_cache_key(chapter.content_hash)
+    html = cache.get(key)
+    if html is None:
+        html = str(linebreaks_filter(chapter.content))
+        cache.set(key, html, settings.CHAPTER_BODY_CACHE_TTL)
+    return mark_safe(html)
+
+
+def forget_replaced_body(chapter):
+    """章节正文被替换后清除旧正文的渲染缓存"""
+    replaced = chapter.__dict__.pop('_replaced_content_hash', None)
+    if replaced:
+        cache.delete(body_cache_key(replaced))
+
+
+# ---------------------------------------------------------------------------
+# 条件请求
+# ---------------------------------------------------------------------------
+
+def viewer_role(book, user):
+    return 'author' if book.author_id == user.id else 'reader'
+
+
+def make_etag(*parts):
+    """由若干部分生成强ETag（页面包含用户信息，parts中须包含访问者）"""
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode('utf-8'), usedforsecurity=False).hexdigest()
+    return f'"{digest}"'
+
+
+def book_validators(book, toc_entries, user):
+    """
+    作品详情页的ETag和最后修改时间
+
+    目录中任一章节的更新（标题、审核状态、字数）、章节增删和顺序调整都会改变ETag。
+
+    Returns:
+        tuple: (etag, last_modified)
+    """
+    last_modified = max([book.updated_at, *(entry['updated_at'] for entry in toc_entries)])
+    toc_digest = hashlib.md5(usedforsecurity=False)
+    for entry in toc_entries:
+        toc_digest.update(f"{entry['id']}:{entry['chapter_number']}:{entry['updated_at'].timestamp()};".encode())
+    etag = make_etag(
+        'book', book.id, book.updated_at.timestamp(), toc_digest.hexdigest(),
+        viewer_role(book, user), user.pk,
+    )
+    return etag, last_modified
+
+
+def chapter_validators(book, chapter, user):
+    """
+    章节阅读页的ETag和最后修改时间
+
+    Returns:
+        tuple: (etag, last_modified)
+    """
+    etag = make_etag(
+        'chapter', chapter.id, chapter.updated_at.timestamp(), book.updated_at.timestamp(),
+        viewer_role(book, user), user.pk,
+    )
+    return etag, max(book.updated_at, chapter.updated_at)
+
+
+def conditional_response(request, etag, last_modified, render):
+    """
+    处理条件请求：If-None-Match/If-Modified-Since匹配时返回304，否则调用render()生成响应
+
+    页面因用户而异，响应标记为private并要求浏览器每次重新验证。
+    有待显示的消息时不返回304（消息只在页面渲染时显示一次）。
+    """
+    timestamp = int(last_modified.timestamp())
+    response = None
+    if not len(get_messages(request)):
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = render()
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(timestamp)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
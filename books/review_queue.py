@@ -0,0 +1,195 @@
+"""
+管理员审核队列与面板统计
+作品/章节保存时同步审核队列表，用户/作品/章节/评论增删时增量更新计数器，
+管理员面板只读取队列表的一页和计数器表，耗时与数据总量无关。
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+
+from .models import DashboardCounter, ReviewQueueItem
+
+
+# 每种对象参与管理员审核的字段
+REVIEW_FIELDS = {
+    'book': ('title', 'description'),
+    'chapter': ('title', 'content'),
+}
+
+# 计数器名称
+TOTAL_COUNTERS = {
+    'user': 'total_users',
+    'book': 'total_books',
+    'chapter': 'total_chapters',
+    'comment': 'total_comments',
+}
+PENDING_COUNTERS = {
+    'book': 'pending_books',
+    'chapter': 'pending_chapters',
+}
+
+
+def needs_admin_review(target_type, obj):
+    """
+    是否需要出现在管理员审核队列中
+
+    任一字段AI审核中，或AI审核不通过且管理员尚未审核。
+    """
+    for field in REVIEW_FIELDS[target_type]:
+        ai_check = getattr(obj, f'ai_check_{field}')
+        if ai_check == 'pending':
+            return True
+        if ai_check == 'rejected' and getattr(obj, f'adm_check_{field}') is None:
+            return True
+    return False
+
+
+def needs_admin_review_q(target_type):
+    """needs_admin_review对应的查询条件"""
+    condition = Q()
+    for field in REVIEW_FIELDS[target_type]:
+        condition |= Q(**{f'ai_check_{field}': 'pending'})
+        condition |= Q(**{f'ai_check_{field}': 'rejected', f'adm_check_{field}__isnull': True})
+    return condition
+
+
+def incr_counter(name, amount=1):
+    """原子地增减计数器"""
+    updated = DashboardCounter.objects.filter(name=name).update(value=F('value') + amount)
+    if not updated:
+        try:
+            with transaction.atomic():
+                DashboardCounter.objects.create(name=name, value=amount)
+        except IntegrityError:
+            DashboardCounter.objects.filter(name=name).update(value=F('value') + amount)
+
+
+def _snapshot(target_type, obj):
+    """队列行中冗余存储的展示字段（作者只存ID，保存时不必加载作者）"""
+    return {
+        'book_id': obj.id if target_type == 'book' else obj.book_id,
+        'chapter_number': obj.chapter_number if target_type == 'chapter' else None,
+        'title': obj.title or obj.title_pending or '',
+        'author_id': obj.author_id,
+        'updated_at': obj.updated_at,
+    }
+
+
+def sync(target_type, obj):
+    """
+    根据对象当前的审核状态打开或关闭其队列行，并在状态变化时更新待审核计数
+
+    Args:
+        target_type (str): 'book' 或 'chapter'
+        obj: Book或Chapter实例
+    """
+    is_open = needs_admin_review(target_type, obj)
+    items = ReviewQueueItem.objects.filter(target_type=target_type, target_id=obj.id)
+
+    with transaction.atomic():
+        if is_open:
+            fields = _snapshot(target_type, obj)
+            # 只有从关闭变为打开时才计数，重复提交只刷新展示字段
+            if items.filter(is_open=False).update(is_open=True, **fields):
+                incr_counter(PENDING_COUNTERS[target_type])
+            elif not items.update(**fields):
+                try:
+                    with transaction.atomic():
+                        ReviewQueueItem.objects.create(target_type=target_type, target_id=obj.id, **fields)
+                except IntegrityError:
+                    items.update(**fields)
+                else:
+                    incr_counter(PENDING_COUNTERS[target_type])
+        elif items.filter(is_open=True).update(is_open=False):
+            incr_counter(PENDING_COUNTERS[target_type], -1)
+
+
+def sync_many(target_type, objs):
+    """
+    批量同步审核队列（用于bulk_update之后，不会触发post_save信号）
+
+    不再需要审核的对象一次性关闭队列行，其余逐个同步。
+    """
+    closed_ids = [obj.id for obj in objs if not needs_admin_review(target_type, obj)]
+    with transaction.atomic():
+        if closed_ids:
+            closed = ReviewQueueItem.objects.filter(
+                target_type=target_type, target_id__in=closed_ids, is_open=True
+            ).update(is_open=False)
+            if closed:
+                incr_counter(PENDING_COUNTERS[target_type], -closed)
+        for obj in objs:
+            if obj.id not in closed_ids:
+                sync(target_type, obj)
+
+
+def remove(target_type, object_id):
+    """对象删除后移除其队列行"""
+    with transaction.atomic():
+        items = ReviewQueueItem.objects.filter(target_type=target_type, target_id=object_id)
+        if items.filter(is_open=True).exists():
+            incr_counter(PENDING_COUNTERS[target_type], -1)
+        items.delete()
+
+
+def pending_items(target_type, limit=5):
+    """队列中最近更新的待审核项（走部分索引，只取列表需要的字段，作者显示名在同一查询中连接取出）"""
+    return list(
+        ReviewQueueItem.objects
+        .filter(target_type=target_type, is_open=True)
+        .select_related('author')
+        .only(
+            'target_id', 'book_id', 'chapter_number', 'title', 'updated_at',
+            'author__display_name', 'author__email',
+        )
+        .order_by('-updated_at')[:limit]
+    )
+
+
+def get_counts():
+    """
+    管理员面板统计
+
+    Returns:
+        dict: {'total_users', 'total_books', 'total_chapters', 'total_comments',
+               'pending_books', 'pending_chapters'}
+    """
+    counters = dict(DashboardCounter.objects.values_list('name', 'value'))
+    names = list(TOTAL_COUNTERS.values()) + list(PENDING_COUNTERS.values())
+    return {name: max(counters.get(name, 0), 0) for name in names}
+
+
+def rebuild():
+    """
+    从作品/章节/用户/评论表重建审核队列和全部计数器（数据迁移或计数漂移后使用）
+
+    Returns:
+        dict: 重建后的统计
+    """
+    from accounts.models import User
+    from comments.models import Comment
+    from .models import Book, Chapter
+
+    models = {'user': User, 'book': Book, 'chapter': Chapter, 'comment': Comment}
+    with transaction.atomic():
+        ReviewQueueItem.objects.all().delete()
+        querysets = {
+            'book': Book.objects.defer('description', 'description_pending'),
+            'chapter': Chapter.objects.defer('content', 'content_pending'),
+        }
+        pending = {}
+        for target_type, queryset in querysets.items():
+            queryset = queryset.filter(needs_admin_review_q(target_type))
+            items = [
+                ReviewQueueItem(target_type=target_type, target_id=obj.id, **_snapshot(target_type, obj))
+                for obj in queryset.iterator()
+            ]
+            ReviewQueueItem.objects.bulk_create(items, batch_size=500)
+            pending[PENDING_COUNTERS[target_type]] = len(items)
+
+        values = {name: models[kind].objects.count() for kind, name in TOTAL_COUNTERS.items()}
+        values.update(pending)
+        DashboardCounter.objects.all().delete()
+        DashboardCounter.objects.bulk_create(
+            [DashboardCounter(name=name, value=value) for name, value in values.items()]
+        )
+    return values
@@ -0,0 +1,356 @@
+"""
+章节修订历史与草稿增量存储
+
+增量格式为JSON数组，按顺序作用于基准文本：
+    正整数 n   从基准文本复制n个字符
+    负整数 -n  跳过基准文本n个字符
+    字符串 s   插入s
+先去掉首尾相同的部分，再对中间部分按行对比，被修改的行再做词级对比，
+增量大小与修改量成正比，与章节长度无关。
+"""
+import json
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.db import transaction
+
+from .diffs import MAX_TOKEN_PRODUCT, content_digest, tokenize
+from .models import ChapterDraft, ChapterRevision
+
+
+# 列表查询只读取这些字段，不加载快照正文或增量
+LIST_FIELDS = ('number', 'kind', 'source', 'author', 'title', 'content_hash', 'length', 'inserted', 'deleted', 'created_at')
+
+
+# ---------------------------------------------------------------------------
+# 增量计算
+# ---------------------------------------------------------------------------
+
+def _copy(ops, count):
+    if count:
+        if ops and isinstance(ops[-1], int) and ops[-1] > 0:
+            ops[-1] += count
+        else:
+            ops.append(count)
+
+
+def _skip(ops, count):
+    if count:
+        if ops and isinstance(ops[-1], int) and ops[-1] < 0:
+            ops[-1] -= count
+        else:
+            ops.append(-count)
+
+
+def _insert(ops, text):
+    if text:
+        if ops and isinstance(ops[-1], str):
+            ops[-1] += text
+        else:
+            ops.append(text)
+
+
+def _common_prefix(a, b):
+    """公共前缀长度（二分比较切片，比逐字符循环快得多）"""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[:mid] == b[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _diff_tokens(ops, old, new):
+    old_tokens = tokenize(old)
+    new_tokens = tokenize(new)
+    if len(old_tokens) * len(new_tokens) > MAX_TOKEN_PRODUCT:
+        _skip(ops, len(old))
+        _insert(ops, new)
+        return
+    matcher = SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            _copy(ops, sum(len(token) for token in old_tokens[i1:i2]))
+        else:
+            _skip(ops, sum(len(token) for token in old_tokens[i1:i2]))
+            _insert(ops, ''.join(new_tokens[j1:j2]))
+
+
+def make_delta(old, new):
+    """
+    计算把old变成new的增量
+
+    Returns:
+        list: 增量操作列表
+    """
+    old = old or ''
+    new = new or ''
+    prefix = _common_prefix(old, new)
+    suffix = _common_prefix(old[prefix:][::-1], new[prefix:][::-1])
+    old_middle = old[prefix:len(old) - suffix]
+    new_middle = new[prefix:len(new) - suffix]
+
+    ops = []
+    _copy(ops, prefix)
+    old_lines = old_middle.splitlines(keepends=True)
+    new_lines = new_middle.splitlines(keepends=True)
+    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        old_text = ''.join(old_lines[i1:i2])
+        new_text = ''.join(new_lines[j1:j2])
+        if tag == 'equal':
+            _copy(ops, len(old_text))
+        elif tag == 'delete':
+            _skip(ops, len(old_text))
+        elif tag == 'insert':
+            _insert(ops, new_text)
+        else:
+            _diff_tokens(ops, old_text, new_text)
+    _copy(ops, suffix)
+    return ops
+
+
+def apply_delta(base, ops):
+    """
+    把增量作用到基准文本上
+
+    Raises:
+        ValueError: 增量与基准文本长度不符（基准文本不是生成增量时的文本）
+    """
+    parts = []
+    position = 0
+    for op in ops:
+        if isinstance(op, str):
+            parts.append(op)
+        elif op > 0:
+            parts.append(base[position:position + op])
+            position += op
+        else:
+            position -= op
+    if position != len(base):
+        raise ValueError('增量与基准文本不匹配')
+    return ''.join(parts)
+
+
+def encode_delta(ops):
+    return json.dumps(ops, ensure_ascii=False, separators=(',', ':'))
+
+
+def decode_delta(data):
+    return json.loads(data) if data else []
+
+
+def delta_stats(ops):
+    """增量的新增字数和删除字数"""
+    inserted = sum(len(op) for op in ops if isinstance(op, str))
+    deleted = sum(-op for op in ops if isinstance(op, int) and op < 0)
+    return inserted, deleted
+
+
+# ---------------------------------------------------------------------------
+# 修订历史
+# ---------------------------------------------------------------------------
+
+def materialize(chapter_id, number):
+    """
+    还原指定版本的正文（一个快照加上之后的增量，共两条查询）
+
+    Raises:
+        ChapterRevision.DoesNotExist: 版本不存在
+    """
+    revisions = ChapterRevision.objects.filter(chapter_id=chapter_id)
+    snapshot = (
+        revisions.filter(kind='snapshot', number__lte=number)
+        .only('number', 'data')
+        .order_by('-number')
+        .first()
+    )
+    if snapshot is None:
+        raise ChapterRevision.DoesNotExist(f'章节 {chapter_id} 没有版本 {number}')
+    deltas = list(
+        revisions.filter(number__gt=snapshot.number, number__lte=number)
+        .order_by('number')
+        .values_list('number', 'data')
+    )
+    if len(deltas) != number - snapshot.number:
+        raise ChapterRevision.DoesNotExist(f'章节 {chapter_id} 没有版本 {number}')
+
+    text = snapshot.data
+    for _, data in deltas:
+        text = apply_delta(text, decode_delta(data))
+    return text
+
+
+def record_revision(chapter, title, content, author=None, source='edit', known_texts=()):
+    """
+    记录一个新版本（须在保存章节的同一事务中调用，章节行上的写锁保证版本号不冲突）
+
+    Args:
+        chapter: 章节
+        title (str): 本次提交的标题
+        content (str): 本次提交的正文
+        author: 提交人
+        source (str): 来源，见ChapterRevision.SOURCE_CHOICES
+        known_texts: 调用方手里已有的文本（如提交前的待审核内容/已发布内容），
+            与上一版本相同时直接用来计算增量，不需要还原上一版本
+
+    Returns:
+        ChapterRevision: 新版本；与上一版本完全相同时返回上一版本，不重复记录
+    """
+    digest = content_digest(content)
+    revisions = ChapterRevision.objects.filter(chapter=chapter)
+    latest = revisions.only('number', 'title', 'content_hash').order_by('-number').first()
+    if latest is not None and latest.content_hash == digest and latest.title == title:
+        return latest
+
+    fields = {
+        'chapter': chapter, 'author': author, 'source': source, 'title': title,
+        'content_hash': digest, 'length': len(content),
+    }
+    if latest is None:
+        return ChapterRevision.objects.create(
+            number=1, kind='snapshot', data=content, inserted=len(content), **fields,
+        )
+
+    previous = next(
+        (text for text in known_texts if text is not None and content_digest(text) == latest.content_hash),
+        None,
+    )
+    if previous is None:
+        previous = materialize(chapter.id, latest.number)
+    ops = make_delta(previous, content)
+    encoded = encode_delta(ops)
+    inserted, deleted = delta_stats(ops)
+
+    last_snapshot = revisions.filter(kind='snapshot').order_by('-number').values_list('number', flat=True).first()
+    number = latest.number + 1
+    # 距上一个快照的版本数达到间隔，或增量已经接近全文大小时保存完整快照
+    if (
+        number - last_snapshot >= settings.REVISION_SNAPSHOT_INTERVAL
+        or len(encoded) > len(content) * settings.REVISION_SNAPSHOT_RATIO
+    ):
+        kind, data = 'snapshot', content
+    else:
+        kind, data = 'delta', encoded
+    return ChapterRevision.objects.create(
+        number=number, kind=kind, data=data, inserted=inserted, deleted=deleted, **fields,
+    )
+
+
+def list_revisions(chapter, limit=None):
+    """列出章节的版本（最新的在前），不读取正文和增量"""
+    queryset = (
+        ChapterRevision.objects.filter(chapter=chapter)
+        .select_related('author')
+        .only(*LIST_FIELDS, 'author__display_name', 'author__email')
+        .order_by('-number')
+    )
+    return list(queryset[:limit] if limit else queryset)
+
+
+def serialize_revision(revision):
+    return {
+        'number': revision.number,
+        'kind': revision.kind,
+        'source': revision.source,
+        'source_display': revision.get_source_display(),
+        'title': revision.title,
+        'length': revision.length,
+        'inserted': revision.inserted,
+        'deleted': revision.deleted,
+        'author': (revision.author.display_name or revision.author.email) if revision.author else '',
+        'created_at': revision.created_at.isoformat(),
+    }
+
+
+# ---------------------------------------------------------------------------
+# 草稿
+# ---------------------------------------------------------------------------
+
+def _ensure_base_revision(chapter):
+    """
+    保证已发布内容在修订历史中有对应版本，使草稿的基准在已发布内容更新后仍能找回
+
+    已发布内容都来自作者的某次提交，通常已经有对应版本；
+    只有历史数据或通过管理后台直接修改的内容才需要补记一个版本。
+    """
+    if not chapter.content:
+        return
+    digest = content_digest(chapter.content)
+    if not ChapterRevision.objects.filter(chapter=chapter, content_hash=digest).exists():
+        record_revision(chapter, chapter.title, chapter.content, source='published')
+
+
+def save_draft(book, chapter_number, author, title, content, chapter=None, version=None):
+    """
+    保存章节草稿，正文存为相对已发布内容的增量
+
+    Args:
+        chapter: 对应的章节；新章节尚未创建时为None，以空文本为基准
+        version: 草稿版本号（books.autosave按缓存中的版本分配）；不会小于原版本加1
+    """
+    base = chapter.content if chapter is not None else ''
+    with transaction.atomic():
+        if chapter is not None:
+            _ensure_base_revision(chapter)
+        draft = (
+            ChapterDraft.objects.select_for_update()
+            .filter(book=book, chapter_number=chapter_number)
+            .defer('content_delta')
+            .first()
+        ) or ChapterDraft(book=book, chapter_number=chapter_number)
+        draft.author = author
+        draft.title = title
+        draft.base_hash = content_digest(base)
+        draft.content_delta = encode_delta(make_delta(base, content))
+        draft.version = max(draft.version + 1, version or 0)
+        draft.save()
+    return draft
+
+
+def draft_content(draft, chapter=None):
+    """
+    还原草稿正文
+
+    已发布内容没有变化时直接在已发布内容上回放增量；
+    否则按base_hash从修订历史中找回生成增量时的已发布内容。
+
+    Returns:
+        str: 草稿正文；找不到基准时返回None
+    """
+    ops = decode_delta(draft.content_delta)
+    if chapter is not None and draft.base_hash == content_digest(chapter.content):
+        base = chapter.content
+    elif draft.base_hash == content_digest(''):
+        base = ''
+    elif chapter is not None:
+        revision = (
+            ChapterRevision.objects.filter(chapter=chapter, content_hash=draft.base_hash)
+            .only('number')
+            .order_by('-number')
+            .first()
+        )
+        if revision is None:
+            return None
+        base = materialize(chapter.id, revision.number)
+    else:
+        return None
+    return apply_delta(base, ops)
+
+
+def load_draft(book, chapter):
+    """
+    读取章节草稿
+
+    Returns:
+        dict: {'title', 'content', 'updated_at', 'version'}；没有草稿时返回None
+    """
+    draft = ChapterDraft.objects.filter(book=book, chapter_number=chapter.chapter_number).first()
+    if draft is None:
+        return None
+    content = draft_content(draft, chapter)
+    if content is None:
+        return None
+    return {'title': draft.title, 'content': content, 'updated_at': draft.updated_at, 'version': draft.version}
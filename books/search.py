@@ -0,0 +1,401 @@
+"""
+全文搜索工具类
+基于SQLite FTS5的作品/章节全文检索
+
+中文没有空格分词，FTS5自带的unicode61分词器会把一整段汉字当成一个词，
+因此写入索引和查询前先在Python中把连续的CJK字符切成重叠的二元组（bigram），
+再交给unicode61按空格切分。查询时把关键词按同样规则切分后组成短语查询，
+相邻二元组全部命中即等价于子串匹配。
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.urls import reverse
+from django.utils.html import escape
+
+
+SEARCH_TABLE = 'search_index'
+
+# 标题权重高于正文（依次对应 kind, book_id, title, body 列）
+BM25_WEIGHTS = (0.0, 0.0, 10.0, 1.0)
+
+# 条目类型编码进rowid，使单条更新/删除走rowid主键而不是扫描整张索引表
+KIND_CODES = {'chapter': 0, 'book': 1}
+
+# 摘要前后保留的字符数
+SNIPPET_RADIUS = 40
+
+CJK_RANGES = (
+    '\u3040-\u30ff'   # 日文假名
+    '\u3400-\u4dbf'   # CJK扩展A
+    '\u4e00-\u9fff'   # CJK统一汉字
+    '\uac00-\ud7af'   # 韩文音节
+    '\uf900-\ufaff'   # CJK兼容汉字
+)
+TOKEN_RE = re.compile(f'([{CJK_RANGES}]+)|([^\\W_{CJK_RANGES}]+)')
+
+
+def normalize_text(text):
+    """全角转半角并转小写"""
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+
+def _normalize_with_offsets(text):
+    """
+    逐字符规范化（同normalize_text）并记录每个规范化字符对应的原文下标
+
+    Returns:
+        tuple: (规范化文本, [原文下标, ...])
+    """
+    chars = []
+    offsets = []
+    for index, char in enumerate(text or ''):
+        for normalized in unicodedata.normalize('NFKC', char).lower():
+            chars.append(normalized)
+            offsets.append(index)
+    return ''.join(chars), offsets
+
+
+def _cjk_bigrams(run, trailing=True):
+    """把一段连续的CJK字符切成重叠二元组"""
+    if len(run) == 1:
+        return [run]
+    grams = [run[i:i + 2] for i in range(len(run) - 1)]
+    if trailing:
+        # 末尾单字也写入索引，使单字查询可以通过前缀匹配命中
+        grams.append(run[-1])
+    return grams
+
+
+def segment(text):
+    """
+    把文本切分成写入FTS索引的词序列
+
+    Args:
+        text (str): 原始文本
+
+    Returns:
+        str: 以空格分隔的词序列
+    """
+    tokens = []
+    for cjk, word in TOKEN_RE.findall(normalize_text(text)):
+        if cjk:
+            tokens.extend(_cjk_bigrams(cjk))
+        else:
+            tokens.append(word)
+    return ' '.join(tokens)
+
+
+def build_match_query(query):
+    """
+    把用户输入的关键词转换成FTS5 MATCH表达式
+
+    空格分隔的多个关键词之间为AND关系，每个关键词转换为一个短语查询。
+
+    Returns:
+        str: MATCH表达式，没有有效关键词时返回空字符串
+    """
+    phrases = []
+    for keyword in normalize_text(query).split():
+        parts = []
+        for cjk, word in TOKEN_RE.findall(keyword):
+            if cjk and len(cjk) == 1:
+                parts.append(f'"{cjk}"*')
+            elif cjk:
+                parts.append('"' + ' '.join(_cjk_bigrams(cjk, trailing=False)) + '"')
+            else:
+                parts.append(f'"{word}"')
+        phrases.extend(parts)
+    return ' AND '.join(phrases)
+
+
+def is_available():
+    """当前数据库是否支持FTS5全文搜索"""
+    return connection.vendor == 'sqlite'
+
+
+# ---------------------------------------------------------------------------
+# 索引维护
+# ---------------------------------------------------------------------------
+
+def entry_rowid(kind, object_id):
+    """计算索引条目的rowid"""
+    return object_id * 2 + KIND_CODES[kind]
+
+
+def _delete_entry(kind, object_id):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s',
+            [entry_rowid(kind, object_id)],
+        )
+
+
+def _write_entry(kind, object_id, book_id, title, body):
+    _delete_entry(kind, object_id)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, kind, book_id, title, body) '
+            f'VALUES (%s, %s, %s, %s, %s)',
+            [entry_rowid(kind, object_id), kind, book_id, segment(title), segment(body)],
+        )
+
+
+def index_book(book):
+    """
+    更新作品的索引条目
+
+    只索引已发布的标题和简介；作品是否公开在查询时通过books.is_public过滤，
+    因此作品可见性变化时不需要重建其章节索引。
+    """
+    if not is_available():
+        return
+    _write_entry('book', book.id, book.id, book.title, book.description)
+
+
+def index_chapter(chapter):
+    """更新章节的索引条目，只有审核通过的章节才会进入索引"""
+    if not is_available():
+        return
+    if chapter.is_visible_to_public:
+        _write_entry('chapter', chapter.id, chapter.book_id, chapter.title, chapter.content)
+    else:
+        _delete_entry('chapter', chapter.id)
+
+
+def remove_book(book_id):
+    """删除作品的索引条目（章节随级联删除各自清理）"""
+    if not is_available():
+        return
+    _delete_entry('book', book_id)
+
+
+def remove_chapter(chapter_id):
+    """删除章节的索引条目"""
+    if not is_available():
+        return
+    _delete_entry('chapter', chapter_id)
+
+
+def rebuild_index():
+    """
+    重建全部索引
+
+    Returns:
+        int: 写入的条目数
+    """
+    from .models import Book, Chapter
+
+    if not is_available():
+        return 0
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+
+    count = 0
+    for book in Book.objects.only('id', 'title', 'description').iterator():
+        _write_entry('book', book.id, book.id, book.title, book.description)
+        count += 1
+    for chapter in Chapter.objects.iterator():
+        if chapter.is_visible_to_public:
+            _write_entry('chapter', chapter.id, chapter.book_id, chapter.title, chapter.content)
+            count += 1
+    return count
+
+
+# ---------------------------------------------------------------------------
+# 查询
+# ---------------------------------------------------------------------------
+
+def make_snippet(text, query, radius=SNIPPET_RADIUS):
+    """
+    生成高亮摘要
+
+    以第一个命中的关键词为中心截取前后radius个字符，并用<mark>标记所有命中。
+    返回值已做HTML转义，可以直接在模板中使用|safe输出。
+    """
+    text = text or ''
+    keywords = [_normalize_with_offsets(k)[0] for k in query.split()]
+    keywords = [k for k in keywords if k]
+    if not keywords:
+        return escape(text[:radius * 2])
+
+    # 在规范化后的文本中查找（全角、兼容字符也能命中），再映射回原文位置高亮
+    normalized, offsets = _normalize_with_offsets(text)
+    pattern = re.compile('|'.join(re.escape(k) for k in keywords))
+    spans = []
+    for match in pattern.finditer(normalized):
+        span_start, span_end = offsets[match.start()], offsets[match.end() - 1] + 1
+        if spans and span_start <= spans[-1][1]:
+            # 重叠或相邻的命中合并（一个原文字符规范化为多个字符时，两个命中可能落在同一个原文字符上）
+            spans[-1] = (spans[-1][0], max(spans[-1][1], span_end))
+        else:
+            spans.append((span_start, span_end))
+
+    if spans:
+        start = max(spans[0][0] - radius, 0)
+        end = min(spans[0][1] + radius, len(text))
+    else:
+        start, end = 0, min(radius * 2, len(text))
+
+    pieces = []
+    cursor = start
+    for span_start, span_end in spans:
+        span_start, span_end = max(span_start, start), min(span_end, end)
+        if span_start >= span_end:
+            continue
+        pieces.append(escape(text[cursor:span_start]))
+        pieces.append(f'<mark>{escape(text[span_start:span_end])}</mark>')
+        cursor = span_end
+    pieces.append(escape(text[cursor:end]))
+
+    prefix = '…' if start > 0 else ''
+    suffix = '…' if end < len(text) else ''
+    return prefix + ''.join(pieces) + suffix
+
+
+class SearchResults:
+    """
+    惰性执行的搜索结果集
+
+    实现了count()和切片，可以直接交给Paginator分页；
+    每次切片只在数据库中取出当前页的条目并加载对应的作品/章节。
+    """
+
+    def __init__(self, query, kinds=('book', 'chapter'), chapter_author_id=None):
+        self.query = query
+        self.kinds = tuple(kinds)
+        self.chapter_author_id = chapter_author_id
+        self.match = build_match_query(query)
+        self._count = None
+
+    def _where(self):
+        placeholders = ', '.join(['%s'] * len(self.kinds))
+        sql = (
+            f'FROM {SEARCH_TABLE} '
+            f'JOIN books ON books.id = {SEARCH_TABLE}.book_id '
+            f'WHERE {SEARCH_TABLE} MATCH %s AND books.is_public = 1 '
+            f'AND {SEARCH_TABLE}.kind IN ({placeholders})'
+        )
+        params = [self.match, *self.kinds]
+        if 'chapter' in self.kinds and self.chapter_author_id is not None:
+            sql += f" AND ({SEARCH_TABLE}.kind != 'chapter' OR books.author_id = %s)"
+            params.append(self.chapter_author_id)
+        return sql, params
+
+    def count(self):
+        if self._count is None:
+            if not self.match or not is_available():
+                self._count = 0
+            else:
+                where, params = self._where()
+                with connection.cursor() as cursor:
+                    cursor.execute(f'SELECT COUNT(*) {where}', params)
+                    self._count = cursor.fetchone()[0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start = key.start or 0
+        stop = key.stop if key.stop is not None else self.count()
+        if not self.match or stop <= start or not is_available():
+            return []
+
+        where, params = self._where()
+        weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {SEARCH_TABLE}.kind, {SEARCH_TABLE}.rowid / 2, '
+                f'bm25({SEARCH_TABLE}, {weights}) AS rank '
+                f'{where} ORDER BY rank LIMIT %s OFFSET %s',
+                params + [stop - start, start],
+            )
+            rows = cursor.fetchall()
+        return self._hydrate(rows)
+
+    def _hydrate(self, rows):
+        from .models import Book, Chapter
+
+        book_ids = [int(object_id) for kind, object_id, _ in rows if kind == 'book']
+        chapter_ids = [int(object_id) for kind, object_id, _ in rows if kind == 'chapter']
+        books = Book.objects.select_related('author').in_bulk(book_ids)
+        chapters = Chapter.objects.select_related('book').in_bulk(chapter_ids)
+
+        hits = []
+        for kind, object_id, rank in rows:
+            object_id = int(object_id)
+            if kind == 'book' and object_id in books:
+                book = books[object_id]
+                book.search_snippet = make_snippet(book.description or book.title, self.query)
+                book.search_rank = rank
+                hits.append(book)
+            elif kind == 'chapter' and object_id in chapters:
+                chapter = chapters[object_id]
+                chapter.search_snippet = make_snippet(chapter.content, self.query)
+                chapter.search_rank = rank
+                hits.append(chapter)
+        return hits
+
+
+def matching_ids(query, kind, limit=1000):
+    """
+    全文索引中匹配关键词的对象ID（不过滤公开状态）
+
+    供管理后台搜索使用：章节正文压缩存储后不能在数据库中做模糊查询，改为查全文索引。
+    """
+    match = build_match_query(query)
+    if not match or not is_available():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid / 2 FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND kind = %s LIMIT %s',
+            [match, kind, limit],
+        )
+        return [int(row[0]) for row in cursor.fetchall()]
+
+
+def search(query, kinds=('book', 'chapter'), chapter_author_id=None):
+    """
+    全文搜索公开的作品和章节
+
+    Args:
+        query (str): 用户输入的关键词，空格分隔表示同时包含
+        kinds (tuple): 要搜索的条目类型
+        chapter_author_id (int): 章节只在该用户自己的作品中搜索
+            （章节阅读页目前只对作者开放，其他用户的章节结果打不开）
+
+    Returns:
+        SearchResults: 按相关度排序的惰性结果集
+    """
+    return SearchResults(query, kinds, chapter_author_id)
+
+
+def serialize_hit(hit):
+    """把搜索命中的作品/章节转换为API返回的字典"""
+    from .models import Chapter
+
+    if isinstance(hit, Chapter):
+        return {
+            'type': 'chapter',
+            'id': hit.id,
+            'book_id': hit.book_id,
+            'book_title': hit.book.title,
+            'chapter_number': hit.chapter_number,
+            'title': hit.title,
+            'snippet': hit.search_snippet,
+            'url': reverse('books:chapter_detail', args=[hit.book_id, hit.chapter_number]),
+        }
+    return {
+        'type': 'book',
+        'id': hit.id,
+        'book_id': hit.id,
+        'title': hit.title,
+        'author': hit.author.display_name or '',
+        'snippet': hit.search_snippet,
+        'url': reverse('books:book_detail', args=[hit.id]),
+    }
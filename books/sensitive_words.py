@@ -0,0 +1,189 @@
+"""
+敏感词匹配引擎
+基于Aho–Corasick自动机，一次扫描找出文本中的全部敏感词，耗时与词表大小无关。
+
+词表从外部文件加载（每行一个词，#开头为注释），文件修改后自动重新编译，无需重启进程。
+匹配前对文本做规范化：全角转半角、转小写，并忽略标点、空白和符号，
+因此"暴 力"、"暴-力"、"ＡＢＣ"之类的变体同样能被识别，返回的位置对应原文。
+"""
+import os
+import threading
+import time
+import unicodedata
+from collections import deque
+
+from django.conf import settings
+
+
+# 匹配时忽略的字符类别：标点(P)、分隔符/空白(Z)、符号(S)、控制字符(C)
+IGNORED_CATEGORIES = ('P', 'Z', 'S', 'C')
+
+
+def normalize_with_offsets(text):
+    """
+    规范化文本并记录每个规范化字符对应的原文位置
+
+    Returns:
+        tuple: (规范化文本, [原文下标, ...])
+    """
+    chars = []
+    offsets = []
+    for index, char in enumerate(text or ''):
+        for normalized in unicodedata.normalize('NFKC', char).lower():
+            if unicodedata.category(normalized)[0] in IGNORED_CATEGORIES:
+                continue
+            chars.append(normalized)
+            offsets.append(index)
+    return ''.join(chars), offsets
+
+
+def normalize_word(word):
+    return normalize_with_offsets(word)[0]
+
+
+class AhoCorasick:
+    """Aho–Corasick多模式匹配自动机"""
+
+    def __init__(self, words):
+        self.words = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+
+        for word in words:
+            self._add(word)
+        self._build()
+
+    def _add(self, word):
+        if not word:
+            return
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        if not self._output[state]:
+            self._output[state] = (len(self.words),)
+            self.words.append(word)
+
+    def _build(self):
+        """广度优先计算失败指针，并把失败链上的输出合并到每个状态"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                candidate = self._goto[fail].get(char, 0)
+                self._fail[next_state] = candidate if candidate != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter_matches(self, text):
+        """
+        扫描文本
+
+        Yields:
+            tuple: (结束位置（不含）, 词下标)
+        """
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for word_index in output[state]:
+                yield position + 1, word_index
+
+    def __len__(self):
+        return len(self.words)
+
+
+class SensitiveWordFilter:
+    """敏感词过滤器"""
+
+    def __init__(self, words):
+        normalized = sorted({normalize_word(word) for word in words} - {''})
+        self.automaton = AhoCorasick(normalized)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding='utf-8') as f:
+            words = [
+                line.strip() for line in f
+                if line.strip() and not line.lstrip().startswith('#')
+            ]
+        return cls(words)
+
+    def find_all(self, text):
+        """
+        找出文本中的全部敏感词
+
+        Returns:
+            list: [{'word': 敏感词, 'text': 原文片段, 'start': 起始位置, 'end': 结束位置（不含）}, ...]
+        """
+        normalized, offsets = normalize_with_offsets(text)
+        matches = []
+        for end, word_index in self.automaton.iter_matches(normalized):
+            word = self.automaton.words[word_index]
+            start = offsets[end - len(word)]
+            original_end = offsets[end - 1] + 1
+            matches.append({
+                'word': word,
+                'text': text[start:original_end],
+                'start': start,
+                'end': original_end,
+            })
+        matches.sort(key=lambda match: (match['start'], match['end']))
+        return matches
+
+    def contains(self, text):
+        normalized, _ = normalize_with_offsets(text)
+        return next(self.automaton.iter_matches(normalized), None) is not None
+
+
+_filter = None
+_filter_mtime = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_filter():
+    """
+    获取当前进程的敏感词过滤器
+
+    每隔SENSITIVE_WORDS_RELOAD_INTERVAL秒检查一次词表文件的修改时间，
+    文件变化后重新编译自动机；词表文件不存在时使用空词表。
+    """
+    global _filter, _filter_mtime, _checked_at
+
+    now = time.monotonic()
+    if _filter is not None and now - _checked_at < settings.SENSITIVE_WORDS_RELOAD_INTERVAL:
+        return _filter
+
+    with _lock:
+        if _filter is not None and now - _checked_at < settings.SENSITIVE_WORDS_RELOAD_INTERVAL:
+            return _filter
+        path = settings.SENSITIVE_WORDS_FILE
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if _filter is None or mtime != _filter_mtime:
+            _filter = SensitiveWordFilter.from_file(path) if mtime is not None else SensitiveWordFilter([])
+            _filter_mtime = mtime
+        _checked_at = now
+    return _filter
+
+
+def find_sensitive_words(text):
+    """找出文本中的全部敏感词，返回格式见SensitiveWordFilter.find_all"""
+    return get_filter().find_all(text)
@@ -0,0 +1,111 @@
+"""
+书籍模块信号处理
+保存/删除作品和章节时同步全文搜索索引、管理员审核队列、章节目录缓存和正文渲染缓存，
+用户/作品/章节/评论增删时增量更新管理员面板计数
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from accounts.models import User
+from comments.models import Comment
+from .models import Book, Chapter
+from . import reading, review_queue, search, toc
+
+
+@receiver(post_save, sender=Book)
+def update_book_search_index(sender, instance, raw=False, **kwargs):
+    """作品保存后更新索引"""
+    if raw:
+        return
+    search.index_book(instance)
+
+
+@receiver(post_save, sender=Chapter)
+def update_chapter_search_index(sender, instance, raw=False, **kwargs):
+    """章节保存后更新索引（未审核通过的章节会被移出索引）"""
+    if raw:
+        return
+    search.index_chapter(instance)
+
+
+@receiver(post_delete, sender=Book)
+def remove_book_search_index(sender, instance, **kwargs):
+    """作品删除后移除索引"""
+    search.remove_book(instance.id)
+
+
+@receiver(post_delete, sender=Chapter)
+def remove_chapter_search_index(sender, instance, **kwargs):
+    """章节删除后移除索引"""
+    search.remove_chapter(instance.id)
+
+
+@receiver(post_save, sender=Book)
+def sync_book_review_queue(sender, instance, raw=False, **kwargs):
+    """作品保存后同步审核队列"""
+    if raw:
+        return
+    review_queue.sync('book', instance)
+
+
+@receiver(post_save, sender=Chapter)
+def sync_chapter_review_queue(sender, instance, raw=False, **kwargs):
+    """章节保存后同步审核队列"""
+    if raw:
+        return
+    review_queue.sync('chapter', instance)
+
+
+@receiver(post_delete, sender=Book)
+def remove_book_review_queue(sender, instance, **kwargs):
+    review_queue.remove('book', instance.id)
+
+
+@receiver(post_delete, sender=Chapter)
+def remove_chapter_review_queue(sender, instance, **kwargs):
+    review_queue.remove('chapter', instance.id)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_book_toc(sender, instance, raw=False, **kwargs):
+    """作品保存/删除后清除目录缓存（调整章节顺序后也会保存作品）"""
+    if raw:
+        return
+    toc.invalidate(instance.id)
+
+
+@receiver(post_save, sender=Chapter)
+@receiver(post_delete, sender=Chapter)
+def invalidate_chapter_toc(sender, instance, raw=False, **kwargs):
+    """章节保存/删除后清除所属作品的目录缓存"""
+    if raw:
+        return
+    toc.invalidate(instance.book_id)
+
+
+@receiver(post_save, sender=Chapter)
+def forget_replaced_chapter_body(sender, instance, raw=False, **kwargs):
+    """章节正文修改后清除旧正文的渲染缓存"""
+    if raw:
+        return
+    reading.forget_replaced_body(instance)
+
+
+COUNTED_MODELS = {User: 'user', Book: 'book', Chapter: 'chapter', Comment: 'comment'}
+
+
+def increment_total(sender, instance, created=False, raw=False, **kwargs):
+    """新建对象后总数加一"""
+    if created and not raw:
+        review_queue.incr_counter(review_queue.TOTAL_COUNTERS[COUNTED_MODELS[sender]])
+
+
+def decrement_total(sender, instance, **kwargs):
+    """删除对象后总数减一"""
+    review_queue.incr_counter(review_queue.TOTAL_COUNTERS[COUNTED_MODELS[sender]], -1)
+
+
+for model in COUNTED_MODELS:
+    post_save.connect(increment_total, sender=model, dispatch_uid=f'dashboard_total_incr_{model.__name__}')
+    post_delete.connect(decrement_total, sender=model, dispatch_uid=f'dashboard_total_decr_{model.__name__}')
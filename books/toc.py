@@ -0,0 +1,68 @@
+"""
+章节目录
+目录只需要章节号、标题、字数和审核状态，用only()/values()只读取这些列，不加载章节正文。
+
+作品详情页和目录接口读取缓存的目录；章节或作品保存/删除时（见signals）
+以及批量审核、调整章节顺序之后清除缓存。
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Chapter
+
+
+# 目录使用的字段（不含content/content_pending）
+TOC_FIELDS = (
+    'id', 'chapter_number', 'title', 'title_pending', 'word_count', 'has_pending_content',
+    'ai_check_title', 'ai_check_content', 'adm_check_title', 'adm_check_content',
+    'title_reject_reason', 'content_reject_reason', 'updated_at',
+)
+
+# 非作者可以看到的字段
+PUBLIC_TOC_FIELDS = ('chapter_number', 'title', 'word_count', 'updated_at')
+
+
+def toc_queryset(book_id):
+    """只加载目录字段的章节查询（返回模型实例，访问正文会触发额外查询）"""
+    return Chapter.objects.filter(book_id=book_id).only('book', *TOC_FIELDS).order_by('chapter_number')
+
+
+def cache_key(book_id):
+    return f'books:toc:{book_id}'
+
+
+def get_toc(book_id):
+    """
+    获取作品目录（优先读缓存）
+
+    Returns:
+        list: [{TOC_FIELDS中的字段: 值}, ...]，按章节号排序
+    """
+    key = cache_key(book_id)
+    entries = cache.get(key)
+    if entries is None:
+        entries = list(
+            Chapter.objects.filter(book_id=book_id).order_by('chapter_number').values(*TOC_FIELDS)
+        )
+        cache.set(key, entries, settings.TOC_CACHE_TTL)
+    return entries
+
+
+def invalidate(book_id):
+    """
+    清除作品目录缓存
+
+    立即清除一次，事务提交后再清除一次，避免提交前被并发请求用旧数据重新填充。
+    """
+    key = cache_key(book_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def serialize_entry(entry, full=True):
+    """目录条目转为JSON，非作者只返回公开字段"""
+    fields = TOC_FIELDS if full else PUBLIC_TOC_FIELDS
+    data = {field: entry[field] for field in fields}
+    data['updated_at'] = entry['updated_at'].isoformat() if entry['updated_at'] else None
+    return data
@@ -17,16 +17,23 @@ urlpatterns = [
     path('create/book/<int:book_id>/chapters/', views.ChapterListView.as_view(), name='chapter_list'),
     path('create/book/<int:book_id>/chapter/new/', views.CreateChapterView.as_view(), name='create_chapter'),
     path('create/book/<int:book_id>/chapter/<int:chapter_number>/', views.EditChapterView.as_view(), name='edit_chapter'),
+    path('create/book/<int:book_id>/chapter/<int:chapter_number>/delete/', views.delete_chapter, name='delete_chapter'),
     
     # API接口
     path('api/search/', views.SearchAPIView.as_view(), name='api_search'),
+    path('api/books/', views.BookListAPIView.as_view(), name='api_book_list'),
     path('api/auto-save-book/', views.AutoSaveBookAPIView.as_view(), name='api_auto_save_book'),
     path('api/auto-save-chapter/', views.AutoSaveChapterAPIView.as_view(), name='api_auto_save_chapter'),
     path('api/publish-book/', views.PublishBookAPIView.as_view(), name='api_publish_book'),
     path('api/publish-chapter/', views.PublishChapterAPIView.as_view(), name='api_publish_chapter'),
+    path('api/book/<int:book_id>/toc/', views.BookTOCAPIView.as_view(), name='api_book_toc'),
+    path('api/book/<int:book_id>/chapter/<int:chapter_number>/revisions/', views.ChapterRevisionListAPIView.as_view(), name='api_chapter_revisions'),
+    path('api/book/<int:book_id>/chapter/<int:chapter_number>/revisions/<int:number>/', views.ChapterRevisionAPIView.as_view(), name='api_chapter_revision'),
+    path('api/book/<int:book_id>/reorder-chapters/', views.ChapterReorderAPIView.as_view(), name='api_reorder_chapters'),
     
     # 管理员页面
     path('admin-panel/', views.AdminPanelView.as_view(), name='admin_panel'),
     path('admin-panel/review/book/<int:content_id>/', views.AdminReviewView.as_view(), name='admin_review'),
     path('admin-panel/review/chapter/<int:book_id>/', views.AdminChapterReviewView.as_view(), name='admin_chapter_review'),
+    path('admin-panel/api/bulk-review/', views.AdminBulkReviewAPIView.as_view(), name='api_bulk_review'),
 ]
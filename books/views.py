@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
@@ -13,11 +14,12 @@ from django.utils.decorators import method_decorator
 from django.urls import reverse
 from django.utils import timezone
 import json
+import uuid
 
-from .models import Book, BookDraft, Chapter, ChapterDraft
-from .ai_utils import check_content_by_ai
-from accounts.models import User
-from comments.models import Comment
+from .models import Book, BookDraft, Chapter, ChapterRevision
+from . import autosave, diffs, moderation, ordering, reading, review_queue, revisions, search, toc
+from .idempotency import idempotent
+from .pagination import CursorPaginator, InvalidCursor
 
 
 class IndexView(LoginRequiredMixin, TemplateView):
@@ -37,20 +39,37 @@ class ReadView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         
         # 获取所有通过审核的公开作品
-        # 使用模型中定义的is_visible_to_public属性进行过滤
-        all_books = Book.objects.all().order_by('-updated_at')
-        books = [book for book in all_books if book.is_visible_to_public]
-        
-        # 搜索功能
-        search_query = self.request.GET.get('search', '')
-        if search_query:
-            books = [book for book in books if 
-                    search_query.lower() in book.title.lower() or 
-                    search_query.lower() in (book.description or '').lower()]
-        
-        # 手动分页（因为我们使用了Python过滤）
-        paginator = Paginator(books, 10)
+        # is_public由Book.save()根据审核状态维护，过滤、排序、分页均在数据库中完成
+        books = Book.objects.filter(is_public=True).select_related('author').order_by('-updated_at')
+        
+        # 搜索功能（全文索引，按相关度排序）
+        search_query = self.request.GET.get('search', '').strip()
+        if search_query and search.is_available():
+            books = search.search(search_query, kinds=('book',))
+        elif search_query:
+            books = books.filter(
+                Q(title__icontains=search_query) |
+                Q(description__icontains=search_query)
+            )
+        
+        # 未搜索时默认使用游标分页，翻页代价与页数无关；旧的?page=链接仍按页码分页
         page_number = self.request.GET.get('page')
+        if not search_query and not page_number:
+            try:
+                cursor_page = CursorPaginator(books, ('-updated_at', '-id'), 10).page(
+                    self.request.GET.get('cursor')
+                )
+            except InvalidCursor:
+                cursor_page = CursorPaginator(books, ('-updated_at', '-id'), 10).page()
+            context.update({
+                'cursor_page': cursor_page,
+                'books': cursor_page.object_list,
+                'search_query': search_query,
+                'is_paginated': False,
+            })
+            return context
+        
+        paginator = Paginator(books, 10)
         page_obj = paginator.get_page(page_number)
         
         context.update({
@@ -64,6 +83,40 @@ class ReadView(LoginRequiredMixin, TemplateView):
         return context
 
 
+class BookListAPIView(LoginRequiredMixin, TemplateView):
+    """作品列表API - 游标分页，供无限滚动使用"""
+    
+    def get(self, request, *args, **kwargs):
+        try:
+            page_size = min(max(int(request.GET.get('page_size', 20)), 1), 50)
+        except ValueError:
+            page_size = 20
+        
+        books = Book.objects.filter(is_public=True).select_related('author')
+        try:
+            page = CursorPaginator(books, ('-updated_at', '-id'), page_size).page(request.GET.get('cursor'))
+        except InvalidCursor as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        
+        return JsonResponse({
+            'success': True,
+            'results': [
+                {
+                    'id': book.id,
+                    'title': book.title,
+                    'description': book.description,
+                    'author': book.author.display_name or '',
+                    'updated_at': book.updated_at.isoformat(),
+                    'url': reverse('books:book_detail', args=[book.id]),
+                }
+                for book in page.object_list
+            ],
+            'next_cursor': page.next_cursor,
+            'previous_cursor': page.previous_cursor,
+            'has_next': page.has_next,
+        })
+
+
 class CreateView(LoginRequiredMixin, TemplateView):
     """创建作品页面"""
     template_name = 'books/create.html'
@@ -87,54 +140,54 @@ class CreateView(LoginRequiredMixin, TemplateView):
 
 
 class BookDetailView(LoginRequiredMixin, TemplateView):
-    """作品详情页面"""
+    """作品详情页面（支持ETag/Last-Modified条件请求）"""
     template_name = 'books/book_detail.html'
     login_url = '/accounts/login/'
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        book_id = kwargs.get('book_id')
-        
-        book = get_object_or_404(Book, id=book_id)
+    def get(self, request, *args, **kwargs):
+        book = get_object_or_404(Book, id=kwargs.get('book_id'))
         
         # 检查权限：作者可以查看自己的所有作品，其他用户只能查看通过审核的公开作品
-        if book.author != self.request.user and not book.is_visible_to_public:
+        if book.author_id != request.user.id and not book.is_visible_to_public:
             raise Http404("作品不存在")
         
-        # 获取章节列表
-        chapters = Chapter.objects.filter(book=book).order_by('chapter_number')
+        # 章节目录来自缓存的目录投影，不加载章节正文
+        chapters = toc.get_toc(book.id)
         
-        context.update({
-            'book': book,
-            'chapters': chapters,
-        })
-        
-        return context
+        etag, last_modified = reading.book_validators(book, chapters, request.user)
+        return reading.conditional_response(request, etag, last_modified, lambda: self.render_to_response(
+            self.get_context_data(book=book, chapters=chapters, **kwargs)
+        ))
 
 
 class ChapterDetailView(LoginRequiredMixin, TemplateView):
-    """章节详情页面"""
+    """章节详情页面（支持ETag/Last-Modified条件请求，正文渲染结果按正文哈希缓存）"""
     template_name = 'books/chapter_detail.html'
     login_url = '/accounts/login/'
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        book_id = kwargs.get('book_id')
-        chapter_number = kwargs.get('chapter_number')
-        
-        book = get_object_or_404(Book, id=book_id)
-        chapter = get_object_or_404(Chapter, book=book, chapter_number=chapter_number)
+    def get(self, request, *args, **kwargs):
+        book = get_object_or_404(Book, id=kwargs.get('book_id'))
         
         # 检查权限
-        if book.author != self.request.user:
+        if book.author_id != request.user.id:
             raise Http404("作品不存在")
         
-        context.update({
-            'book': book,
-            'chapter': chapter,
-        })
-        
-        return context
+        # 正文只在渲染缓存未命中时读取
+        chapter = get_object_or_404(
+            Chapter.objects.defer('content', 'content_pending'),
+            book=book, chapter_number=kwargs.get('chapter_number'),
+        )
+        
+        etag, last_modified = reading.chapter_validators(book, chapter, request.user)
+        return reading.conditional_response(request, etag, last_modified, lambda: self.render_to_response(
+            self.get_context_data(
+                book=book,
+                chapter=chapter,
+                chapter_body=reading.render_chapter_body(chapter),
+                is_author=reading.viewer_role(book, request.user) == 'author',
+                **kwargs
+            )
+        ))
 
 
 class CreateBookView(LoginRequiredMixin, TemplateView):
@@ -142,6 +195,13 @@ class CreateBookView(LoginRequiredMixin, TemplateView):
     template_name = 'books/create_book.html'
     login_url = '/accounts/login/'
     
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # 每次打开页面生成一个幂等键，重复提交同一个表单只创建一次
+        context['idempotency_key'] = uuid.uuid4().hex
+        return context
+    
+    @method_decorator(idempotent('create_book'))
     def post(self, request, *args, **kwargs):
         """处理创建作品的POST请求"""
         title = request.POST.get('title', '').strip()
@@ -152,32 +212,19 @@ class CreateBookView(LoginRequiredMixin, TemplateView):
         
         try:
             with transaction.atomic():
-                # AI审核标题和描述
-                try:
-                    title_ai_result = check_content_by_ai(title)
-                except Exception as e:
-                    title_ai_result = {'approved': False, 'reason': f'AI审核服务不可用: {str(e)}'}
-                
-                try:
-                    description_ai_result = check_content_by_ai(description) if description else {'approved': True, 'reason': ''}
-                except Exception as e:
-                    description_ai_result = {'approved': False, 'reason': f'AI审核服务不可用: {str(e)}'}
+                book = Book(author=request.user, title='', description='')
                 
-                # 确定审核状态和pending字段
-                ai_title_status = 'approved' if title_ai_result['approved'] else 'pending'
-                ai_desc_status = 'approved' if description_ai_result['approved'] else 'pending'
+                # 标题和简介写入待审核字段，AI审核由审核工作进程异步完成
+                moderation.mark_pending(book, 'book', 'title', title)
+                if description:
+                    moderation.mark_pending(book, 'book', 'description', description)
+                else:
+                    moderation.mark_approved(book, 'book', 'description', '')
+                book.save()
                 
-                book = Book.objects.create(
-                    author=request.user,
-                    title=title if title_ai_result['approved'] else '',
-                    description=description if description_ai_result['approved'] else '',
-                    title_pending=title if not title_ai_result['approved'] else None,
-                    description_pending=description if not description_ai_result['approved'] else None,
-                    ai_check_title=ai_title_status,
-                    ai_check_description=ai_desc_status,
-                    title_reject_reason=title_ai_result.get('reason', ''),
-                    description_reject_reason=description_ai_result.get('reason', '')
-                )
+                moderation.enqueue('book', book.id, 'title', title)
+                if description:
+                    moderation.enqueue('book', book.id, 'description', description)
                 
                 # 创建草稿
                 BookDraft.objects.create(
@@ -186,28 +233,15 @@ class CreateBookView(LoginRequiredMixin, TemplateView):
                     description=description
                 )
             
-            # 构建响应消息
-            messages = []
-            if title_ai_result['approved'] and description_ai_result['approved']:
-                messages.append('✅ 作品创建成功，AI审核通过')
-            else:
-                messages.append('📝 作品创建成功')
-                if not title_ai_result['approved']:
-                    messages.append(f'❌ AI审核标题不通过：{title_ai_result.get("reason", "未知原因")}')
-                if not description_ai_result['approved']:
-                    messages.append(f'❌ AI审核简介不通过：{description_ai_result.get("reason", "未知原因")}')
-                if not title_ai_result['approved'] or not description_ai_result['approved']:
-                    messages.append('⏳ 请等待管理员审核')
-            
             return JsonResponse({
                 'success': True,
-                'message': '\n'.join(messages),
+                'message': '📝 作品创建成功\n⏳ 正在进行AI审核，审核通过后将公开显示',
                 'book_id': book.id,
                 'ai_check_status': {
                     'title': book.ai_check_title,
                     'description': book.ai_check_description,
-                    'title_reason': title_ai_result.get('reason', ''),
-                    'description_reason': description_ai_result.get('reason', '')
+                    'title_reason': '',
+                    'description_reason': ''
                 }
             })
             
@@ -255,68 +289,35 @@ class EditBookView(LoginRequiredMixin, TemplateView):
             return JsonResponse({'success': False, 'error': '作品标题不能为空'})
         
         try:
-            with transaction.atomic():
-                # 检查是否有实际修改
-                title_changed = title != book.title
-                description_changed = description != book.description
-                
-                if title_changed or description_changed:
-                    # 如果有修改，进行AI审核
+            # 检查是否有实际修改
+            title_changed = title != book.title
+            description_changed = description != book.description
+            
+            if title_changed or description_changed:
+                with transaction.atomic():
+                    # 修改内容写入待审核字段，AI审核由审核工作进程异步完成
                     if title_changed:
-                        title_ai_result = check_content_by_ai(title)
-                        book.title_pending = title
-                        book.ai_check_title = 'approved' if title_ai_result['approved'] else 'rejected'
-                        book.title_reject_reason = title_ai_result.get('reason', '')
-                        book.adm_check_title = None  # 重置管理员审核
-                        
-                        # 如果AI审核通过，直接更新正式字段
-                        if title_ai_result['approved']:
-                            book.title = title
+                        moderation.mark_pending(book, 'book', 'title', title)
                     
                     if description_changed:
-                        description_ai_result = check_content_by_ai(description) if description else {'approved': True, 'reason': ''}
-                        book.description_pending = description
-                        book.ai_check_description = 'approved' if description_ai_result['approved'] else 'rejected'
-                        book.description_reject_reason = description_ai_result.get('reason', '')
-                        book.adm_check_description = None  # 重置管理员审核
-                        
-                        # 如果AI审核通过，直接更新正式字段
-                        if description_ai_result['approved']:
-                            book.description = description
+                        if description:
+                            moderation.mark_pending(book, 'book', 'description', description)
+                        else:
+                            moderation.mark_approved(book, 'book', 'description', '')
                     
                     book.save()
                     
-                    # 更新草稿
-                    draft, created = BookDraft.objects.get_or_create(book=book)
-                    draft.title = title
-                    draft.description = description
-                    draft.save()
-                    
-                    # 构建响应消息
-                    messages = []
-                    if title_changed or description_changed:
-                        # 检查AI审核状态
-                        title_ai_approved = not title_changed or book.ai_check_title == 'approved'
-                        desc_ai_approved = not description_changed or book.ai_check_description == 'approved'
-                        
-                        if title_ai_approved and desc_ai_approved:
-                            messages.append('✅ 作品修改成功，AI审核通过')
-                        else:
-                            messages.append('📝 作品修改成功')
-                            if title_changed and book.ai_check_title == 'pending':
-                                title_reason = getattr(book, 'title_reject_reason', '')
-                                if title_reason:
-                                    messages.append(f'⚠️ AI审核标题不通过：{title_reason}')
-                            if description_changed and book.ai_check_description == 'pending':
-                                desc_reason = getattr(book, 'description_reject_reason', '')
-                                if desc_reason:
-                                    messages.append(f'⚠️ AI审核简介不通过：{desc_reason}')
-                            if not (title_ai_approved and desc_ai_approved):
-                                messages.append('⏳ 请等待管理员审核')
-                    else:
-                        messages.append('ℹ️ 没有检测到修改')
+                    if title_changed:
+                        moderation.enqueue('book', book.id, 'title', title)
+                    if description_changed and description:
+                        moderation.enqueue('book', book.id, 'description', description)
                     
-                    message = '\n'.join(messages)
+                    # 更新草稿（取代缓存中尚未刷写的自动保存草稿）
+                    autosave.publish_book_draft(book, title, description)
+                
+                message = '📝 作品修改成功\n⏳ 修改内容正在进行AI审核，审核通过后将更新显示'
+            else:
+                message = 'ℹ️ 没有检测到修改'
             
             return JsonResponse({
                 'success': True,
@@ -349,7 +350,8 @@ class ChapterListView(LoginRequiredMixin, TemplateView):
         if book.author != self.request.user:
             raise Http404("作品不存在")
         
-        chapters = Chapter.objects.filter(book=book).order_by('chapter_number')
+        # 只加载目录字段，不读取章节正文
+        chapters = toc.toc_queryset(book.id)
         
         context.update({
             'book': book,
@@ -376,10 +378,12 @@ class CreateChapterView(LoginRequiredMixin, TemplateView):
         
         context.update({
             'book': book,
+            'idempotency_key': uuid.uuid4().hex,
         })
         
         return context
     
+    @method_decorator(idempotent('create_chapter'))
     def post(self, request, *args, **kwargs):
         """处理创建章节的POST请求"""
         book_id = kwargs.get('book_id')
@@ -398,50 +402,46 @@ class CreateChapterView(LoginRequiredMixin, TemplateView):
         if not content:
             return JsonResponse({'success': False, 'error': '章节内容不能为空'})
         
+        position = request.POST.get('position')
+        if position:
+            try:
+                position = int(position)
+            except ValueError:
+                return JsonResponse({'success': False, 'error': '插入位置无效'})
+        else:
+            position = None
+        
         try:
             with transaction.atomic():
-                # 获取下一个章节号
-                last_chapter = Chapter.objects.filter(book=book).order_by('-chapter_number').first()
-                chapter_number = (last_chapter.chapter_number + 1) if last_chapter else 1
-                
-                # AI审核标题和内容
-                title_ai_result = check_content_by_ai(title)
-                content_ai_result = check_content_by_ai(content)
+                # 获取章节号：指定position时在该位置插入，原位置及之后的章节依次后移
+                chapter_number = ordering.make_room(book, position)
                 
-                chapter = Chapter.objects.create(
+                # 标题和内容写入待审核字段，AI审核由审核工作进程异步完成
+                chapter = Chapter(
                     book=book,
                     author=request.user,
                     chapter_number=chapter_number,
-                    title=title,
-                    content=content,
-                    ai_check_title='approved' if title_ai_result['approved'] else 'rejected',
-                    ai_check_content='approved' if content_ai_result['approved'] else 'rejected',
-                    title_reject_reason=title_ai_result.get('reason', ''),
-                    content_reject_reason=content_ai_result.get('reason', '')
+                    title='',
+                    content=''
                 )
+                moderation.mark_pending(chapter, 'chapter', 'title', title)
+                moderation.mark_pending(chapter, 'chapter', 'content', content)
+                chapter.save()
                 
-                # 创建草稿
-                ChapterDraft.objects.create(
-                    book=book,
-                    author=request.user,
-                    chapter_number=chapter_number,
-                    title=title,
-                    content=content
-                )
+                moderation.enqueue('chapter', chapter.id, 'title', title)
+                moderation.enqueue('chapter', chapter.id, 'content', content)
+                
+                # 记录第一个版本，创建草稿（草稿正文存为相对已发布内容的增量）
+                revisions.record_revision(chapter, title, content, author=request.user, source='create')
+                revisions.save_draft(book, chapter_number, request.user, title, content, chapter=chapter)
                 
                 # 更新作品的最后章节更新时间
                 book.last_chapter_update = timezone.now()
                 book.save()
             
-            # 构建响应消息
-            if title_ai_result['approved'] and content_ai_result['approved']:
-                message = '章节创建成功，AI审核通过'
-            else:
-                message = '章节创建成功，但AI审核未通过，请等待管理员审核'
-            
             return JsonResponse({
                 'success': True,
-                'message': message,
+                'message': '章节创建成功，正在进行AI审核',
                 'chapter_number': chapter_number,
                 'ai_check_status': {
                     'title': chapter.ai_check_title,
@@ -476,6 +476,8 @@ class EditChapterView(LoginRequiredMixin, TemplateView):
         context.update({
             'book': book,
             'chapter': chapter,
+            'draft': autosave.load_chapter_draft(book, chapter),
+            'revisions': revisions.list_revisions(chapter, limit=settings.REVISION_LIST_SIZE),
         })
         
         return context
@@ -502,65 +504,7 @@ class EditChapterView(LoginRequiredMixin, TemplateView):
             return JsonResponse({'success': False, 'error': '章节内容不能为空'})
         
         try:
-            with transaction.atomic():
-                # 检查是否有实际修改
-                title_changed = title != chapter.title
-                content_changed = content != chapter.content
-                
-                if title_changed or content_changed:
-                    # 如果有修改，进行AI审核
-                    if title_changed:
-                        title_ai_result = check_content_by_ai(title)
-                        chapter.title_pending = title
-                        chapter.ai_check_title = 'approved' if title_ai_result['approved'] else 'rejected'
-                        chapter.title_reject_reason = title_ai_result.get('reason', '')
-                        chapter.adm_check_title = None  # 重置管理员审核
-                        
-                        # 如果AI审核通过，直接更新正式字段
-                        if title_ai_result['approved']:
-                            chapter.title = title
-                    
-                    if content_changed:
-                        content_ai_result = check_content_by_ai(content)
-                        chapter.content_pending = content
-                        chapter.ai_check_content = 'approved' if content_ai_result['approved'] else 'rejected'
-                        chapter.content_reject_reason = content_ai_result.get('reason', '')
-                        chapter.adm_check_content = None  # 重置管理员审核
-                        
-                        # 如果AI审核通过，直接更新正式字段
-                        if content_ai_result['approved']:
-                            chapter.content = content
-                    
-                    chapter.save()
-                    
-                    # 更新草稿
-                    draft, created = ChapterDraft.objects.get_or_create(
-                        book=book, 
-                        chapter_number=chapter_number,
-                        defaults={'author': request.user}
-                    )
-                    draft.title = title
-                    draft.content = content
-                    draft.save()
-                    
-                    # 更新作品的最后章节更新时间
-                    book.last_chapter_update = timezone.now()
-                    book.save()
-                    
-                    # 构建响应消息
-                    ai_passed = True
-                    if title_changed and chapter.ai_check_title == 'rejected':
-                        ai_passed = False
-                    if content_changed and chapter.ai_check_content == 'rejected':
-                        ai_passed = False
-                    
-                    if ai_passed:
-                        message = '章节修改成功，AI审核通过'
-                    else:
-                        message = '章节修改成功，但AI审核未通过，请等待管理员审核'
-                else:
-                    message = '没有检测到修改'
-            
+            message = submit_chapter_edit(book, chapter, request.user, title, content)
             return JsonResponse({
                 'success': True,
                 'message': message,
@@ -577,26 +521,165 @@ class EditChapterView(LoginRequiredMixin, TemplateView):
             })
 
 
+def submit_chapter_edit(book, chapter, user, title, content, source='edit'):
+    """
+    提交章节修改：写入待审核字段并排队AI审核，记录修订版本，更新草稿
+    
+    Returns:
+        str: 提示信息
+    """
+    title_changed = title != chapter.title
+    content_changed = content != chapter.content
+    if not title_changed and not content_changed:
+        return '没有检测到修改'
+    
+    # 上一版本通常就是之前的待审核内容或已发布内容，记录版本时不需要从历史中还原
+    known_texts = (chapter.content_pending, chapter.content)
+    with transaction.atomic():
+        # 修改内容写入待审核字段，AI审核由审核工作进程异步完成
+        if title_changed:
+            moderation.mark_pending(chapter, 'chapter', 'title', title)
+        if content_changed:
+            moderation.mark_pending(chapter, 'chapter', 'content', content)
+        chapter.save()
+        
+        if title_changed:
+            moderation.enqueue('chapter', chapter.id, 'title', title)
+        if content_changed:
+            moderation.enqueue('chapter', chapter.id, 'content', content)
+            # 提交时计算一次修改对比，审核页面直接读取
+            diffs.store_chapter_diff(chapter)
+        
+        revisions.record_revision(chapter, title, content, author=user, source=source, known_texts=known_texts)
+        # 提交的内容取代缓存中尚未刷写的自动保存草稿，草稿立即落库
+        autosave.publish_chapter_draft(book, chapter, user, title, content)
+        
+        # 更新作品的最后章节更新时间
+        book.last_chapter_update = timezone.now()
+        book.save()
+    
+    return '章节修改成功，正在进行AI审核'
+
+
 # API 视图类
 class SearchAPIView(LoginRequiredMixin, TemplateView):
-    """搜索API"""
+    """搜索API - 全文搜索公开的作品和章节（章节阅读页只对作者开放，章节只搜索自己的作品）"""
     
     def get(self, request, *args, **kwargs):
-        return JsonResponse({'success': True, 'results': []})
+        query = request.GET.get('q', request.GET.get('search', '')).strip()
+        search_type = request.GET.get('type', '')
+        
+        if not query:
+            return JsonResponse({'success': True, 'results': [], 'total': 0})
+        
+        kinds = (search_type,) if search_type in ('book', 'chapter') else ('book', 'chapter')
+        
+        try:
+            page_size = min(int(request.GET.get('page_size', 20)), 50)
+        except ValueError:
+            page_size = 20
+        
+        paginator = Paginator(
+            search.search(query, kinds=kinds, chapter_author_id=request.user.id), max(page_size, 1)
+        )
+        page_obj = paginator.get_page(request.GET.get('page'))
+        
+        return JsonResponse({
+            'success': True,
+            'results': [search.serialize_hit(hit) for hit in page_obj.object_list],
+            'total': paginator.count,
+            'page': page_obj.number,
+            'num_pages': paginator.num_pages,
+            'has_next': page_obj.has_next(),
+        })
+
+
+def _int_param(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _auto_save_response(save):
+    """
+    执行自动保存并转换为JSON响应
+
+    版本冲突返回409：conflict表示其他窗口已经保存过，需要刷新页面；
+    resync表示服务器没有客户端基于的版本，客户端应以返回的version提交完整内容。
+    """
+    try:
+        version = save()
+    except autosave.StaleVersion as e:
+        return JsonResponse({'success': False, 'error': str(e), 'conflict': True, 'version': e.version}, status=409)
+    except autosave.ResyncRequired as e:
+        return JsonResponse({'success': False, 'error': str(e), 'resync': True, 'version': e.version}, status=409)
+    except autosave.Busy as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=503)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': '增量与草稿不匹配', 'resync': True}, status=400)
+    
+    autosave.maybe_flush()
+    return JsonResponse({'success': True, 'message': '保存成功', 'version': version})
 
 
 class AutoSaveBookAPIView(LoginRequiredMixin, TemplateView):
-    """自动保存作品API"""
+    """
+    自动保存作品API
+    
+    参数：book_id、version（页面加载或上次保存后的草稿版本）、title，
+    以及description（完整简介）或description_patch（相对上次保存内容的增量）。
+    草稿先写入缓存，定期批量写入数据库（见books.autosave）。
+    """
     
     def post(self, request, *args, **kwargs):
-        return JsonResponse({'success': True, 'message': '保存成功'})
+        book = (
+            Book.objects.filter(id=_int_param(request.POST.get('book_id')), author=request.user)
+            .only('id')
+            .first()
+        )
+        if book is None:
+            return JsonResponse({'success': False, 'error': '作品不存在'}, status=404)
+        
+        return _auto_save_response(lambda: autosave.save_book(
+            book,
+            _int_param(request.POST.get('version')),
+            request.POST.get('title', '').strip(),
+            description=request.POST.get('description', ''),
+            patch=request.POST.get('description_patch'),
+        ))
 
 
 class AutoSaveChapterAPIView(LoginRequiredMixin, TemplateView):
-    """自动保存章节API"""
+    """
+    自动保存章节API
+    
+    参数：book_id、chapter_number、version、title，以及content（完整正文）
+    或content_patch（相对上次保存内容的增量），用法同AutoSaveBookAPIView。
+    """
     
     def post(self, request, *args, **kwargs):
-        return JsonResponse({'success': True, 'message': '保存成功'})
+        # 只读取定位草稿所需的列，缓存命中时不加载章节正文
+        chapter = (
+            Chapter.objects.filter(
+                book_id=_int_param(request.POST.get('book_id')),
+                chapter_number=_int_param(request.POST.get('chapter_number')),
+                book__author=request.user,
+            )
+            .only('id', 'book_id', 'chapter_number')
+            .first()
+        )
+        if chapter is None:
+            return JsonResponse({'success': False, 'error': '章节不存在'}, status=404)
+        
+        return _auto_save_response(lambda: autosave.save_chapter(
+            chapter,
+            request.user,
+            _int_param(request.POST.get('version')),
+            request.POST.get('title', '').strip(),
+            content=request.POST.get('content', ''),
+            patch=request.POST.get('content_patch'),
+        ))
 
 
 class PublishBookAPIView(LoginRequiredMixin, TemplateView):
@@ -606,6 +689,113 @@ class PublishBookAPIView(LoginRequiredMixin, TemplateView):
         return JsonResponse({'success': True, 'message': '发布成功'})
 
 
+class BookTOCAPIView(LoginRequiredMixin, TemplateView):
+    """作品目录API"""
+    
+    def get(self, request, *args, **kwargs):
+        book = get_object_or_404(Book, id=kwargs.get('book_id'))
+        is_author = book.author_id == request.user.id
+        if not is_author and not book.is_visible_to_public:
+            return JsonResponse({'success': False, 'error': '作品不存在'}, status=404)
+        
+        # 作者看到全部章节及审核状态，其他用户只看到已发布标题的章节
+        entries = toc.get_toc(book.id)
+        if not is_author:
+            entries = [entry for entry in entries if entry['title']]
+        
+        return JsonResponse({
+            'success': True,
+            'book_id': book.id,
+            'chapters': [toc.serialize_entry(entry, full=is_author) for entry in entries],
+        })
+
+
+class ChapterRevisionMixin:
+    """章节修订历史API的公共部分：作者本人或管理员可以查看"""
+    
+    def get_chapter(self, request, **kwargs):
+        book = get_object_or_404(Book, id=kwargs.get('book_id'))
+        if book.author_id != request.user.id and not getattr(request.user, 'is_admin', False):
+            raise Http404("作品不存在")
+        chapter = get_object_or_404(Chapter, book=book, chapter_number=kwargs.get('chapter_number'))
+        return book, chapter
+
+
+class ChapterRevisionListAPIView(LoginRequiredMixin, ChapterRevisionMixin, TemplateView):
+    """章节修订历史列表API（不还原正文）"""
+    
+    def get(self, request, *args, **kwargs):
+        book, chapter = self.get_chapter(request, **kwargs)
+        return JsonResponse({
+            'success': True,
+            'revisions': [revisions.serialize_revision(revision) for revision in revisions.list_revisions(chapter)],
+        })
+
+
+class ChapterRevisionAPIView(LoginRequiredMixin, ChapterRevisionMixin, TemplateView):
+    """章节历史版本API：GET还原指定版本的正文，POST把该版本作为一次新的修改重新提交"""
+    
+    def get_revision(self, chapter, number):
+        revision = get_object_or_404(
+            ChapterRevision.objects.only(*revisions.LIST_FIELDS), chapter=chapter, number=number
+        )
+        return revision, revisions.materialize(chapter.id, number)
+    
+    def get(self, request, *args, **kwargs):
+        book, chapter = self.get_chapter(request, **kwargs)
+        revision, content = self.get_revision(chapter, kwargs.get('number'))
+        data = revisions.serialize_revision(revision)
+        data['content'] = content
+        return JsonResponse({'success': True, 'revision': data})
+    
+    def post(self, request, *args, **kwargs):
+        book, chapter = self.get_chapter(request, **kwargs)
+        if book.author_id != request.user.id:
+            return JsonResponse({'success': False, 'error': '权限不足'}, status=403)
+        revision, content = self.get_revision(chapter, kwargs.get('number'))
+        
+        try:
+            message = submit_chapter_edit(book, chapter, request.user, revision.title, content, source='restore')
+        except Exception as e:
+            return JsonResponse({'success': False, 'error': f'恢复失败: {str(e)}'})
+        
+        if message == '没有检测到修改':
+            message = '该版本与当前内容相同'
+        else:
+            message = f'已恢复到第{revision.number}版，正在进行AI审核'
+        return JsonResponse({'success': True, 'message': message})
+
+
+class ChapterReorderAPIView(LoginRequiredMixin, TemplateView):
+    """调整章节顺序API"""
+    
+    def post(self, request, *args, **kwargs):
+        """
+        请求体为JSON：{"order": [章节ID, ...]}，须包含作品的全部章节，按新顺序排列
+        """
+        book = get_object_or_404(Book, id=kwargs.get('book_id'))
+        if book.author != request.user:
+            return JsonResponse({'success': False, 'error': '权限不足'}, status=403)
+        
+        try:
+            order = json.loads(request.body or b'{}').get('order')
+        except (ValueError, AttributeError):
+            return JsonResponse({'success': False, 'error': '请求格式错误'}, status=400)
+        
+        if not isinstance(order, list) or not all(isinstance(item, int) for item in order):
+            return JsonResponse({'success': False, 'error': '请求格式错误'}, status=400)
+        
+        try:
+            moved = ordering.reorder_chapters(book, order)
+        except ordering.ReorderError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        
+        return JsonResponse({
+            'success': True,
+            'message': f'章节顺序已更新，调整了 {moved} 个章节',
+        })
+
+
 class PublishChapterAPIView(LoginRequiredMixin, TemplateView):
     """发布章节API"""
     
@@ -627,41 +817,59 @@ class AdminPanelView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # 获取需要管理员审核的作品
-        # 1. AI审核为pending的
-        # 2. AI审核为rejected但管理员尚未审核的
-        pending_books = Book.objects.filter(
-            Q(ai_check_title='pending') | 
-            Q(ai_check_description='pending') |
-            Q(ai_check_title='rejected', adm_check_title__isnull=True) |
-            Q(ai_check_description='rejected', adm_check_description__isnull=True)
-        ).order_by('-updated_at')
-        
-        # 获取需要管理员审核的章节
-        # 1. AI审核为pending的
-        # 2. AI审核为rejected但管理员尚未审核的
-        pending_chapters = Chapter.objects.filter(
-            Q(ai_check_title='pending') | 
-            Q(ai_check_content='pending') |
-            Q(ai_check_title='rejected', adm_check_title__isnull=True) |
-            Q(ai_check_content='rejected', adm_check_content__isnull=True)
-        ).order_by('-updated_at')
-        
+        # 待审核列表和统计都来自增量维护的审核队列表和计数器表，不扫描作品/章节表
+        counts = review_queue.get_counts()
         context.update({
-            'pending_books': pending_books,
-            'pending_chapters': pending_chapters,
-            'pending_books_count': pending_books.count(),
-            'pending_chapters_count': pending_chapters.count(),
-            # 添加统计数据
-            'total_users': User.objects.count(),
-            'total_books': Book.objects.count(),
-            'total_chapters': Chapter.objects.count(),
-            'total_comments': Comment.objects.count(),
+            'pending_books': review_queue.pending_items('book', settings.ADMIN_REVIEW_QUEUE_SIZE),
+            'pending_chapters': review_queue.pending_items('chapter', settings.ADMIN_REVIEW_QUEUE_SIZE),
+            'pending_books_count': counts['pending_books'],
+            'pending_chapters_count': counts['pending_chapters'],
+            'more_books': max(counts['pending_books'] - settings.ADMIN_REVIEW_QUEUE_SIZE, 0),
+            'more_chapters': max(counts['pending_chapters'] - settings.ADMIN_REVIEW_QUEUE_SIZE, 0),
+            'total_users': counts['total_users'],
+            'total_books': counts['total_books'],
+            'total_chapters': counts['total_chapters'],
+            'total_comments': counts['total_comments'],
         })
         
         return context
 
 
+class AdminBulkReviewAPIView(LoginRequiredMixin, TemplateView):
+    """管理员批量审核API"""
+    
+    def dispatch(self, request, *args, **kwargs):
+        if not getattr(request.user, 'is_admin', False):
+            return JsonResponse({'success': False, 'error': '权限不足'}, status=403)
+        return super().dispatch(request, *args, **kwargs)
+    
+    def post(self, request, *args, **kwargs):
+        """
+        请求体为JSON：{"items": [{"type", "id", "field", "action", "reason"}, ...]}
+        field省略时审核该对象所有待审核字段；返回与items一一对应的results
+        """
+        try:
+            items = json.loads(request.body or b'{}').get('items')
+        except (ValueError, AttributeError):
+            return JsonResponse({'success': False, 'error': '请求格式错误'}, status=400)
+        
+        if not isinstance(items, list) or not items:
+            return JsonResponse({'success': False, 'error': '没有要审核的内容'}, status=400)
+        if len(items) > settings.ADMIN_BULK_REVIEW_MAX_ITEMS:
+            return JsonResponse({
+                'success': False,
+                'error': f'单次最多审核 {settings.ADMIN_BULK_REVIEW_MAX_ITEMS} 项',
+            }, status=400)
+        
+        results = moderation.bulk_admin_review(items)
+        succeeded = sum(1 for result in results if result['success'])
+        return JsonResponse({
+            'success': True,
+            'message': f'已处理 {succeeded} 项，失败 {len(results) - succeeded} 项',
+            'results': results,
+        })
+
+
 class AdminReviewView(LoginRequiredMixin, TemplateView):
     """管理员审核页面"""
     template_name = 'books/admin_review.html'
@@ -750,7 +958,13 @@ class AdminReviewView(LoginRequiredMixin, TemplateView):
                     book.description_reject_reason = description_reason or '不符合社区规范'
                     messages.append('❌ 简介审核不通过')
             
-            book.save()
+            with transaction.atomic():
+                book.save()
+                # 管理员已作出决定，尚未执行的AI审核任务不再需要
+                moderation.cancel_queued('book', book.id, [
+                    field for field, action in (('title', title_action), ('description', description_action))
+                    if action in ['approve', 'reject']
+                ])
             print(f"保存成功，消息: {messages}")  # 调试信息
             
             return JsonResponse({
@@ -767,13 +981,116 @@ class AdminReviewView(LoginRequiredMixin, TemplateView):
 
 
 class AdminChapterReviewView(LoginRequiredMixin, TemplateView):
-    """管理员章节审核页面"""
+    """管理员章节审核页面 - 显示修改对比，可在作品的各章节之间翻页"""
     template_name = 'books/admin_chapter_review.html'
     login_url = '/accounts/login/'
+    
+    # 章节导航只加载列表需要的字段，不加载正文
+    NAV_FIELDS = (
+        'id', 'book_id', 'chapter_number', 'title', 'title_pending',
+        'ai_check_title', 'ai_check_content', 'adm_check_title', 'adm_check_content',
+    )
+    
+    def dispatch(self, request, *args, **kwargs):
+        # 检查管理员权限
+        if not getattr(request.user, 'is_admin', False):
+            raise Http404("页面不存在")
+        return super().dispatch(request, *args, **kwargs)
+    
+    def _chapter_nav(self, book):
+        chapters = list(
+            Chapter.objects.filter(book=book).only(*self.NAV_FIELDS).order_by('chapter_number')
+        )
+        for chapter in chapters:
+            chapter.needs_review = review_queue.needs_admin_review('chapter', chapter)
+        return chapters
+    
+    def _next_pending(self, chapters, chapter_number):
+        """当前章节之后（找不到时从头开始）第一个需要审核的章节号"""
+        pending = [c.chapter_number for c in chapters if c.needs_review and c.chapter_number != chapter_number]
+        later = [number for number in pending if number > chapter_number]
+        return (later or pending or [None])[0]
+    
+    def _requested_chapter_number(self):
+        """?chapter=参数；未指定时返回None，不是整数时返回404"""
+        value = self.request.GET.get('chapter')
+        if not value:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise Http404("章节不存在")
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        book = get_object_or_404(Book.objects.select_related('author'), id=kwargs.get('book_id'))
+        chapters = self._chapter_nav(book)
+        
+        # 未指定章节时打开第一个需要审核的章节
+        chapter_number = self._requested_chapter_number()
+        if chapter_number is None:
+            first = next((c for c in chapters if c.needs_review), chapters[0] if chapters else None)
+            chapter_number = first.chapter_number if first else None
+        
+        chapter = None
+        if chapter_number is not None:
+            chapter = Chapter.objects.filter(book=book, chapter_number=chapter_number).first()
+        
+        context.update({
+            'book': book,
+            'chapter': chapter,
+            'chapters': chapters,
+        })
+        if chapter is not None:
+            numbers = [c.chapter_number for c in chapters]
+            position = numbers.index(chapter.chapter_number)
+            context.update({
+                'content_diff': diffs.get_chapter_diff(chapter),
+                'previous_chapter': numbers[position - 1] if position > 0 else None,
+                'next_chapter': numbers[position + 1] if position + 1 < len(numbers) else None,
+                'next_pending_chapter': self._next_pending(chapters, chapter.chapter_number),
+            })
+        return context
+    
+    def post(self, request, *args, **kwargs):
+        """处理单个字段的审核结果，完成后跳到下一个需要审核的章节"""
+        book = get_object_or_404(Book, id=kwargs.get('book_id'))
+        chapter_number = self._requested_chapter_number()
+        if chapter_number is None:
+            raise Http404("章节不存在")
+        chapter = get_object_or_404(Chapter, book=book, chapter_number=chapter_number)
+        
+        action = request.POST.get('action')
+        field_type = request.POST.get('field_type')
+        result = moderation.bulk_admin_review([{
+            'type': 'chapter',
+            'id': chapter.id,
+            'field': field_type,
+            'action': action,
+            'reason': request.POST.get('reason', ''),
+        }])[0]
+        
+        if not result['success']:
+            messages.error(request, result['error'])
+            return redirect(f"{reverse('books:admin_chapter_review', args=[book.id])}?chapter={chapter.chapter_number}")
+        
+        label = '标题' if field_type == 'title' else '内容'
+        if action == 'approve':
+            messages.success(request, f'第{chapter.chapter_number}章{label}审核通过')
+        else:
+            messages.success(request, f'第{chapter.chapter_number}章{label}审核不通过')
+        
+        # 当前章节还有待审核字段时留在本章，否则跳到下一个需要审核的章节
+        chapter.refresh_from_db()
+        chapter_number = chapter.chapter_number
+        if not review_queue.needs_admin_review('chapter', chapter):
+            chapter_number = self._next_pending(self._chapter_nav(book), chapter.chapter_number) or chapter_number
+        return redirect(f"{reverse('books:admin_chapter_review', args=[book.id])}?chapter={chapter_number}")
 
 
 # 函数视图
 @login_required
+@idempotent('create_chapter')
 def create_chapter(request, book_id):
     """创建新章节"""
     book = get_object_or_404(Book, id=book_id)
@@ -792,11 +1109,19 @@ def create_chapter(request, book_id):
         if not content:
             return JsonResponse({'success': False, 'error': '章节内容不能为空'})
         
+        position = request.POST.get('position')
+        if position:
+            try:
+                position = int(position)
+            except ValueError:
+                return JsonResponse({'success': False, 'error': '插入位置无效'})
+        else:
+            position = None
+        
         try:
             with transaction.atomic():
-                # 获取下一个章节号
-                last_chapter = Chapter.objects.filter(book=book).order_by('-chapter_number').first()
-                chapter_number = (last_chapter.chapter_number + 1) if last_chapter else 1
+                # 获取章节号：指定position时在该位置插入，原位置及之后的章节依次后移
+                chapter_number = ordering.make_room(book, position)
                 
                 chapter = Chapter.objects.create(
                     book=book,
@@ -806,14 +1131,9 @@ def create_chapter(request, book_id):
                     content=content
                 )
                 
-                # 创建草稿
-                ChapterDraft.objects.create(
-                    book=book,
-                    author=request.user,
-                    chapter_number=chapter_number,
-                    title=title,
-                    content=content
-                )
+                # 记录第一个版本，创建草稿
+                revisions.record_revision(chapter, title, content, author=request.user, source='create')
+                revisions.save_draft(book, chapter_number, request.user, title, content, chapter=chapter)
                 
                 # 更新作品的最后更新时间
                 book.last_chapter_update = timezone.now()
@@ -858,25 +1178,15 @@ def edit_chapter(request, book_id, chapter_number):
             return JsonResponse({'success': False, 'error': '章节内容不能为空'})
         
         try:
+            known_texts = (chapter.content_pending, chapter.content)
             with transaction.atomic():
                 chapter.title = title
                 chapter.content = content
                 chapter.save()
                 
-                # 更新或创建草稿
-                draft, created = ChapterDraft.objects.get_or_create(
-                    book=book,
-                    chapter_number=chapter_number,
-                    defaults={
-                        'author': request.user,
-                        'title': title,
-                        'content': content
-                    }
-                )
-                if not created:
-                    draft.title = title
-                    draft.content = content
-                    draft.save()
+                # 记录版本，更新或创建草稿
+                revisions.record_revision(chapter, title, content, author=request.user, known_texts=known_texts)
+                autosave.publish_chapter_draft(book, chapter, request.user, title, content)
                 
                 # 更新作品的最后更新时间
                 book.last_chapter_update = timezone.now()
@@ -905,24 +1215,8 @@ def delete_chapter(request, book_id, chapter_number):
     
     if request.method == 'POST':
         try:
-            with transaction.atomic():
-                # 删除章节和相关草稿
-                ChapterDraft.objects.filter(book=book, chapter_number=chapter_number).delete()
-                chapter.delete()
-                
-                # 重新排序后续章节
-                later_chapters = Chapter.objects.filter(
-                    book=book, 
-                    chapter_number__gt=chapter_number
-                ).order_by('chapter_number')
-                
-                for i, later_chapter in enumerate(later_chapters, start=chapter_number):
-                    later_chapter.chapter_number = i
-                    later_chapter.save()
-                
-                # 更新作品的最后更新时间
-                book.last_chapter_update = timezone.now()
-                book.save()
+            # 删除章节和相关草稿，后续章节及草稿用固定条数的UPDATE整体前移
+            ordering.delete_chapter(chapter)
             
             return JsonResponse({
                 'success': True,
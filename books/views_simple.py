@@ -16,6 +16,7 @@ import json
 
 from .models import Book, BookDraft, Chapter, ChapterDraft
 from .ai_utils import check_content_by_ai
+from . import autosave, revisions, toc
 
 
 class IndexView(LoginRequiredMixin, TemplateView):
@@ -116,8 +117,8 @@ class BookDetailView(LoginRequiredMixin, TemplateView):
         if book.author != self.request.user:
             raise Http404("作品不存在")
         
-        # 获取章节列表
-        chapters = Chapter.objects.filter(book=book).order_by('chapter_number')
+        # 章节目录来自缓存的目录投影，不加载章节正文
+        chapters = toc.get_toc(book.id)
         
         context.update({
             'book': book,
@@ -142,7 +143,8 @@ class ChapterListView(LoginRequiredMixin, TemplateView):
         if book.author != self.request.user:
             raise Http404("作品不存在")
         
-        chapters = Chapter.objects.filter(book=book).order_by('chapter_number')
+        # 只加载目录字段，不读取章节正文
+        chapters = toc.toc_queryset(book.id)
         
         context.update({
             'book': book,
@@ -185,14 +187,9 @@ def create_chapter(request, book_id):
                     content=content
                 )
                 
-                # 创建草稿
-                ChapterDraft.objects.create(
-                    book=book,
-                    author=request.user,
-                    chapter_number=chapter_number,
-                    title=title,
-                    content=content
-                )
+                # 记录第一个版本，创建草稿
+                revisions.record_revision(chapter, title, content, author=request.user, source='create')
+                revisions.save_draft(book, chapter_number, request.user, title, content, chapter=chapter)
                 
                 # 更新作品的最后更新时间
                 book.last_chapter_update = timezone.now()
@@ -237,25 +234,15 @@ def edit_chapter(request, book_id, chapter_number):
             return JsonResponse({'success': False, 'error': '章节内容不能为空'})
         
         try:
+            known_texts = (chapter.content_pending, chapter.content)
             with transaction.atomic():
                 chapter.title = title
                 chapter.content = content
                 chapter.save()
                 
-                # 更新或创建草稿
-                draft, created = ChapterDraft.objects.get_or_create(
-                    book=book,
-                    chapter_number=chapter_number,
-                    defaults={
-                        'author': request.user,
-                        'title': title,
-                        'content': content
-                    }
-                )
-                if not created:
-                    draft.title = title
-                    draft.content = content
-                    draft.save()
+                # 记录版本，更新或创建草稿
+                revisions.record_revision(chapter, title, content, author=request.user, known_texts=known_texts)
+                autosave.publish_chapter_draft(book, chapter, request.user, title, content)
                 
                 # 更新作品的最后更新时间
                 book.last_chapter_update = timezone.now()
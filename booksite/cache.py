@@ -0,0 +1,275 @@
+"""
+多进程共享的SQLite缓存后端
+
+LocMemCache只在单个进程内有效：gunicorn多个工作进程时，登录第一步写入的邮箱验证码
+在处理第二步的进程里看不到，各进程还要分别预热自己的缓存。
+该后端把缓存存放在本机的一个SQLite文件中（WAL模式，读写互不阻塞），
+同一台机器上的所有工作进程、刷写/审核进程共享同一份缓存，不依赖外部服务。
+
+- 整数直接以INTEGER存储，incr/decr在写事务中完成，多进程并发递增不会丢失计数
+- add是单条INSERT ... ON CONFLICT语句，可以作为跨进程的互斥锁使用
+- 条目数超过MAX_ENTRIES时先删除过期条目，再按最近访问时间淘汰（近似LRU，
+  读取时最多每LRU_RESOLUTION秒更新一次访问时间，避免每次读取都写文件）
+
+多台机器部署时改用Redis（settings中CACHE_BACKEND=redis）。
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+TABLE = 'cache_entries'
+
+# SQLite单条语句的参数个数上限较低，get_many/delete_many按批查询
+QUERY_BATCH_SIZE = 500
+
+
+class SQLiteCache(BaseCache):
+    """
+    LOCATION为缓存文件路径；OPTIONS除Django通用的MAX_ENTRIES、CULL_FREQUENCY外还支持：
+        BUSY_TIMEOUT    等待其他进程写锁的秒数（默认5）
+        LRU_RESOLUTION  读取时更新访问时间的最小间隔秒数（默认60）
+        CULL_EVERY      每个进程每写入多少次检查一次条目数（默认100）
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = str(location)
+        options = params.get('OPTIONS', {})
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._lru_resolution = float(options.get('LRU_RESOLUTION', 60))
+        self._cull_every = max(int(options.get('CULL_EVERY', 100)), 1)
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+    # -----------------------------------------------------------------------
+    # 连接与事务
+    # -----------------------------------------------------------------------
+
+    def _connection(self):
+        """每个线程一个连接；fork出的子进程不能复用父进程的连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self._path, timeout=self._busy_timeout, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(
+            f'CREATE TABLE IF NOT EXISTS {TABLE} ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, accessed REAL NOT NULL)'
+        )
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {TABLE}_accessed ON {TABLE} (accessed)')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {TABLE}_expires ON {TABLE} (expires)')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _write(self):
+        """写事务（BEGIN IMMEDIATE立即取得写锁，事务内的读-改-写不会与其他进程交错）"""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _after_write(self, count=1):
+        with self._writes_lock:
+            self._writes += count
+            due = self._writes >= self._cull_every
+            if due:
+                self._writes = 0
+        if due:
+            self._cull()
+
+    # -----------------------------------------------------------------------
+    # 编码
+    # -----------------------------------------------------------------------
+
+    def _encode(self, value):
+        # 整数原样存储，incr可以直接在数据库中递增；bool等子类仍按pickle存储以保留类型
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value
+        return sqlite3.Binary(pickle.dumps(value, self.pickle_protocol))
+
+    def _decode(self, raw):
+        if isinstance(raw, int):
+            return raw
+        return pickle.loads(raw)
+
+    def _expiry(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    # -----------------------------------------------------------------------
+    # 缓存接口
+    # -----------------------------------------------------------------------
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        with self._write() as conn:
+            cursor = conn.execute(
+                f'INSERT INTO {TABLE} (key, value, expires, accessed) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, '
+                f'accessed = excluded.accessed WHERE {TABLE}.expires IS NOT NULL AND {TABLE}.expires <= ?',
+                (key, self._encode(value), self._expiry(timeout), now, now),
+            )
+            added = cursor.rowcount == 1
+        if added:
+            self._after_write()
+        return added
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._get_many([key]).get(key, default)
+
+    def _get_many(self, keys):
+        conn = self._connection()
+        now = time.time()
+        found = {}
+        stale = []
+        for start in range(0, len(keys), QUERY_BATCH_SIZE):
+            batch = keys[start:start + QUERY_BATCH_SIZE]
+            rows = conn.execute(
+                f'SELECT key, value, expires, accessed FROM {TABLE} WHERE key IN ({",".join("?" * len(batch))})',
+                batch,
+            ).fetchall()
+            for key, raw, expires, accessed in rows:
+                if expires is not None and expires <= now:
+                    continue
+                found[key] = self._decode(raw)
+                if now - accessed >= self._lru_resolution:
+                    stale.append(key)
+        if stale:
+            self._touch_accessed(stale, now)
+        return found
+
+    def _touch_accessed(self, keys, now):
+        """更新访问时间（LRU淘汰依据）；其他进程正持有写锁时立即跳过，不阻塞读取"""
+        conn = self._connection()
+        # 连接默认会等待写锁BUSY_TIMEOUT秒，这里临时改为不等待
+        conn.execute('PRAGMA busy_timeout = 0')
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+        except sqlite3.OperationalError:
+            return
+        finally:
+            conn.execute(f'PRAGMA busy_timeout = {int(self._busy_timeout * 1000)}')
+        try:
+            conn.executemany(f'UPDATE {TABLE} SET accessed = ? WHERE key = ?', [(now, key) for key in keys])
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._write() as conn:
+            conn.execute(
+                f'INSERT OR REPLACE INTO {TABLE} (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+                (key, self._encode(value), self._expiry(timeout), time.time()),
+            )
+        self._after_write()
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        with self._write() as conn:
+            cursor = conn.execute(
+                f'UPDATE {TABLE} SET expires = ?, accessed = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (self._expiry(timeout), now, key, now),
+            )
+            return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._write() as conn:
+            return conn.execute(f'DELETE FROM {TABLE} WHERE key = ?', (key,)).rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            f'SELECT 1 FROM {TABLE} WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def incr(self, key, delta=1, version=None):
+        """原子递增（键不存在时与其他后端一样抛出ValueError）"""
+        key = self.make_and_validate_key(key, version=version)
+        with self._write() as conn:
+            row = conn.execute(
+                f'SELECT value FROM {TABLE} WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = self._decode(row[0]) + delta
+            conn.execute(f'UPDATE {TABLE} SET value = ? WHERE key = ?', (self._encode(value), key))
+        return value
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        found = self._get_many(list(key_map))
+        return {key_map[key]: value for key, value in found.items()}
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if not data:
+            return []
+        expires = self._expiry(timeout)
+        now = time.time()
+        rows = [
+            (self.make_and_validate_key(key, version=version), self._encode(value), expires, now)
+            for key, value in data.items()
+        ]
+        with self._write() as conn:
+            conn.executemany(f'INSERT OR REPLACE INTO {TABLE} (key, value, expires, accessed) VALUES (?, ?, ?, ?)', rows)
+        self._after_write(len(rows))
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if not keys:
+            return
+        with self._write() as conn:
+            for start in range(0, len(keys), QUERY_BATCH_SIZE):
+                batch = keys[start:start + QUERY_BATCH_SIZE]
+                conn.execute(f'DELETE FROM {TABLE} WHERE key IN ({",".join("?" * len(batch))})', batch)
+
+    def clear(self):
+        with self._write() as conn:
+            conn.execute(f'DELETE FROM {TABLE}')
+
+    def _cull(self):
+        """条目数超过上限时删除过期条目，仍超出则淘汰最久未访问的1/CULL_FREQUENCY"""
+        with self._write() as conn:
+            count = conn.execute(f'SELECT COUNT(*) FROM {TABLE}').fetchone()[0]
+            if count <= self._max_entries:
+                return
+            if self._cull_frequency == 0:
+                conn.execute(f'DELETE FROM {TABLE}')
+                return
+            count -= conn.execute(
+                f'DELETE FROM {TABLE} WHERE expires IS NOT NULL AND expires <= ?', (time.time(),),
+            ).rowcount
+            if count > self._max_entries:
+                conn.execute(
+                    f'DELETE FROM {TABLE} WHERE key IN (SELECT key FROM {TABLE} ORDER BY accessed LIMIT ?)',
+                    (count // self._cull_frequency,),
+                )
+
+    def close(self, **kwargs):
+        # 连接在线程内复用，请求结束时不关闭
+        pass
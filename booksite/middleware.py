@@ -0,0 +1,89 @@
+"""
+查询预算中间件
+
+在调试/测试环境下统计每个请求执行的SQL条数和数据库总耗时，
+通过Server-Timing响应头输出（浏览器开发者工具的Timing面板可以直接查看），
+并按URL名称检查查询条数是否超出预算，用于尽早发现模板中逐行访问关联对象造成的N+1查询。
+"""
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    """请求执行的SQL条数超出预算"""
+
+
+class QueryCounter:
+    """通过connection.execute_wrapper统计SQL条数和耗时，不依赖DEBUG下的connection.queries"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+def get_query_budget(request):
+    """
+    获取请求对应的查询预算
+
+    QUERY_BUDGETS以URL名称（含命名空间，如'books:read'）为键；
+    未配置的URL使用QUERY_BUDGET_DEFAULT，为None表示不检查。
+    预算只针对读请求（GET/HEAD），写请求的查询条数由保存逻辑决定，不做检查。
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    match = getattr(request, 'resolver_match', None)
+    if match is not None and match.view_name in settings.QUERY_BUDGETS:
+        return settings.QUERY_BUDGETS[match.view_name]
+    return settings.QUERY_BUDGET_DEFAULT
+
+
+class QueryBudgetMiddleware:
+    """
+    SQL查询统计中间件
+
+    QUERY_BUDGET_ENABLED关闭时（默认只在DEBUG下开启）直接透传请求，没有任何开销。
+    超出预算时按QUERY_BUDGET_ACTION记录警告日志（'log'）或抛出QueryBudgetExceeded（'raise'）。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_BUDGET_ENABLED:
+            return self.get_response(request)
+
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+
+        duration_ms = counter.duration * 1000
+        timing = f'db;desc="{counter.count} queries";dur={duration_ms:.2f}'
+        if response.has_header('Server-Timing'):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response['Server-Timing'] = timing
+
+        budget = get_query_budget(request)
+        if budget is not None and counter.count > budget:
+            view_name = request.resolver_match.view_name if request.resolver_match else request.path
+            message = f'{view_name} 执行了 {counter.count} 条SQL，超出预算 {budget} 条'
+            if settings.QUERY_BUDGET_ACTION == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
@@ -0,0 +1,157 @@
+"""
+接口限流
+
+发送邮箱验证码（SMTP）、发表评论（AI审核）等接口按RATELIMIT_POLICIES中的策略限流，
+超过限制时直接返回429和Retry-After，不再执行视图。
+
+策略为 (键类型, 次数, 窗口秒数) 的列表，同一接口的多条策略须全部满足：
+- ip：按客户端IP
+- user：按登录用户（未登录的请求不适用）
+- post:<字段>：按表单字段的值（如post:email按收件邮箱，多个IP轮换也不能对同一邮箱轰炸）
+
+计数使用共享缓存中的原子计数器（多个工作进程共享），按滑动窗口估算：
+当前窗口的计数加上上一窗口计数乘以其仍在滑动窗口内的比例，
+不会出现固定窗口在边界前后连续放行两倍请求的问题，每条策略每次请求只需一次incr和一次读取。
+被拒绝的请求同样计数，持续超限的客户端会一直被拒绝。
+"""
+import hashlib
+import logging
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ratelimit'
+METRICS_PREFIX = 'ratelimit:rejected'
+
+
+def client_ip(request):
+    """客户端IP；部署在RATELIMIT_TRUSTED_PROXIES层反向代理之后时从X-Forwarded-For中取"""
+    proxies = settings.RATELIMIT_TRUSTED_PROXIES
+    if proxies:
+        forwarded = [ip.strip() for ip in request.headers.get('X-Forwarded-For', '').split(',') if ip.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _identity(request, kind):
+    """策略键类型对应的请求标识；不适用时返回None"""
+    if kind == 'ip':
+        return client_ip(request)
+    if kind == 'user':
+        return str(request.user.pk) if request.user.is_authenticated else None
+    if kind.startswith('post:'):
+        value = request.POST.get(kind[5:], '').strip().lower()
+        return value or None
+    raise ValueError(f'未知的限流键类型: {kind}')
+
+
+def _counter_key(scope, kind, identity, window, index):
+    digest = hashlib.sha256(identity.encode('utf-8')).hexdigest()[:32]
+    return f'{KEY_PREFIX}:{scope}:{kind}:{window}:{digest}:{index}'
+
+
+def metric_label(scope, kind, window):
+    return f'{scope}:{kind}:{window}'
+
+
+def _incr(key, timeout):
+    """原子递增，键不存在时创建"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout):
+            return 1
+        return cache.incr(key)
+
+
+def _retry_after(previous, current, limit, window, elapsed):
+    """滑动窗口估算值降到限制以内还需等待的秒数"""
+    remaining = window - elapsed
+    if current >= limit:
+        # 要等到下一个窗口，并且本窗口的计数按比例衰减到限制以内
+        wait = remaining + window * (1 - limit / current)
+    else:
+        wait = remaining - (limit - current) * window / previous
+    return max(math.ceil(wait), 1)
+
+
+def check(request, scope):
+    """
+    按scope的策略计数并检查请求
+
+    Returns:
+        int: 被拒绝时返回Retry-After秒数，放行时返回None
+    """
+    if not settings.RATELIMIT_ENABLED:
+        return None
+    now = time.time()
+    for kind, limit, window in settings.RATELIMIT_POLICIES.get(scope, ()):
+        identity = _identity(request, kind)
+        if identity is None:
+            continue
+        index, offset = divmod(now, window)
+        index = int(index)
+        current = _incr(_counter_key(scope, kind, identity, window, index), window * 2)
+        previous = cache.get(_counter_key(scope, kind, identity, window, index - 1)) or 0
+        estimated = previous * (window - offset) / window + current
+        if estimated > limit:
+            label = metric_label(scope, kind, window)
+            _incr(f'{METRICS_PREFIX}:{label}', None)
+            logger.info('限流 %s: %s', label, identity)
+            return _retry_after(previous, current, limit, window, offset)
+    return None
+
+
+def too_many_requests(request, retry_after):
+    """429响应：AJAX请求返回JSON，其他请求（表单提交、图片）返回纯文本"""
+    message = '请求过于频繁，请稍后再试'
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or 'json' in request.headers.get('Accept', ''):
+        response = JsonResponse({'success': False, 'error': message, 'retry_after': retry_after}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(scope):
+    """
+    视图装饰器：按RATELIMIT_POLICIES[scope]限流
+
+    类视图的方法通过method_decorator使用；与login_required同用时放在其下，未登录的请求不计数。
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            retry_after = check(request, scope)
+            if retry_after is not None:
+                return too_many_requests(request, retry_after)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_stats():
+    """
+    各策略的拒绝次数
+
+    Returns:
+        dict: {'<scope>:<键类型>:<窗口>': 拒绝次数}
+    """
+    labels = [
+        metric_label(scope, kind, window)
+        for scope, policies in settings.RATELIMIT_POLICIES.items()
+        for kind, _, window in policies
+    ]
+    found = cache.get_many([f'{METRICS_PREFIX}:{label}' for label in labels])
+    return {label: found.get(f'{METRICS_PREFIX}:{label}', 0) for label in labels}
+
+
+def reset_stats():
+    cache.delete_many([f'{METRICS_PREFIX}:{label}' for label in get_stats()])
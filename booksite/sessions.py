@@ -0,0 +1,145 @@
+"""
+合并写入的会话存储（SESSION_ENGINE = 'booksite.sessions'）
+
+SESSION_SAVE_EVERY_REQUEST = True时，默认的数据库会话在每个请求（包括只读的阅读页面）
+结束时都要UPDATE一次django_session，只为把过期时间往后推，读请求因此在SQLite写锁上排队。
+
+该存储把会话放在共享缓存中（未命中时从数据库加载），保存时：
+- 会话数据有修改（登录、写入验证码等）或新建会话：同步写数据库和缓存
+- 数据没有修改：不写数据库。数据库中的过期时间落后超过SESSION_TOUCH_THRESHOLD时
+  追加一条待刷新记录，由刷写进程（manage.py flush_session_touches）定期用bulk_update批量更新；
+  没有落后那么多时什么也不写
+- 数据库中的过期时间只剩不到SESSION_TOUCH_SYNC_MARGIN（刷写进程长时间没有运行）时才同步更新，
+  保证活跃会话不会在数据库中过期
+
+数据库中的过期时间最多比实际落后SESSION_TOUCH_THRESHOLD加一个刷写周期，
+clearsessions清理过期会话的时间相应提前这么多。
+"""
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.core.cache import cache
+
+from .writebehind import PendingLog
+
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'booksite.sessions:'
+FLUSH_LOCK_KEY = 'booksite.sessions:flush-lock'
+
+# 待刷新过期时间的会话：(session_key, 新的过期时间戳)
+pending_touches = PendingLog('booksite.sessions:touch', settings.SESSION_COOKIE_AGE)
+
+
+class SessionStore(CachedDBStore):
+    """
+    缓存中的条目为 {'data': 会话数据, 'expire': 数据库中（或已排队写入）的过期时间戳}
+    """
+
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._db_expire = None
+
+    def _cache_entry(self, data):
+        timeout = max(int(self._db_expire - time.time()), 0)
+        self._cache.set(self.cache_key, {'data': data, 'expire': self._db_expire}, timeout)
+
+    def load(self):
+        try:
+            entry = self._cache.get(self.cache_key)
+        except Exception:
+            # 与cached_db一致：无效的键视为没有会话
+            entry = None
+
+        if entry is not None and entry['expire'] > time.time():
+            self._db_expire = entry['expire']
+            return entry['data']
+
+        session = self._get_session_from_db()
+        if session is None:
+            self._db_expire = None
+            return {}
+        data = self.decode(session.session_data)
+        self._db_expire = session.expire_date.timestamp()
+        self._cache_entry(data)
+        return data
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        if must_create or self.modified or self._db_expire is None:
+            # DBStore.save写数据库；不调用CachedDBStore.save，缓存条目由这里写入
+            super(CachedDBStore, self).save(must_create=must_create)
+            self._db_expire = self.get_expiry_date().timestamp()
+            self._cache_entry(data)
+            return
+
+        now = time.time()
+        expire = now + self.get_expiry_age()
+        if self._db_expire - now < settings.SESSION_TOUCH_SYNC_MARGIN:
+            self.model.objects.filter(session_key=self.session_key).update(
+                expire_date=datetime.fromtimestamp(expire, tz=dt_timezone.utc)
+            )
+        elif expire - self._db_expire >= settings.SESSION_TOUCH_THRESHOLD:
+            pending_touches.append((self.session_key, expire))
+        else:
+            return
+        self._db_expire = expire
+        self._cache_entry(data)
+
+
+def flush_touches():
+    """
+    把排队的过期时间批量写入数据库
+
+    Returns:
+        int: 更新的会话数；其他进程正在刷写时返回0
+    """
+    if not cache.add(FLUSH_LOCK_KEY, 1, settings.SESSION_FLUSH_LOCK_TIMEOUT):
+        return 0
+    model = SessionStore.get_model_class()
+    try:
+        flushed = 0
+        for touches in pending_touches.batches(settings.SESSION_FLUSH_BATCH_SIZE):
+            latest = {}
+            for session_key, expire in touches:
+                latest[session_key] = max(expire, latest.get(session_key, 0))
+            if latest:
+                # 已删除（退出登录）的会话不存在对应行，UPDATE不影响它们
+                model.objects.bulk_update(
+                    [
+                        model(session_key=session_key, expire_date=datetime.fromtimestamp(expire, tz=dt_timezone.utc))
+                        for session_key, expire in latest.items()
+                    ],
+                    ['expire_date'],
+                )
+            flushed += len(latest)
+        return flushed
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+
+
+def run_flusher(interval=None, once=False):
+    """
+    刷写进程主循环（manage.py flush_session_touches）
+
+    Returns:
+        int: 共更新的会话数
+    """
+    interval = settings.SESSION_FLUSH_INTERVAL if interval is None else interval
+    total = 0
+    while True:
+        try:
+            total += flush_touches()
+        except Exception:
+            logger.exception('会话过期时间刷写失败')
+        if once:
+            return total
+        time.sleep(interval)
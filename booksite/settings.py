@@ -49,10 +49,12 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'booksite.middleware.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.TokenAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -88,13 +90,41 @@ DATABASES = {
     }
 }
 
-# Cache configuration - 使用本地内存缓存
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'booksite-cache',
+# Cache configuration - 多个工作进程共享的缓存
+# CACHE_BACKEND=sqlite（默认）：本机SQLite文件（见booksite.cache），不依赖外部服务
+# CACHE_BACKEND=redis：Redis（需安装redis包），多台机器部署时使用
+# CACHE_BACKEND=locmem：进程内缓存，只适合单进程调试（验证码、自动保存等功能在多进程下会失效）
+CACHE_BACKEND = config('CACHE_BACKEND', default='sqlite')
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': 'redis://{}:{}/{}'.format(
+                config('REDIS_HOST', default='localhost'),
+                config('REDIS_PORT', default=6379, cast=int),
+                config('REDIS_DB', default=0, cast=int),
+            ),
+            'KEY_PREFIX': 'booksite',
+        }
+    }
+elif CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'booksite-cache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'booksite.cache.SQLiteCache',
+            'LOCATION': config('CACHE_SQLITE_PATH', default=str(BASE_DIR / 'cache.sqlite3')),
+            'OPTIONS': {
+                'MAX_ENTRIES': 100000,
+                'CULL_FREQUENCY': 10,  # 超出上限时淘汰最久未访问的1/10
+            },
+        }
     }
-}
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -147,25 +177,113 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Custom user model
 AUTH_USER_MODEL = 'accounts.User'
 
+# 管理员面板
+ADMIN_REVIEW_QUEUE_SIZE = 20  # 面板中每类待审核内容显示的条数
+ADMIN_BULK_REVIEW_MAX_ITEMS = 1000  # 批量审核单次请求的最大条数
+
+# 创建作品/章节接口的幂等键（见books.idempotency），过期记录由manage.py purge_idempotency_keys清理
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+
+# 查询预算（见booksite.middleware.QueryBudgetMiddleware）
+# 统计每个请求的SQL条数和数据库耗时并输出Server-Timing响应头，默认只在DEBUG下开启
+QUERY_BUDGET_ENABLED = config('QUERY_BUDGET_ENABLED', default=DEBUG, cast=bool)
+QUERY_BUDGET_ACTION = config('QUERY_BUDGET_ACTION', default='log')  # 'log' 或 'raise'
+QUERY_BUDGET_DEFAULT = None  # 未单独配置的URL不检查
+# 以URL名称为键的预算，数值与列表长度无关；列表页查询条数随数据量增长说明出现了N+1
+QUERY_BUDGETS = {
+    'books:read': 8,
+    'books:api_book_list': 8,
+    'books:api_search': 10,
+    'books:book_detail': 10,
+    'books:api_book_toc': 8,
+    'books:chapter_detail': 10,
+    'books:create': 8,
+    'books:chapter_list': 10,
+    'books:edit_book': 9,
+    'books:create_chapter': 9,
+    'books:edit_chapter': 10,
+    'books:admin_panel': 10,
+    'books:admin_chapter_review': 10,
+    'comments:book_comments': 10,
+    'comments:chapter_comments': 11,
+    'comments:book_comment_list': 10,
+    'comments:chapter_comment_list': 11,
+    'accounts:profile': 7,
+    'accounts:login': 2,
+    'accounts:generate_captcha': 2,
+}
+
 # Session settings
 SESSION_COOKIE_AGE = 60 * 60 * 24 * 30  # 30 days
 SESSION_SAVE_EVERY_REQUEST = True
+# 会话存放在共享缓存中，数据没有修改时不写数据库（见booksite.sessions）
+SESSION_ENGINE = 'booksite.sessions'
+SESSION_TOUCH_THRESHOLD = 60 * 60 * 24  # 数据库中的过期时间落后超过该值才排队刷新（秒）
+SESSION_TOUCH_SYNC_MARGIN = 60 * 60 * 24  # 数据库中的过期时间只剩不到该值时同步刷新（刷写进程未运行时的兜底）
+SESSION_FLUSH_INTERVAL = 60  # 刷写进程的间隔（manage.py flush_session_touches）
+SESSION_FLUSH_BATCH_SIZE = 500
+SESSION_FLUSH_LOCK_TIMEOUT = 300
+
+# 用户令牌（见accounts.tokens），校验结果缓存在共享缓存中
+TOKEN_CACHE_TTL = 300  # 有效令牌的缓存时间（秒），不超过令牌剩余有效期
+TOKEN_NEGATIVE_CACHE_TTL = 60  # 不存在或已过期令牌的缓存时间（秒）
+# 过期令牌分批清理（manage.py purge_expired_tokens）
+TOKEN_PURGE_BATCH_SIZE = 1000
+TOKEN_PURGE_PAUSE = 0.05  # 批间暂停（秒），让出数据库写锁
+
+# 图片验证码（见accounts.captcha）：预渲染池放在共享缓存中，由manage.py refill_captcha_pool补充
+CAPTCHA_TTL = 300  # 验证码答案的有效期（秒）
+CAPTCHA_MAX_ATTEMPTS = 5  # 即时校验接口答错该次数后验证码作废
+CAPTCHA_POOL_SIZE = 500
+CAPTCHA_POOL_TTL = 60 * 60 * 6  # 池中未取出的验证码的保留时间（秒）
+CAPTCHA_REFILL_BATCH_SIZE = 50
+CAPTCHA_REFILL_INTERVAL = 5  # 补充进程的间隔（秒）
+CAPTCHA_REFILL_LOCK_TIMEOUT = 300
+CAPTCHA_NOISE_VARIANTS = 8  # 每批生成的噪点背景数
+CAPTCHA_NOISE_SIGMA = 60
+CAPTCHA_FONT_SIZE = 26
+
+# 接口限流（见booksite.ratelimit），计数存于共享缓存，拒绝次数见manage.py ratelimit_stats
+RATELIMIT_ENABLED = config('RATELIMIT_ENABLED', default=True, cast=bool)
+RATELIMIT_TRUSTED_PROXIES = config('RATELIMIT_TRUSTED_PROXIES', default=0, cast=int)  # 前面的反向代理层数
+# 接口 -> [(键类型 ip/user/post:<字段>, 次数, 窗口秒数), ...]，须全部满足
+RATELIMIT_POLICIES = {
+    # 登录表单（第二步按邮箱限制，防止穷举邮件验证码）
+    'login': [('ip', 20, 60), ('ip', 200, 3600), ('post:email', 10, 600)],
+    # 发送邮箱验证码（SMTP）
+    'verify_email': [('ip', 5, 60), ('ip', 30, 3600), ('user', 10, 3600), ('post:email', 5, 3600)],
+    # 图片验证码
+    'captcha': [('ip', 30, 60), ('ip', 600, 3600)],
+    'verify_captcha': [('ip', 30, 60)],
+    # 发表评论（AI审核），作品评论和章节评论共用
+    'comment': [('user', 5, 60), ('user', 100, 86400), ('ip', 20, 60)],
+}
 
 # Email settings
-if DEBUG:
-    # 开发环境使用控制台邮件后端
-    EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
-else:
-    # 生产环境使用SMTP
-    EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-    EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
-    EMAIL_PORT = config('EMAIL_PORT', default=587, cast=int)
-    EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
-    EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
-    EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+# 开发环境默认使用控制台邮件后端，生产环境使用SMTP；
+# 开发时也可设置EMAIL_BACKEND为SMTP后端并指向本地调试服务（manage.py run_smtp_stub_server）
+EMAIL_BACKEND = config(
+    'EMAIL_BACKEND',
+    default='django.core.mail.backends.console.EmailBackend' if DEBUG else 'django.core.mail.backends.smtp.EmailBackend',
+)
+EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
+EMAIL_PORT = config('EMAIL_PORT', default=587, cast=int)
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
+EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
+EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+EMAIL_TIMEOUT = 30
 
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@booksite.com')
 
+# 待发送邮件队列（见accounts.outbox），由manage.py send_outbox发送
+EMAIL_OUTBOX_BATCH_SIZE = 50  # 每批领取的邮件数，同一批复用一个SMTP连接
+EMAIL_OUTBOX_POLL_INTERVAL = 1  # 没有邮件时的轮询间隔（秒）
+EMAIL_OUTBOX_LEASE = 300  # sending状态超过该时间视为发送进程崩溃，邮件可被重新领取
+EMAIL_MAX_ATTEMPTS = 6  # 超过后标记为失败，可在后台重新排队
+EMAIL_RETRY_BASE_DELAY = 5  # 重试退避基数（秒）
+EMAIL_RETRY_MAX_DELAY = 600
+EMAIL_DEDUPE_WINDOW = 60  # 同一邮箱相同验证码的邮件在该时间内已发出时不再重复发送（秒）
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -177,9 +295,66 @@ CORS_ALLOW_CREDENTIALS = True
 # AI check API
 AI_CHECK_API_URL = config('AI_CHECK_API_URL', default='http://localhost:8000/api/check')
 AI_CHECK_API_KEY = config('AI_CHECK_API_KEY', default='your-ai-api-key')
+AI_CHECK_CONNECT_TIMEOUT = config('AI_CHECK_CONNECT_TIMEOUT', default=3, cast=float)
+AI_CHECK_READ_TIMEOUT = config('AI_CHECK_READ_TIMEOUT', default=15, cast=float)
+AI_CHECK_POOL_SIZE = 10  # 每个进程的keep-alive连接数
+AI_CHECK_MAX_RETRIES = 2  # 只重试连接失败和429/502/503/504
+AI_CHECK_BACKOFF_BASE = 0.2  # 重试退避基数（秒）
+AI_CHECK_BREAKER_THRESHOLD = 5  # 连续失败次数达到后熔断
+AI_CHECK_BREAKER_RESET_TIMEOUT = 30  # 熔断后多久放行探测请求（秒）
+AI_CHECK_BATCH_CONCURRENCY = 8  # 批量审核的最大并发请求数
+AI_CHECK_SUPPORTS_BATCH = config('AI_CHECK_SUPPORTS_BATCH', default=False, cast=bool)  # 上游是否支持 {'contents': [...]} 数组请求
+AI_CHECK_BATCH_SIZE = 20  # 每个数组请求最多打包的条数
+AI_CHECK_BATCH_ITEM_MAX_CHARS = 500  # 超过该长度的文本单独请求
+
+# AI审核任务队列（manage.py run_moderation_worker）
+MODERATION_WORKER_THREADS = config('MODERATION_WORKER_THREADS', default=4, cast=int)
+MODERATION_POLL_INTERVAL = 2  # 没有任务时的轮询间隔（秒）
+MODERATION_MAX_ATTEMPTS = 5  # 超过后转入死信，等待管理员人工审核
+MODERATION_RETRY_BASE_DELAY = 10  # 重试退避基数（秒）
+MODERATION_RETRY_MAX_DELAY = 600
+MODERATION_JOB_LEASE = 300  # running状态超过该时间视为工作进程崩溃，任务可被重新领取
+MODERATION_CHUNK_MIN_CHARS = 200  # 章节内容分块审核：块的最小长度
+MODERATION_CHUNK_MAX_CHARS = 2000  # 块的最大长度（同时也是单次提交给AI的最大长度）
+MODERATION_CHUNK_BOUNDARY_MOD = 4  # 段落哈希满足 %N==0 时作为块边界
+
+# AI审核结果缓存（按规范化文本哈希缓存，存于数据库，多个工作进程共享）
+MODERATION_CACHE_ENABLED = True
+MODERATION_CACHE_VERSION = 1  # 审核策略变化时递增，使旧结果失效
+MODERATION_CACHE_TTL = 60 * 60 * 24 * 7  # 7天
+MODERATION_CACHE_MAX_ENTRIES = 100000
+MODERATION_CACHE_EVICT_PROBABILITY = 0.01
+MODERATION_CACHE_TOUCH_RESOLUTION = 300  # 命中时最多每隔该秒数更新一次条目的命中次数和最后使用时间
+MODERATION_CACHE_COUNTER_FLUSH_INTERVAL = 60  # 命中/未命中计数先累加在共享缓存中，每隔该秒数写入数据库
+
+# 本地敏感词过滤（Aho–Corasick，调用AI接口前先执行）
+MODERATION_LOCAL_PREFILTER = True
+SENSITIVE_WORDS_FILE = config('SENSITIVE_WORDS_FILE', default=str(BASE_DIR / 'books' / 'sensitive_words.txt'))
+SENSITIVE_WORDS_RELOAD_INTERVAL = 5  # 检查词表文件是否修改的间隔（秒）
+
+# 章节目录缓存（见books.toc），章节变化时主动清除
+TOC_CACHE_TTL = 60 * 60
+
+# 阅读页面正文渲染缓存（见books.reading），按正文哈希缓存，正文修改后自动失效
+CHAPTER_BODY_CACHE_TTL = 60 * 60 * 24
+
+# 章节修订历史（见books.revisions）
+REVISION_SNAPSHOT_INTERVAL = 20  # 每隔多少个版本保存一次完整快照
+REVISION_SNAPSHOT_RATIO = 0.5  # 增量超过正文长度的该比例时直接保存快照
+REVISION_LIST_SIZE = 10  # 编辑页面显示的最近版本数
 
 # Pagination
 PAGINATION_PAGE_SIZE = 20
 
 # Auto save interval (seconds)
 AUTO_SAVE_INTERVAL = 30
+
+# 自动保存写缓冲（见books.autosave）：草稿先写入缓存，定期批量写入数据库
+AUTOSAVE_FLUSH_INTERVAL = 60  # 刷写间隔（秒）
+AUTOSAVE_FLUSH_BATCH_SIZE = 200  # 每批刷写的草稿数
+AUTOSAVE_FLUSH_LOCK_TIMEOUT = 300  # 刷写进程崩溃后多久允许其他进程接手
+# 由每个刷写周期内的第一个自动保存请求顺带刷写全部草稿（会把整批写入带回请求中），
+# 只适合不运行manage.py flush_autosave的单进程开发环境
+AUTOSAVE_FLUSH_IN_REQUEST = config('AUTOSAVE_FLUSH_IN_REQUEST', default=False, cast=bool)
+AUTOSAVE_BUFFER_TTL = 60 * 60 * 24  # 缓存中草稿的保留时间，须远大于刷写间隔
+AUTOSAVE_LOCK_TIMEOUT = 5  # 单个草稿的保存锁超时（秒）
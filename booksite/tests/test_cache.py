@@ -0,0 +1,99 @@
+"""
+SQLite共享缓存后端
+
+子进程用spawn启动（不继承父进程的连接），对同一个临时缓存文件并发读写，
+检查计数、add锁和写入在进程间是否一致。
+"""
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from booksite.cache import TABLE, SQLiteCache
+
+
+PROCESSES = 4
+ITERATIONS = 100
+
+
+def _backend(path, **options):
+    return SQLiteCache(path, {'OPTIONS': options})
+
+
+def _worker(path, index, iterations):
+    """子进程：原子递增计数；用add实现的锁保护一段非原子的读-改-写；写入一个只有本进程知道的值"""
+    cache = _backend(path)
+    for _ in range(iterations):
+        cache.incr('counter')
+        while not cache.add('lock', index, 10):
+            time.sleep(0.001)
+        try:
+            cache.set('guarded', cache.get('guarded') + 1)
+        finally:
+            cache.delete('lock')
+    cache.set(f'worker:{index}', os.getpid())
+
+
+class SQLiteCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.sqlite3')
+
+    def test_processes_share_counters_locks_and_values(self):
+        cache = _backend(self.path)
+        cache.set('counter', 0)
+        cache.set('guarded', 0)
+
+        context = multiprocessing.get_context('spawn')
+        workers = [context.Process(target=_worker, args=(self.path, i, ITERATIONS)) for i in range(PROCESSES)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(60)
+
+        self.assertEqual([worker.exitcode for worker in workers], [0] * PROCESSES)
+        self.assertEqual(cache.get('counter'), PROCESSES * ITERATIONS)
+        self.assertEqual(cache.get('guarded'), PROCESSES * ITERATIONS)
+        visible = cache.get_many([f'worker:{i}' for i in range(PROCESSES)])
+        self.assertEqual(sorted(visible.values()), sorted(worker.pid for worker in workers))
+
+    def test_read_does_not_wait_for_write_lock(self):
+        cache = _backend(self.path, BUSY_TIMEOUT=5, LRU_RESOLUTION=0)
+        cache.set('key', 'value')
+
+        # 另一个连接（相当于另一个进程）持有写锁
+        other = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self.addCleanup(other.close)
+        other.execute('BEGIN IMMEDIATE')
+        try:
+            started = time.perf_counter()
+            self.assertEqual(cache.get('key'), 'value')
+            self.assertLess(time.perf_counter() - started, 1)
+        finally:
+            other.execute('ROLLBACK')
+
+        # 写入仍按BUSY_TIMEOUT等待写锁释放
+        other.execute('BEGIN IMMEDIATE')
+        release = threading.Timer(0.3, other.execute, args=('ROLLBACK',))
+        release.start()
+        self.addCleanup(release.join)
+        cache.set('key', 'updated')
+        self.assertEqual(cache.get('key'), 'updated')
+
+    def test_read_updates_access_time_when_unlocked(self):
+        cache = _backend(self.path, LRU_RESOLUTION=0)
+        cache.set('key', 'value')
+        conn = sqlite3.connect(self.path)
+        self.addCleanup(conn.close)
+        conn.execute(f'UPDATE {TABLE} SET accessed = 0 WHERE key = ?', (cache.make_key('key'),))
+        conn.commit()
+
+        cache.get('key')
+        accessed = conn.execute(f'SELECT accessed FROM {TABLE} WHERE key = ?', (cache.make_key('key'),)).fetchone()[0]
+        self.assertGreater(accessed, 0)
@@ -0,0 +1,83 @@
+"""
+游标分页
+
+游标由客户端传回，伪造的游标不能导致500：列表页回到第一页，API返回400。
+"""
+import base64
+import json
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import User
+from books.models import Book
+from books.pagination import CursorPaginator, InvalidCursor, encode_cursor
+
+
+ISOLATED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test-pagination',
+    }
+}
+
+
+def _crafted(payload):
+    data = json.dumps(payload, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+CRAFTED_CURSORS = [
+    _crafted({'v': [None, 1], 'r': 0}),
+    _crafted({'v': [None, None], 'r': 0}),
+    _crafted({'v': ['', 1], 'r': 0}),
+    _crafted({'v': [[1], {'a': 1}], 'r': 0}),
+    _crafted({'v': [True, 1], 'r': 1}),
+    _crafted({'v': ['2026-01-01T00:00:00', 'abc'], 'r': 0}),
+    _crafted({'v': ['2026-01-01T00:00:00'], 'r': 0}),
+    _crafted([1, 2]),
+    'not-base64!',
+]
+
+
+@override_settings(CACHES=ISOLATED_CACHES, RATELIMIT_ENABLED=False)
+class CursorPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='cursor@example.com', display_name='cursor')
+        for i in range(3):
+            Book.objects.create(
+                author=cls.user, title=f'作品{i}', description='简介',
+                ai_check_title='approved', ai_check_description='approved',
+            )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_crafted_cursor_is_rejected(self):
+        paginator = CursorPaginator(Book.objects.all(), ('-updated_at', '-id'), 2)
+        for cursor in CRAFTED_CURSORS:
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                paginator.page(cursor)
+
+    def test_valid_cursor_pages_through_all_rows(self):
+        paginator = CursorPaginator(Book.objects.all(), ('-updated_at', '-id'), 2)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        self.assertEqual(len(first) + len(second), 3)
+        self.assertFalse(second.has_next)
+        last = second.object_list[-1]
+        self.assertEqual(
+            paginator.page(encode_cursor([last.updated_at, last.id], reverse=True)).object_list,
+            list(Book.objects.order_by('-updated_at', '-id')[:2]),
+        )
+
+    def test_views_handle_crafted_cursor(self):
+        for cursor in CRAFTED_CURSORS:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('books:read'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                response = self.client.get(reverse('books:api_book_list'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
@@ -0,0 +1,141 @@
+"""
+查询预算（N+1回归检查）
+
+用两组不同规模的数据请求各页面，SQL条数必须恒定且不超出预算：
+读页面的预算来自QUERY_BUDGETS（与QueryBudgetMiddleware共用），写接口的预算在这里单独给出。
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import User
+from books import reading, toc
+from books.models import Book, Chapter
+from comments.models import Comment
+
+
+ISOLATED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test-query-budgets',
+    }
+}
+
+# 写接口（QueryBudgetMiddleware只检查读请求）
+POST_BUDGETS = {
+    'accounts:verify_email': 6,
+    'accounts:verify_captcha': 2,
+    'accounts:check_display_name': 3,
+}
+
+ROWS = 5
+
+
+@override_settings(CACHES=ISOLATED_CACHES, RATELIMIT_ENABLED=False)
+class QueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email='budget-admin@example.com', display_name='budget-admin', is_admin=True)
+        cls.author = User.objects.create(email='budget-author@example.com', display_name='budget-author')
+        cls.book = Book.objects.create(
+            author=cls.author, title='作品', description='简介',
+            ai_check_title='approved', ai_check_description='approved',
+        )
+        cls.chapter = Chapter.objects.create(
+            book=cls.book, author=cls.author, chapter_number=1, title='第一章', content='正文',
+            ai_check_title='approved', ai_check_content='approved',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _seed(self, count):
+        """追加count组用户/作品/章节/评论"""
+        offset = User.objects.count()
+        for i in range(offset, offset + count):
+            user = User.objects.create(email=f'budget{i}@example.com', display_name=f'budget{i}')
+            book = Book.objects.create(
+                author=user, title=f'作品{i}', description='简介',
+                ai_check_title='approved', ai_check_description='approved',
+            )
+            Book.objects.create(author=user, title_pending=f'待审作品{i}', ai_check_title='pending')
+            Chapter.objects.create(
+                book=book, author=user, chapter_number=1, title='第一章', content='正文',
+                ai_check_title='approved', ai_check_content='approved',
+            )
+            Chapter.objects.create(
+                book=book, author=user, chapter_number=2, title_pending='第二章', content_pending='正文',
+                ai_check_title='pending', ai_check_content='pending',
+            )
+            Chapter.objects.create(
+                book=self.book, author=self.author, chapter_number=i + 2, title=f'第{i + 2}章', content='正文',
+                ai_check_title='approved', ai_check_content='approved',
+            )
+            Comment.objects.create(book=self.book, author=user, content='评论', ai_check='approved')
+            Comment.objects.create(
+                book=self.book, chapter=self.chapter, author=user, content='评论', ai_check='approved',
+            )
+
+    def _pages(self):
+        book_id = self.book.id
+        return [
+            # (用户, 方法, URL名称, 参数, 请求数据)
+            (self.admin, 'get', 'books:read', [], {}),
+            (self.admin, 'get', 'books:api_book_list', [], {}),
+            (self.admin, 'get', 'books:api_search', [], {'q': '作品'}),
+            (self.admin, 'get', 'books:book_detail', [book_id], {}),
+            (self.admin, 'get', 'books:api_book_toc', [book_id], {}),
+            (self.author, 'get', 'books:chapter_detail', [book_id, 1], {}),
+            (self.author, 'get', 'books:create', [], {}),
+            (self.author, 'get', 'books:chapter_list', [book_id], {}),
+            (self.author, 'get', 'books:edit_book', [book_id], {}),
+            (self.author, 'get', 'books:create_chapter', [book_id], {}),
+            (self.author, 'get', 'books:edit_chapter', [book_id, 1], {}),
+            (self.admin, 'get', 'books:admin_panel', [], {}),
+            (self.admin, 'get', 'books:admin_chapter_review', [book_id], {}),
+            (self.admin, 'get', 'comments:book_comments', [book_id], {}),
+            (self.admin, 'get', 'comments:chapter_comments', [book_id, 1], {}),
+            (self.admin, 'get', 'comments:book_comment_list', [book_id], {}),
+            (self.admin, 'get', 'comments:chapter_comment_list', [book_id, 1], {}),
+            (self.admin, 'get', 'accounts:profile', [], {}),
+            (None, 'get', 'accounts:login', [], {}),
+            (None, 'get', 'accounts:generate_captcha', [], {}),
+            (None, 'post', 'accounts:verify_captcha', [], {'captcha_code': 'ABCD'}),
+            # 每轮使用新的邮箱（同一邮箱的重复请求走去重合并的分支）
+            (self.admin, 'post', 'accounts:verify_email', [], {'email': f'budget-new{User.objects.count()}@example.com'}),
+            (self.admin, 'post', 'accounts:check_display_name', [], {'display_name': 'budget-free'}),
+        ]
+
+    def _measure(self):
+        """请求各页面，返回 {URL名称: SQL条数}"""
+        # 每轮都从目录缓存和正文渲染缓存未命中开始，详情页测的是回源查询，目录接口测的是命中缓存
+        toc.invalidate(self.book.id)
+        cache.delete(reading.body_cache_key(Chapter.objects.get(id=self.chapter.id).content_hash))
+
+        counts = {}
+        for user, method, view_name, args, data in self._pages():
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(client, method)(reverse(view_name, args=args), data)
+            self.assertEqual(response.status_code, 200, view_name)
+            counts[view_name] = len(queries)
+        return counts
+
+    def test_query_counts_are_constant_and_within_budget(self):
+        self._seed(ROWS)
+        first = self._measure()
+        self._seed(ROWS)
+        second = self._measure()
+
+        for view_name, count in first.items():
+            with self.subTest(view_name):
+                self.assertEqual(second[view_name], count, f'{view_name} 的SQL条数随数据量增长')
+                budget = POST_BUDGETS.get(view_name, settings.QUERY_BUDGETS.get(view_name))
+                self.assertIsNotNone(budget, f'{view_name} 没有配置查询预算')
+                self.assertLessEqual(count, budget, f'{view_name} 超出查询预算')
@@ -0,0 +1,66 @@
+"""
+全文搜索
+
+搜索结果的摘要高亮，以及搜索API只返回当前用户能打开的章节。
+"""
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import User
+from books.models import Book, Chapter
+from books.search import make_snippet
+
+
+ISOLATED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test-search',
+    }
+}
+
+
+class SnippetTests(SimpleTestCase):
+
+    def test_highlights_full_width_and_compatibility_forms(self):
+        self.assertEqual(
+            make_snippet('前文ＡＢＣ测试，再次abc出现', 'abc'),
+            '前文<mark>ＡＢＣ</mark>测试，再次<mark>abc</mark>出现',
+        )
+        self.assertEqual(make_snippet('㍿会社', '株式'), '<mark>㍿</mark>会社')
+
+    def test_window_and_escaping(self):
+        self.assertEqual(make_snippet('x' * 20 + '关键' + 'y' * 20, '关键', radius=3), '…xxx<mark>关键</mark>yyy…')
+        self.assertEqual(make_snippet('<b>', '<b>'), '<mark>&lt;b&gt;</mark>')
+
+
+@override_settings(CACHES=ISOLATED_CACHES, RATELIMIT_ENABLED=False)
+class SearchAPITests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(email='search-author@example.com', display_name='search-author')
+        cls.reader = User.objects.create(email='search-reader@example.com', display_name='search-reader')
+        cls.book = Book.objects.create(
+            author=cls.author, title='星河', description='简介',
+            ai_check_title='approved', ai_check_description='approved',
+        )
+        Chapter.objects.create(
+            book=cls.book, author=cls.author, chapter_number=1, title='第一章', content='星河璀璨的夜晚',
+            ai_check_title='approved', ai_check_content='approved',
+        )
+
+    def _search(self, user, **params):
+        self.client.force_login(user)
+        response = self.client.get(reverse('books:api_search'), {'q': '星河', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_chapter_hits_only_for_the_author(self):
+        self.assertEqual(sorted(hit['type'] for hit in self._search(self.reader)), ['book'])
+        self.assertEqual(self._search(self.reader, type='chapter'), [])
+
+        hits = self._search(self.author)
+        self.assertEqual(sorted(hit['type'] for hit in hits), ['book', 'chapter'])
+        chapter_hit = next(hit for hit in hits if hit['type'] == 'chapter')
+        self.assertIn('<mark>星河</mark>', chapter_hit['snippet'])
+        self.assertEqual(self.client.get(chapter_hit['url']).status_code, 200)
@@ -0,0 +1,90 @@
+"""
+写缓冲的待刷写记录
+
+自动保存草稿、会话过期时间等写缓冲先把修改放在共享缓存中，由刷写进程定期批量写入数据库。
+待刷写记录以原子递增的序号为键逐条存放在缓存中（<名称>:log:<序号>），
+刷写进程记住已处理到的序号，每次从下一个序号开始按批读取，不需要扫描缓存，
+也不需要对一个公共列表加锁。
+
+追加记录时先取序号再写入记录，刷写进程可能读到已取得序号、但记录还没写入的空位。
+刷写在第一个空位处停下，下次从空位继续；空位超过宽限时间仍未写入
+（追加的进程中途退出，或记录已过期）时才跳过，不会丢失正在写入的记录。
+"""
+import time
+
+from django.core.cache import cache
+
+
+class PendingLog:
+    """
+    缓存中的待刷写记录
+
+    append()可以在任意进程中并发调用；batches()只应由持有刷写锁的一个进程调用。
+    """
+
+    def __init__(self, name, ttl, grace=60):
+        """
+        Args:
+            name (str): 缓存键前缀
+            ttl (int): 单条记录的保留时间（秒），须远大于刷写间隔
+            grace (int): 空位（已取得序号但记录未写入）被跳过前的等待时间（秒）
+        """
+        self.name = name
+        self.ttl = ttl
+        self.grace = grace
+        self.seq_key = f'{name}:log-seq'
+        self.done_key = f'{name}:log-done'
+        self.gap_key = f'{name}:log-gap'
+
+    def _key(self, seq):
+        return f'{self.name}:log:{seq}'
+
+    def append(self, value):
+        """追加一条记录（值须可以被缓存序列化）"""
+        cache.add(self.seq_key, 0, None)
+        seq = cache.incr(self.seq_key)
+        cache.set(self._key(seq), value, self.ttl)
+
+    def _gap_expired(self, seq):
+        """空位是否已超过宽限时间；第一次见到时记下时间"""
+        now = time.time()
+        gap = cache.get(self.gap_key)
+        if gap is None or gap[0] != seq:
+            cache.set(self.gap_key, (seq, now), None)
+            return False
+        return now - gap[1] >= self.grace
+
+    def batches(self, batch_size):
+        """
+        按序号顺序分批读取未处理的记录
+
+        调用方处理完一批并取下一批（或正常结束迭代）时，这一批才被标记为已处理；
+        处理中抛出异常时这一批保留，下次刷写重新读取。
+        遇到宽限时间内的空位时结束迭代，空位及之后的记录留给下次刷写。
+
+        Yields:
+            list: 一批记录的值（超过宽限时间的空位被跳过）
+        """
+        end = cache.get(self.seq_key) or 0
+        start = cache.get(self.done_key) or 0
+        if end < start:
+            # 缓存被清空后序号重新开始
+            start = 0
+        low = start + 1
+        while low <= end:
+            high = min(low + batch_size, end + 1)
+            keys = [self._key(seq) for seq in range(low, high)]
+            found = cache.get_many(keys)
+            cut = high
+            for seq, key in zip(range(low, high), keys):
+                if key not in found and not self._gap_expired(seq):
+                    cut = seq
+                    break
+            keys = keys[:cut - low]
+            if keys:
+                yield [found[key] for key in keys if key in found]
+                cache.delete_many(keys)
+                cache.set(self.done_key, cut - 1, None)
+            if cut < high:
+                return
+            low = high
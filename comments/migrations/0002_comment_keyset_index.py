@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-17 03:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['book', 'chapter', '-created_at', '-id'], name='comments_target_created_idx'),
+        ),
+    ]
@@ -33,6 +33,10 @@ class Comment(models.Model):
         verbose_name = '评论'
         verbose_name_plural = '评论'
         ordering = ['-created_at']
+        indexes = [
+            # 评论列表按 (created_at, id) 游标分页
+            models.Index(fields=['book', 'chapter', '-created_at', '-id'], name='comments_target_created_idx'),
+        ]
     
     def __str__(self):
         comment_type = "章节评论" if self.chapter else "作品评论"
@@ -53,4 +57,7 @@ class Comment(models.Model):
     def save(self, *args, **kwargs):
         """保存时自动更新可见性"""
         self.is_visible = self.is_approved
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'is_visible' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['is_visible']
         super().save(*args, **kwargs)
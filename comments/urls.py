@@ -11,4 +11,6 @@ urlpatterns = [
     path('api/book/<int:book_id>/add/', views.add_book_comment, name='add_book_comment'),
     path('api/chapter/<int:book_id>/<int:chapter_number>/add/', views.add_chapter_comment, name='add_chapter_comment'),
     path('api/delete/<int:comment_id>/', views.delete_comment, name='delete_comment'),
+    path('api/book/<int:book_id>/list/', views.book_comment_list, name='book_comment_list'),
+    path('api/chapter/<int:book_id>/<int:chapter_number>/list/', views.chapter_comment_list, name='chapter_comment_list'),
 ]
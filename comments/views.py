@@ -14,7 +14,9 @@ import json
 
 from books.models import Book, Chapter
 from .models import Comment
-from books.ai_utils import check_content_by_ai
+from books import moderation
+from books.pagination import CursorPaginator, InvalidCursor
+from booksite.ratelimit import ratelimit
 
 
 class AddCommentView(LoginRequiredMixin, TemplateView):
@@ -39,31 +41,9 @@ class BookCommentsView(LoginRequiredMixin, TemplateView):
             raise Http404("作品不存在")
         
         # 获取作品评论（不包含章节评论）
-        # 用户可以查看自己的所有评论（包括审核中的），其他用户只能查看已通过审核的评论
-        if book.author == self.request.user:
-            # 作者可以查看所有评论
-            comments = Comment.objects.filter(
-                book=book, 
-                chapter__isnull=True
-            ).order_by('-created_at')
-        else:
-            # 其他用户可以查看已通过审核的评论 + 自己的所有评论
-            comments = Comment.objects.filter(
-                book=book, 
-                chapter__isnull=True
-            ).filter(
-                Q(is_visible=True) | Q(author=self.request.user)
-            ).order_by('-created_at')
-        
-        # 分页
-        paginator = Paginator(comments, 20)
-        page_number = self.request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
-        
-        context.update({
-            'book': book,
-            'page_obj': page_obj,
-        })
+        comments = visible_comments(book, self.request.user)
+        context.update(paginate_comments(self.request, comments))
+        context['book'] = book
         
         return context
 
@@ -86,36 +66,106 @@ class ChapterCommentsView(LoginRequiredMixin, TemplateView):
             raise Http404("作品不存在")
         
         # 获取章节评论
-        # 用户可以查看自己的所有评论（包括审核中的），其他用户只能查看已通过审核的评论
-        if book.author == self.request.user:
-            # 作者可以查看所有评论
-            comments = Comment.objects.filter(
-                book=book,
-                chapter=chapter
-            ).order_by('-created_at')
-        else:
-            # 其他用户可以查看已通过审核的评论 + 自己的所有评论
-            comments = Comment.objects.filter(
-                book=book,
-                chapter=chapter
-            ).filter(
-                Q(is_visible=True) | Q(author=self.request.user)
-            ).order_by('-created_at')
-        
-        # 分页
-        paginator = Paginator(comments, 20)
-        page_number = self.request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
-        
+        comments = visible_comments(book, self.request.user, chapter=chapter)
+        context.update(paginate_comments(self.request, comments))
         context.update({
             'book': book,
             'chapter': chapter,
-            'page_obj': page_obj,
         })
         
         return context
 
 
+def visible_comments(book, user, chapter=None):
+    """
+    获取当前用户可以看到的评论
+    
+    作者可以查看所有评论；其他用户可以查看已通过审核的评论 + 自己的所有评论（包括审核中的）。
+    chapter为None时只返回作品评论（不包含章节评论）。
+    """
+    comments = Comment.objects.filter(book=book, chapter=chapter).select_related('author')
+    if book.author != user:
+        comments = comments.filter(Q(is_visible=True) | Q(author=user))
+    return comments
+
+
+def paginate_comments(request, comments):
+    """
+    评论分页
+    
+    默认按 (created_at, id) 游标分页；旧的?page=链接仍按页码分页。
+    
+    Returns:
+        dict: 模板上下文
+    """
+    page_number = request.GET.get('page')
+    if page_number:
+        page_obj = Paginator(comments.order_by('-created_at', '-id'), 20).get_page(page_number)
+        return {'page_obj': page_obj, 'comments': page_obj.object_list}
+    
+    paginator = CursorPaginator(comments, ('-created_at', '-id'), 20)
+    try:
+        cursor_page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        cursor_page = paginator.page()
+    return {'cursor_page': cursor_page, 'comments': cursor_page.object_list}
+
+
+def serialize_comment(comment, user):
+    """把评论转换为API返回的字典"""
+    return {
+        'id': comment.id,
+        'author': comment.author.display_name or '',
+        'content': comment.display_content,
+        'is_visible': comment.is_visible,
+        'is_mine': comment.author_id == user.id,
+        'created_at': comment.created_at.isoformat(),
+    }
+
+
+def _comment_list_response(request, comments):
+    try:
+        page_size = min(max(int(request.GET.get('page_size', 20)), 1), 50)
+    except ValueError:
+        page_size = 20
+    
+    try:
+        page = CursorPaginator(comments, ('-created_at', '-id'), page_size).page(request.GET.get('cursor'))
+    except InvalidCursor as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'results': [serialize_comment(comment, request.user) for comment in page.object_list],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+        'has_next': page.has_next,
+    })
+
+
+@login_required
+def book_comment_list(request, book_id):
+    """作品评论列表API - 游标分页"""
+    book = get_object_or_404(Book, id=book_id)
+    
+    if book.author != request.user and not book.is_visible_to_public:
+        return JsonResponse({'success': False, 'error': '作品不存在'}, status=404)
+    
+    return _comment_list_response(request, visible_comments(book, request.user))
+
+
+@login_required
+def chapter_comment_list(request, book_id, chapter_number):
+    """章节评论列表API - 游标分页"""
+    book = get_object_or_404(Book, id=book_id)
+    chapter = get_object_or_404(Chapter, book=book, chapter_number=chapter_number)
+    
+    if book.author != request.user and not book.is_visible_to_public:
+        return JsonResponse({'success': False, 'error': '作品不存在'}, status=404)
+    
+    return _comment_list_response(request, visible_comments(book, request.user, chapter=chapter))
+
+
 class AddCommentAPIView(LoginRequiredMixin, TemplateView):
     """添加评论API"""
     
@@ -124,6 +174,7 @@ class AddCommentAPIView(LoginRequiredMixin, TemplateView):
 
 
 @login_required
+@ratelimit('comment')
 def add_book_comment(request, book_id):
     """添加作品评论"""
     book = get_object_or_404(Book, id=book_id)
@@ -145,36 +196,22 @@ def add_book_comment(request, book_id):
         
         try:
             with transaction.atomic():
-                # 使用AI进行内容审核
-                ai_result = check_content_by_ai(content)
-                ai_check_status = 'approved' if ai_result.get('approved', False) else 'rejected'
-                
                 comment = Comment.objects.create(
                     book=book,
                     author=request.user,
                     content_pending=content,  # 将内容放入待审核字段
-                    ai_check=ai_check_status,
+                    ai_check='pending',
                     is_visible=False  # 默认不可见，需要审核通过
                 )
                 
-                # 如果AI审核通过，直接发布
-                if ai_check_status == 'approved':
-                    comment.content = content
-                    comment.is_visible = True
-                    comment.save()
+                # AI审核由审核工作进程异步完成，通过后自动发布
+                moderation.enqueue('comment', comment.id, 'content', content)
             
-            if ai_check_status == 'approved':
-                return JsonResponse({
-                    'success': True,
-                    'message': '评论发表成功',
-                    'comment_id': comment.id
-                })
-            else:
-                return JsonResponse({
-                    'success': True,
-                    'message': '评论已提交，正在审核中',
-                    'comment_id': comment.id
-                })
+            return JsonResponse({
+                'success': True,
+                'message': '评论已提交，正在审核中',
+                'comment_id': comment.id
+            })
             
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)})
@@ -183,6 +220,7 @@ def add_book_comment(request, book_id):
 
 
 @login_required
+@ratelimit('comment')
 def add_chapter_comment(request, book_id, chapter_number):
     """添加章节评论"""
     book = get_object_or_404(Book, id=book_id)
@@ -205,37 +243,23 @@ def add_chapter_comment(request, book_id, chapter_number):
         
         try:
             with transaction.atomic():
-                # 使用AI进行内容审核
-                ai_result = check_content_by_ai(content)
-                ai_check_status = 'approved' if ai_result.get('approved', False) else 'rejected'
-                
                 comment = Comment.objects.create(
                     book=book,
                     chapter=chapter,
                     author=request.user,
                     content_pending=content,  # 将内容放入待审核字段
-                    ai_check=ai_check_status,
+                    ai_check='pending',
                     is_visible=False  # 默认不可见，需要审核通过
                 )
                 
-                # 如果AI审核通过，直接发布
-                if ai_check_status == 'approved':
-                    comment.content = content
-                    comment.is_visible = True
-                    comment.save()
+                # AI审核由审核工作进程异步完成，通过后自动发布
+                moderation.enqueue('comment', comment.id, 'content', content)
             
-            if ai_check_status == 'approved':
-                return JsonResponse({
-                    'success': True,
-                    'message': '评论发表成功',
-                    'comment_id': comment.id
-                })
-            else:
-                return JsonResponse({
-                    'success': True,
-                    'message': '评论已提交，正在审核中',
-                    'comment_id': comment.id
-                })
+            return JsonResponse({
+                'success': True,
+                'message': '评论已提交，正在审核中',
+                'comment_id': comment.id
+            })
             
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)})